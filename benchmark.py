@@ -0,0 +1,125 @@
+"""
+推理执行方式基准测试
+在 CPU 上比较不同执行方式每个批次的前向计算耗时
+
+用法:
+    python benchmark.py --in-features 64 --hidden 256,256 --out-features 10 --batch-size 1024
+    python benchmark.py --model-id 3 --weights saved_models/1_model.pth --in-features 4
+    python benchmark.py --quantized --onnx
+    python benchmark.py --trace-passes --batch-size 1
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(project_root)
+
+import torch
+from models.compiled import CompiledModel, COMPILE_MODES, COMPILE_MODE_NONE, trace_model
+from models.inference import load_model
+from models.neural_network import NNModel, NNLayer
+from models.quantization import quantize_model
+from models.onnx_backend import OnnxRuntimeModel, export_onnx
+
+
+def build_mlp(in_features: int, hidden: list, out_features: int) -> NNModel:
+    """构建用于基准测试的多层感知机"""
+    model = NNModel()
+    sizes = [in_features] + hidden
+    for i in range(len(hidden)):
+        model.add_layer(NNLayer("Linear", {"in_features": sizes[i], "out_features": sizes[i + 1]}))
+        model.add_layer(NNLayer("Relu", {}))
+    model.add_layer(NNLayer("Linear", {"in_features": sizes[-1], "out_features": out_features}))
+    return model
+
+
+def time_forward(forward, inputs: torch.Tensor, warmup: int, iterations: int) -> list:
+    """返回每次前向计算的耗时(毫秒)，预热阶段同时完成编译"""
+    with torch.inference_mode():
+        for _ in range(warmup):
+            forward(inputs)
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            forward(inputs)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="比较不同执行方式的CPU推理耗时")
+    parser.add_argument("--model-id", type=int, help="使用models表中的模型，需同时指定 --weights")
+    parser.add_argument("--weights", help="模型权重文件 (.pth)")
+    parser.add_argument("--in-features", type=int, default=64, help="输入特征数")
+    parser.add_argument("--hidden", default="256,256", help="隐藏层大小，用逗号分隔")
+    parser.add_argument("--out-features", type=int, default=10, help="输出维度")
+    parser.add_argument("--batch-size", type=int, default=1024, help="每批样本数")
+    parser.add_argument("--iterations", type=int, default=100, help="计时的批次数")
+    parser.add_argument("--warmup", type=int, default=10, help="预热批次数")
+    parser.add_argument("--modes", default=",".join(COMPILE_MODES),
+                        help="要比较的执行方式，用逗号分隔")
+    parser.add_argument("--quantized", action="store_true", help="同时测试int8量化后的模型")
+    parser.add_argument("--onnx", action="store_true", help="同时测试导出后由ONNX Runtime执行的模型")
+    parser.add_argument("--trace-passes", action="store_true",
+                        help="分别测试TorchScript只冻结和再做 optimize_for_inference 的耗时")
+    parser.add_argument("--threads", type=int, default=None, help="PyTorch和ONNX Runtime计算线程数")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """命令行主入口，返回退出码"""
+    args = parse_args(argv)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    if args.model_id is not None:
+        model = load_model(args.model_id, args.weights)
+    else:
+        hidden = [int(h) for h in args.hidden.split(",") if h]
+        model = build_mlp(args.in_features, hidden, args.out_features)
+    model.eval()
+    inputs = torch.randn(args.batch_size, args.in_features)
+
+    results = {}
+    for mode in [m.strip() for m in args.modes.split(",")]:
+        if mode not in COMPILE_MODES:
+            print(f"未知的执行方式: {mode}")
+            return 1
+        timings = time_forward(CompiledModel(model, mode), inputs, args.warmup, args.iterations)
+        results[mode] = statistics.median(timings)
+
+    if args.trace_passes:
+        # TorchScript 模式在两者中自动选择，这里分别计时
+        for name, optimize in (("TorchScript冻结", False), ("TorchScript融合", True)):
+            traced = trace_model(model, inputs, optimize=optimize)
+            results[name] = statistics.median(time_forward(traced, inputs, args.warmup, args.iterations))
+
+    if args.quantized:
+        quantized = quantize_model(model, inputs)
+        results["int8量化"] = statistics.median(
+            time_forward(quantized, inputs, args.warmup, args.iterations))
+
+    if args.onnx:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = export_onnx(model, os.path.join(temp_dir, "model.onnx"), inputs)
+            runtime = OnnxRuntimeModel(path, intra_op_threads=args.threads or 0)
+            # 直接传入numpy数组，只计ONNX Runtime本身的耗时
+            results["ONNX Runtime"] = statistics.median(
+                time_forward(runtime, inputs.numpy(), args.warmup, args.iterations))
+
+    baseline = results.get(COMPILE_MODE_NONE)
+    print(f"批次大小 {args.batch_size}，线程数 {torch.get_num_threads()}，每批耗时中位数:")
+    for mode, median in results.items():
+        speedup = f"{baseline / median:.2f}x" if baseline else "-"
+        print(f"  {mode:<16}{median:10.3f} ms  {speedup}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
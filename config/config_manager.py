@@ -48,6 +48,20 @@ class ModelConfig:
     auto_backup: bool = True
     max_backup_count: int = 10
     compression_enabled: bool = False
+    cache_size_mb: int = 512  # 已加载模型缓存的内存上限
+    onnx_intra_op_threads: int = 0  # ONNX Runtime 算子内线程数，0 为自动
+    onnx_inter_op_threads: int = 0  # ONNX Runtime 算子间线程数，0 为自动
+    checkpoint_dir: str = "checkpoints"  # 训练检查点目录，每次训练最多保留 max_backup_count 个
+    checkpoint_interval: int = 1  # 每隔多少个epoch保存一次检查点
+    checkpoint_runs: int = 3  # 每个模型最多保留最近几次训练的检查点
+
+
+@dataclass
+class DataConfig:
+    """数据配置"""
+    cache_enabled: bool = True  # 是否缓存解析后的数据集
+    cache_dir: str = "cache/datasets"
+    cache_max_mb: int = 4096  # 缓存目录的磁盘上限，超出时删除最久未使用的缓存，0 为不限制
 
 
 @dataclass
@@ -57,12 +71,14 @@ class AppConfig:
     ui: UIConfig
     logging: LogConfig
     model: ModelConfig
+    data: DataConfig
     
     def __init__(self):
         self.database = DatabaseConfig()
         self.ui = UIConfig()
         self.logging = LogConfig()
         self.model = ModelConfig()
+        self.data = DataConfig()
 
 
 class ConfigManager:
@@ -100,6 +116,11 @@ class ConfigManager:
                     model_config = data['model']
                     self.config.model = ModelConfig(**model_config)
                 
+                # 更新数据配置
+                if 'data' in data:
+                    data_config = data['data']
+                    self.config.data = DataConfig(**data_config)
+                
                 logger.info(f"配置文件加载成功: {self.config_file}")
             else:
                 logger.info("配置文件不存在，使用默认配置")
@@ -116,7 +137,8 @@ class ConfigManager:
                 'database': asdict(self.config.database),
                 'ui': asdict(self.config.ui),
                 'logging': asdict(self.config.logging),
-                'model': asdict(self.config.model)
+                'model': asdict(self.config.model),
+                'data': asdict(self.config.data)
             }
             
             with open(self.config_file, 'w', encoding='utf-8') as f:
@@ -164,6 +186,14 @@ class ConfigManager:
                 logger.info(f"更新模型配置: {key}={value}")
         self._save_config()
     
+    def update_data_config(self, **kwargs):
+        """更新数据配置"""
+        for key, value in kwargs.items():
+            if hasattr(self.config.data, key):
+                setattr(self.config.data, key, value)
+                logger.info(f"更新数据配置: {key}={value}")
+        self._save_config()
+    
     def reset_to_default(self):
         """重置为默认配置"""
         logger.info("重置配置为默认值")
@@ -135,6 +135,41 @@ class DatabaseManager:
                     )
                 ''')
 
+            # 为datasets表添加数据集缓存字段
+            cursor.execute("PRAGMA table_info(datasets)")
+            columns = [column[1] for column in cursor.fetchall()]
+            if 'cache_key' not in columns:
+                cursor.execute("ALTER TABLE datasets ADD COLUMN cache_key TEXT")
+            if 'cache_path' not in columns:
+                cursor.execute("ALTER TABLE datasets ADD COLUMN cache_path TEXT")
+
+            # 检查sweep_trials表是否存在
+            cursor.execute("""
+                SELECT name FROM sqlite_master 
+                WHERE type='table' AND name='sweep_trials'
+            """)
+            if not cursor.fetchone():
+                # 创建超参数搜索结果表，每行是一次搜索中的一组超参数
+                cursor.execute('''
+                    CREATE TABLE sweep_trials (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        sweep_id TEXT NOT NULL,
+                        trial_no INTEGER NOT NULL,
+                        user_id INTEGER,
+                        model_id INTEGER,
+                        params TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        epochs INTEGER,
+                        val_loss REAL,
+                        val_accuracy REAL,
+                        history TEXT,
+                        created_at INTEGER DEFAULT (strftime('%s', 'now')),
+                        FOREIGN KEY (user_id) REFERENCES users (id),
+                        FOREIGN KEY (model_id) REFERENCES models (id)
+                    )
+                ''')
+                cursor.execute("CREATE INDEX idx_sweep_trials_sweep_id ON sweep_trials (sweep_id)")
+
             conn.commit()
 
     def get_connection(self):
@@ -196,6 +231,88 @@ class DatabaseManager:
                 }
             return None
 
+    def add_dataset_cache(self, user_id: int, name: str, file_path: str,
+                          cache_key: str, cache_path: str) -> int:
+        """记录数据集的二进制缓存，返回记录ID"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO datasets (user_id, name, file_path, cache_key, cache_path)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (user_id, name, file_path, cache_key, cache_path)
+            )
+            conn.commit()
+            return cursor.lastrowid
+
+    def get_dataset_cache(self, cache_key: str) -> dict:
+        """根据缓存键查找数据集缓存记录"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT id, user_id, file_path, cache_path
+                FROM datasets
+                WHERE cache_key = ?
+                ORDER BY id DESC
+                """,
+                (cache_key,)
+            )
+            result = cursor.fetchone()
+            if result:
+                return {
+                    "id": result[0],
+                    "user_id": result[1],
+                    "file_path": result[2],
+                    "cache_path": result[3]
+                }
+            return None
+
+    def add_sweep_trial(self, sweep_id: str, trial_no: int, params: str, status: str,
+                        epochs: int = None, val_loss: float = None, val_accuracy: float = None,
+                        history: str = None, user_id: int = None, model_id: int = None) -> int:
+        """记录一组超参数的搜索结果，返回记录ID"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO sweep_trials (sweep_id, trial_no, user_id, model_id, params, status,
+                                          epochs, val_loss, val_accuracy, history)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (sweep_id, trial_no, user_id, model_id, params, status,
+                 epochs, val_loss, val_accuracy, history)
+            )
+            conn.commit()
+            return cursor.lastrowid
+
+    def get_sweep_trials(self, sweep_id: str) -> list:
+        """获取一次搜索的全部结果，按验证损失从低到高排序，未完成训练的排在最后"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT trial_no, params, status, epochs, val_loss, val_accuracy, history
+                FROM sweep_trials
+                WHERE sweep_id = ?
+                ORDER BY val_loss IS NULL, val_loss, trial_no
+                """,
+                (sweep_id,)
+            )
+            return [
+                {
+                    "trial": row[0],
+                    "params": row[1],
+                    "status": row[2],
+                    "epochs": row[3],
+                    "val_loss": row[4],
+                    "val_accuracy": row[5],
+                    "history": row[6]
+                }
+                for row in cursor.fetchall()
+            ]
+
     def add_user(self, username: str, password: str) -> bool:
         """添加新用户，密码将被安全哈希存储"""
         try:
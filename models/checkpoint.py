@@ -0,0 +1,197 @@
+"""
+训练检查点
+训练线程只把模型和优化器状态复制到CPU内存，序列化和写盘由后台线程完成，
+训练循环不需要等待磁盘；目录中只保留最新的若干个检查点。
+每次从头开始的训练使用模型目录下单独的运行目录，不同运行的检查点互不轮换，
+继续训练时使用最新一次运行的最新检查点。
+"""
+import glob
+import os
+import re
+import shutil
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+import torch
+from utils.logger import logger
+
+CHECKPOINT_PREFIX = "checkpoint_epoch_"
+CHECKPOINT_SUFFIX = ".pt"
+RUN_PREFIX = "run_"
+
+# 检查点中的模型参数统一使用 NNModel 的键名 (pytorch_layers.0.weight)；
+# 多进程训练的工作进程训练的是由同样的层构成的 nn.Sequential，键名没有这个前缀
+MODEL_KEY_PREFIX = "pytorch_layers."
+
+_EPOCH_PATTERN = re.compile(re.escape(CHECKPOINT_PREFIX) + r"(\d+)" + re.escape(CHECKPOINT_SUFFIX) + "$")
+
+
+def checkpoint_path(directory: str, epoch: int) -> str:
+    """第 ``epoch`` 个epoch (从0开始) 结束时的检查点路径"""
+    return os.path.join(directory, f"{CHECKPOINT_PREFIX}{epoch + 1:05d}{CHECKPOINT_SUFFIX}")
+
+
+def list_checkpoints(directory: str) -> list:
+    """目录中的检查点，按epoch从旧到新排序"""
+    paths = glob.glob(os.path.join(directory, f"{CHECKPOINT_PREFIX}*{CHECKPOINT_SUFFIX}"))
+    paths = [p for p in paths if _EPOCH_PATTERN.search(os.path.basename(p))]
+    return sorted(paths, key=lambda p: int(_EPOCH_PATTERN.search(os.path.basename(p)).group(1)))
+
+
+def new_run_directory(base_directory: str) -> str:
+    """一次新训练的检查点目录，目录名按开始时间排序；第一次写入时才创建"""
+    return os.path.join(base_directory, f"{RUN_PREFIX}{datetime.now():%Y%m%d_%H%M%S_%f}")
+
+
+def list_runs(base_directory: str) -> list:
+    """模型目录下的运行目录，按开始时间从旧到新排序"""
+    if not base_directory or not os.path.isdir(base_directory):
+        return []
+    return sorted(os.path.join(base_directory, name) for name in os.listdir(base_directory)
+                  if name.startswith(RUN_PREFIX) and os.path.isdir(os.path.join(base_directory, name)))
+
+
+def prune_runs(base_directory: str, keep: int):
+    """只保留最新的 ``keep`` 次运行，删除更早运行的全部检查点"""
+    runs = list_runs(base_directory)
+    for run in runs[:max(0, len(runs) - keep)]:
+        try:
+            shutil.rmtree(run)
+        except OSError as e:
+            logger.warning(f"删除旧的检查点目录失败: {str(e)}")
+
+
+def latest_checkpoint(directory: str) -> Optional[str]:
+    """最新的检查点路径，没有时返回 None
+
+    ``directory`` 是模型目录时取最新一次有检查点的运行中的最新检查点；
+    也可以直接传入一个运行目录。
+    """
+    if not directory or not os.path.isdir(directory):
+        return None
+    for run in reversed(list_runs(directory)):
+        paths = list_checkpoints(run)
+        if paths:
+            return paths[-1]
+    paths = list_checkpoints(directory)
+    return paths[-1] if paths else None
+
+
+def to_checkpoint_keys(model, state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """把 ``model`` 的参数字典转换为检查点使用的 NNModel 键名"""
+    if state is None or hasattr(model, "pytorch_layers"):
+        return state
+    return {MODEL_KEY_PREFIX + key: value for key, value in state.items()}
+
+
+def from_checkpoint_keys(model, state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """把检查点中的参数字典转换为 ``model`` 的键名，也兼容没有前缀的旧检查点"""
+    if state is None:
+        return state
+    prefixed = all(key.startswith(MODEL_KEY_PREFIX) for key in state)
+    if hasattr(model, "pytorch_layers"):
+        return state if prefixed else {MODEL_KEY_PREFIX + key: value for key, value in state.items()}
+    if not prefixed:
+        return state
+    return {key[len(MODEL_KEY_PREFIX):]: value for key, value in state.items()}
+
+
+def snapshot(state: Any) -> Any:
+    """把状态中的张量复制到CPU，之后训练继续修改参数也不影响快照"""
+    if isinstance(state, torch.Tensor):
+        return state.detach().to("cpu", copy=True)
+    if isinstance(state, dict):
+        return {k: snapshot(v) for k, v in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot(v) for v in state)
+    return state
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    """加载检查点，张量放在CPU上"""
+    return torch.load(path, map_location="cpu", weights_only=False)
+
+
+class CheckpointWriter:
+    """后台检查点写入器
+
+    同一时间最多只有一个快照在等待写入：磁盘比训练慢时，
+    尚未写入的旧快照会被新快照替换，内存占用不会随排队增长。
+    """
+
+    def __init__(self, directory: str, max_keep: Optional[int] = None):
+        """
+        Args:
+            directory: 检查点目录
+            max_keep: 最多保留的检查点数，默认使用配置中的 max_backup_count
+        """
+        if max_keep is None:
+            from config.config_manager import get_config
+            max_keep = get_config().model.max_backup_count
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_keep = max(1, max_keep)
+        self.written = 0
+        self.error: Optional[str] = None
+        self._pending = None
+        self._writing = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="CheckpointWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, epoch: int, state: Dict[str, Any]):
+        """提交一个已复制到CPU的快照，立即返回"""
+        with self._condition:
+            if self._pending is not None:
+                logger.debug(f"检查点写入较慢，跳过第 {self._pending[0] + 1} 轮的快照")
+            self._pending = (epoch, state)
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                epoch, state = self._pending
+                self._pending = None
+                self._writing = True
+            try:
+                self._write(epoch, state)
+            except Exception as e:
+                self.error = str(e)
+                logger.warning(f"写入检查点失败: {str(e)}")
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def _write(self, epoch: int, state: Dict[str, Any]):
+        """先写临时文件再替换，中途崩溃不会留下不完整的检查点"""
+        path = checkpoint_path(self.directory, epoch)
+        temp_path = path + ".tmp"
+        torch.save(state, temp_path)
+        os.replace(temp_path, path)
+        self.written += 1
+        logger.debug(f"检查点已保存: {path}")
+
+        for old in list_checkpoints(self.directory)[:-self.max_keep]:
+            try:
+                os.remove(old)
+            except OSError as e:
+                logger.warning(f"删除旧检查点失败: {str(e)}")
+
+    def flush(self):
+        """等待已提交的快照写完"""
+        with self._condition:
+            while self._pending is not None or self._writing:
+                self._condition.wait()
+
+    def close(self):
+        """写完等待中的快照后停止后台线程"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
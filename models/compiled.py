@@ -0,0 +1,126 @@
+"""
+编译执行模式
+把 NNModel 的层列表转换为 nn.Sequential，再用 TorchScript 跟踪或 torch.compile 编译，
+减少逐层调用 Python 的开销。推理时冻结跟踪结果并尝试 optimize_for_inference，
+由 TorchScript 完成 Conv2d/Linear 与 ReLU 等相邻算子的融合。
+编译失败时依次回退到 TorchScript 和普通执行，不影响训练和推理。
+"""
+import time
+import warnings
+from typing import Callable, Optional
+import torch
+import torch.nn as nn
+from models.neural_network import NNModel
+from utils.logger import logger
+
+COMPILE_MODE_NONE = "不编译"
+COMPILE_MODE_TRACE = "TorchScript"
+COMPILE_MODE_COMPILE = "torch.compile"
+COMPILE_MODES = [COMPILE_MODE_NONE, COMPILE_MODE_TRACE, COMPILE_MODE_COMPILE]
+
+# 比较推理图时每个候选计时的批次数，之前先调用两次让 TorchScript 完成图优化
+SELECT_WARMUP = 2
+SELECT_REPEATS = 3
+
+
+def build_sequential(model: NNModel) -> nn.Sequential:
+    """用模型已有的层构建 nn.Sequential，参数与原模型共享"""
+    return nn.Sequential(*model.pytorch_layers)
+
+
+def fastest(candidates: list, example_inputs: torch.Tensor):
+    """在示例输入上分别计时，返回耗时最短的前向计算"""
+    timings = []
+    with torch.no_grad():
+        for candidate in candidates:
+            for _ in range(SELECT_WARMUP):
+                candidate(example_inputs)
+            start = time.perf_counter()
+            for _ in range(SELECT_REPEATS):
+                candidate(example_inputs)
+            timings.append(time.perf_counter() - start)
+    return candidates[timings.index(min(timings))]
+
+
+def trace_model(model: NNModel, example_inputs: torch.Tensor, for_training: bool = False,
+                optimize: Optional[bool] = None) -> torch.jit.ScriptModule:
+    """TorchScript 跟踪；用于推理时还会冻结参数并做算子融合
+
+    optimize_for_inference 融合 Conv2d/Linear 与 ReLU，并预先转置全连接层的权重，
+    但在部分CPU和批次大小下全连接模型反而更慢。``optimize`` 为 None 时
+    在示例批次上比较只冻结和再做优化的两种结果，保留较快的一个。
+    """
+    sequential = build_sequential(model)
+    with warnings.catch_warnings():
+        # 新版本 PyTorch 对 TorchScript 接口给出弃用提示，功能不受影响
+        warnings.simplefilter("ignore", FutureWarning)
+        with torch.no_grad():
+            traced = torch.jit.trace(sequential, example_inputs)
+        if for_training:
+            return traced
+        # optimize_for_inference 会原地修改传入的模块，两种结果各自冻结一份
+        frozen = torch.jit.freeze(traced.eval())
+        if optimize is False:
+            return frozen
+        optimized = torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+        if optimize:
+            return optimized
+        selected = fastest([frozen, optimized], example_inputs)
+        logger.info(f"TorchScript 推理{'使用' if selected is optimized else '不使用'} optimize_for_inference")
+        return selected
+
+
+def compile_model(model: nn.Module, example_inputs: torch.Tensor, mode: str = COMPILE_MODE_TRACE,
+                  for_training: bool = False) -> Callable[[torch.Tensor], torch.Tensor]:
+    """按指定模式编译模型，返回前向计算函数
+
+    Args:
+        model: 要编译的模型，编译结果与它共享参数（推理冻结后除外）
+        example_inputs: 一个批次的示例输入，用于跟踪或触发编译
+        mode: COMPILE_MODES 之一
+        for_training: 训练时不冻结参数，保证反向传播更新的是原模型
+    """
+    if not isinstance(model, NNModel):
+        # 量化后的 TorchScript 模型和 ONNX Runtime 模型不再重复编译
+        return model
+
+    if mode == COMPILE_MODE_COMPILE:
+        try:
+            compiled = torch.compile(build_sequential(model))
+            # torch.compile 在首次调用时才真正编译，在这里触发以便及时回退
+            with torch.no_grad():
+                compiled(example_inputs)
+            return compiled
+        except Exception as e:
+            logger.warning(f"torch.compile 不可用，改用 TorchScript: {str(e)}")
+            mode = COMPILE_MODE_TRACE
+
+    if mode == COMPILE_MODE_TRACE:
+        try:
+            return trace_model(model, example_inputs, for_training)
+        except Exception as e:
+            logger.warning(f"TorchScript 跟踪失败，使用普通执行: {str(e)}")
+
+    return model
+
+
+class CompiledModel:
+    """延迟编译的前向计算
+
+    第一次调用时用实际输入完成编译，之后直接调用编译结果；
+    编译模式为"不编译"时等价于直接调用原模型。
+    """
+
+    def __init__(self, model: NNModel, mode: str = COMPILE_MODE_NONE, for_training: bool = False):
+        self.model = model
+        self.mode = mode
+        self.for_training = for_training
+        self._forward: Optional[Callable[[torch.Tensor], torch.Tensor]] = None
+
+    def __call__(self, inputs: torch.Tensor) -> torch.Tensor:
+        if self._forward is None:
+            if self.mode == COMPILE_MODE_NONE:
+                self._forward = self.model
+            else:
+                self._forward = compile_model(self.model, inputs, self.mode, self.for_training)
+        return self._forward(inputs)
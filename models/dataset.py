@@ -0,0 +1,326 @@
+"""
+训练数据集构建
+把 DataFrame 一次性转换为连续的 float32 缓冲区，训练集和验证集只保存索引；
+对超出内存的CSV文件提供按块流式读取的数据集和磁盘内存映射的特征矩阵
+"""
+import os
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import Dataset, IterableDataset
+from typing import Iterator, List, Optional, Tuple, Union
+
+# 流式读取时每块的行数
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def read_table(file_path: str, usecols: Optional[List[str]] = None,
+               nrows: Optional[int] = None, dtype=None) -> pd.DataFrame:
+    """读取CSV或Excel文件"""
+    if file_path.endswith('.csv'):
+        return pd.read_csv(file_path, usecols=usecols, nrows=nrows, dtype=dtype)
+    return pd.read_excel(file_path, usecols=usecols, nrows=nrows, dtype=dtype)
+
+
+def iter_csv_chunks(file_path: str, columns: List[str],
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """按块读取CSV文件，只解析指定列并直接解析为 float32"""
+    if not file_path.endswith('.csv'):
+        raise ValueError("流式读取仅支持CSV文件")
+
+    dtype = {column: np.float32 for column in columns}
+    for chunk in pd.read_csv(file_path, usecols=columns, dtype=dtype, chunksize=chunk_size):
+        # usecols 按文件中的顺序返回列，这里恢复为调用方指定的顺序
+        yield chunk[columns]
+
+
+class TabularDataset(Dataset):
+    """基于共享张量和行索引的表格数据集
+
+    多个数据集可以共享同一份特征/标签张量，彼此只通过 ``indices`` 区分，
+    不会复制底层数据。由内存映射特征矩阵支撑时 ``matrix_path`` 为矩阵文件路径。
+    """
+
+    def __init__(self, features: torch.Tensor, labels: torch.Tensor,
+                 indices: Optional[torch.Tensor] = None, matrix_path: Optional[str] = None):
+        self.features = features
+        self.labels = labels
+        if indices is None:
+            indices = torch.arange(len(features))
+        self.indices = indices
+        self.matrix_path = matrix_path
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        row = self.indices[idx]
+        return self.features[row], self.labels[row]
+
+
+def dataframe_to_tensors(df: pd.DataFrame, feature_columns: List[str],
+                         label_column: str) -> Tuple[torch.Tensor, torch.Tensor]:
+    """把选中的列写入一块连续的 float32 缓冲区
+
+    按列逐个写入预分配的数组，避免先生成 float64 的中间矩阵；
+    返回的张量通过 ``torch.from_numpy`` 共享该缓冲区。
+    """
+    num_rows = len(df)
+    features = np.empty((num_rows, len(feature_columns)), dtype=np.float32)
+    for j, column in enumerate(feature_columns):
+        features[:, j] = df[column].to_numpy(dtype=np.float32, copy=False)
+    labels = np.empty(num_rows, dtype=np.float32)
+    labels[:] = df[label_column].to_numpy(dtype=np.float32, copy=False)
+
+    return torch.from_numpy(features), torch.from_numpy(labels)
+
+
+def write_feature_matrix(file_path: str, columns: List[str], matrix_path: str,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """把选中的列按块写入行主序的 float32 二进制文件，返回行数
+
+    CSV文件按块读取，整个过程不需要把数据全部放入内存。
+    """
+    if file_path.endswith('.csv'):
+        chunks = iter_csv_chunks(file_path, columns, chunk_size)
+    else:
+        chunks = [read_table(file_path, usecols=columns)[columns]]
+
+    temp_path = f"{matrix_path}.tmp"
+    num_rows = 0
+    with open(temp_path, 'wb') as f:
+        for chunk in chunks:
+            block = np.empty((len(chunk), len(columns)), dtype=np.float32)
+            for j, column in enumerate(columns):
+                block[:, j] = chunk[column].to_numpy(dtype=np.float32, copy=False)
+            block.tofile(f)
+            num_rows += len(chunk)
+    os.replace(temp_path, matrix_path)
+    return num_rows
+
+
+def open_feature_matrix(matrix_path: str, num_columns: int) -> torch.Tensor:
+    """以写时复制的内存映射方式打开特征矩阵，数据由操作系统按需换入"""
+    num_rows = os.path.getsize(matrix_path) // (4 * num_columns)
+    if num_rows == 0:
+        raise ValueError(f"特征矩阵文件为空: {matrix_path}")
+    array = np.memmap(matrix_path, dtype=np.float32, mode='c', shape=(num_rows, num_columns))
+    return torch.from_numpy(array)
+
+
+def build_memmap_features(file_path: str, columns: List[str], matrix_path: str,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE) -> torch.Tensor:
+    """返回由磁盘内存映射支撑的特征矩阵，已存在的矩阵文件会被直接复用"""
+    if not os.path.exists(matrix_path):
+        write_feature_matrix(file_path, columns, matrix_path, chunk_size)
+    return open_feature_matrix(matrix_path, len(columns))
+
+
+def split_indices(num_samples: int, val_ratio: float = 0.2,
+                  seed: int = 42) -> Tuple[torch.Tensor, torch.Tensor]:
+    """生成训练集和验证集的随机行索引"""
+    generator = torch.Generator().manual_seed(seed)
+    permutation = torch.randperm(num_samples, generator=generator)
+    num_val = int(round(num_samples * val_ratio))
+    return permutation[num_val:], permutation[:num_val]
+
+
+def build_tabular_datasets(df: pd.DataFrame, feature_columns: List[str], label_column: str,
+                           val_ratio: float = 0.2,
+                           seed: int = 42) -> Tuple[TabularDataset, TabularDataset]:
+    """构建共享同一缓冲区的训练集和验证集"""
+    features, labels = dataframe_to_tensors(df, feature_columns, label_column)
+    train_idx, val_idx = split_indices(len(features), val_ratio, seed)
+    return (TabularDataset(features, labels, train_idx),
+            TabularDataset(features, labels, val_idx))
+
+
+def build_memmap_datasets(file_path: str, feature_columns: List[str], label_column: str,
+                          matrix_path: str, val_ratio: float = 0.2, seed: int = 42,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE
+                          ) -> Tuple[TabularDataset, TabularDataset]:
+    """构建由磁盘内存映射支撑的训练集和验证集，标签作为矩阵最后一列一起写入"""
+    columns = list(feature_columns) + [label_column]
+    matrix = build_memmap_features(file_path, columns, matrix_path, chunk_size)
+    features, labels = matrix[:, :-1], matrix[:, -1]
+    train_idx, val_idx = split_indices(len(matrix), val_ratio, seed)
+    return (TabularDataset(features, labels, train_idx, matrix_path),
+            TabularDataset(features, labels, val_idx, matrix_path))
+
+
+def dataset_source(dataset: TabularDataset) -> Union[TabularDataset, Tuple[str, int, torch.Tensor]]:
+    """传给子进程的数据集描述
+
+    内存映射的数据集只传矩阵文件路径、列数和行索引，由子进程重新映射；
+    否则张量会被序列化，整个矩阵被复制到共享内存中。内存中的数据集原样传递。
+    """
+    if dataset.matrix_path is None:
+        return dataset
+    num_columns = dataset.features.shape[1] + 1  # 标签是矩阵的最后一列
+    return dataset.matrix_path, num_columns, dataset.indices
+
+
+def open_dataset_source(source: Union[TabularDataset, Tuple[str, int, torch.Tensor]]) -> TabularDataset:
+    """在子进程中由 :func:`dataset_source` 的结果还原数据集"""
+    if isinstance(source, TabularDataset):
+        return source
+    matrix_path, num_columns, indices = source
+    matrix = open_feature_matrix(matrix_path, num_columns)
+    return TabularDataset(matrix[:, :-1], matrix[:, -1], indices, matrix_path)
+
+
+class TensorBatchLoader:
+    """内存张量的批量加载器
+
+    每个epoch只生成一次随机排列，然后用 ``index_select`` 一次切出整个批次，
+    替代 DataLoader 逐样本索引再 collate 的方式。迭代接口与 DataLoader 相同。
+    """
+
+    def __init__(self, dataset: TabularDataset, batch_size: int = 32,
+                 shuffle: bool = False, drop_last: bool = False,
+                 generator: Optional[torch.Generator] = None):
+        if batch_size < 1:
+            raise ValueError(f"批次大小必须大于0: {batch_size}")
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+    def _num_samples(self) -> int:
+        return len(self.dataset)
+
+    def _epoch_indices(self) -> torch.Tensor:
+        """本epoch按顺序读取的行索引"""
+        indices = self.dataset.indices
+        if self.shuffle:
+            indices = indices[torch.randperm(len(indices), generator=self.generator)]
+        return indices
+
+    def __len__(self) -> int:
+        num_samples = self._num_samples()
+        if self.drop_last:
+            return num_samples // self.batch_size
+        return (num_samples + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        indices = self._epoch_indices()
+        features, labels = self.dataset.features, self.dataset.labels
+        for i in range(len(self)):
+            batch_idx = indices[i * self.batch_size:(i + 1) * self.batch_size]
+            yield features.index_select(0, batch_idx), labels.index_select(0, batch_idx)
+
+
+class ShardedBatchLoader(TensorBatchLoader):
+    """数据并行训练的分片批量加载器
+
+    与 DistributedSampler 的做法相同：每个epoch各进程用 ``seed + epoch`` 生成同一个排列，
+    补齐到进程数的整数倍后按 ``rank`` 间隔取样，各进程的样本互不重叠且数量相同，
+    因此每个进程的批次数一致。验证集不需要补齐时设置 ``pad=False``。
+    """
+
+    def __init__(self, dataset: TabularDataset, batch_size: int, rank: int, world_size: int,
+                 shuffle: bool = False, seed: int = 0, pad: bool = True, drop_last: bool = False):
+        super().__init__(dataset, batch_size, shuffle=shuffle, drop_last=drop_last)
+        if not 0 <= rank < world_size:
+            raise ValueError(f"进程序号超出范围: {rank}/{world_size}")
+        self.rank = rank
+        self.world_size = world_size
+        self.seed = seed
+        self.pad = pad
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        """设置当前epoch，各进程据此生成相同的打乱顺序"""
+        self.epoch = epoch
+
+    def _num_samples(self) -> int:
+        total = len(self.dataset)
+        if self.pad:
+            return -(-total // self.world_size)
+        return len(range(self.rank, total, self.world_size))
+
+    def _epoch_indices(self) -> torch.Tensor:
+        indices = self.dataset.indices
+        if self.shuffle:
+            generator = torch.Generator().manual_seed(self.seed + self.epoch)
+            indices = indices[torch.randperm(len(indices), generator=generator)]
+        if self.pad:
+            padding = self._num_samples() * self.world_size - len(indices)
+            if padding:
+                repeats = -(-padding // len(indices))
+                indices = torch.cat([indices, indices.repeat(repeats)[:padding]])
+        return indices[self.rank::self.world_size]
+
+
+class StreamingTabularDataset(IterableDataset):
+    """流式CSV数据集
+
+    每次迭代重新按块读取文件，直接产出 ``(features, labels)`` 批次，
+    内存占用只与 ``chunk_size`` 有关。训练集/验证集按行随机划分，
+    划分结果由 ``seed`` 和块序号决定，因此每个epoch保持一致且互不重叠。
+    打乱只在块内进行。
+    """
+
+    def __init__(self, file_path: str, feature_columns: List[str], label_column: str,
+                 batch_size: int = 32, shuffle: bool = False,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, split: Optional[str] = None,
+                 val_ratio: float = 0.2, seed: int = 42):
+        if split not in (None, "train", "val"):
+            raise ValueError(f"不支持的数据划分: {split}")
+        self.file_path = file_path
+        self.feature_columns = list(feature_columns)
+        self.label_column = label_column
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.chunk_size = chunk_size
+        self.split = split
+        self.val_ratio = val_ratio
+        self.seed = seed
+        self._epoch = 0
+
+    def _chunk_tensors(self, chunk_no: int, chunk: pd.DataFrame) -> Tuple[torch.Tensor, torch.Tensor]:
+        """把一个数据块转换为张量并应用训练/验证划分"""
+        features, labels = dataframe_to_tensors(chunk, self.feature_columns, self.label_column)
+        if self.split is None:
+            return features, labels
+
+        generator = torch.Generator().manual_seed(self.seed * 1000003 + chunk_no)
+        is_val = torch.rand(len(features), generator=generator) < self.val_ratio
+        keep = is_val if self.split == "val" else ~is_val
+        return features[keep], labels[keep]
+
+    def __iter__(self):
+        columns = self.feature_columns + [self.label_column]
+        generator = torch.Generator().manual_seed(self.seed + self._epoch)
+        self._epoch += 1
+
+        pending_x = pending_y = None
+        for chunk_no, chunk in enumerate(iter_csv_chunks(self.file_path, columns, self.chunk_size)):
+            x, y = self._chunk_tensors(chunk_no, chunk)
+            if self.shuffle:
+                perm = torch.randperm(len(x), generator=generator)
+                x, y = x[perm], y[perm]
+            if pending_x is not None:
+                x, y = torch.cat([pending_x, x]), torch.cat([pending_y, y])
+
+            # 整批输出，不足一批的剩余行并入下一块
+            full = len(x) // self.batch_size * self.batch_size
+            for start in range(0, full, self.batch_size):
+                yield x[start:start + self.batch_size], y[start:start + self.batch_size]
+            pending_x, pending_y = x[full:], y[full:]
+
+        if pending_x is not None and len(pending_x):
+            yield pending_x, pending_y
+
+
+def build_streaming_datasets(file_path: str, feature_columns: List[str], label_column: str,
+                             batch_size: int = 32, val_ratio: float = 0.2, seed: int = 42,
+                             chunk_size: int = DEFAULT_CHUNK_SIZE
+                             ) -> Tuple[StreamingTabularDataset, StreamingTabularDataset]:
+    """构建流式读取的训练集和验证集，二者可直接作为训练线程的数据加载器"""
+    common = dict(batch_size=batch_size, chunk_size=chunk_size, val_ratio=val_ratio, seed=seed)
+    return (StreamingTabularDataset(file_path, feature_columns, label_column,
+                                    shuffle=True, split="train", **common),
+            StreamingTabularDataset(file_path, feature_columns, label_column,
+                                    shuffle=False, split="val", **common))
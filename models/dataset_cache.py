@@ -0,0 +1,256 @@
+"""
+数据集二进制缓存
+首次加载CSV/Excel后把数据按列保存为 .npy 文件，之后直接以内存映射方式读取，
+避免重复解析文本。缓存键由文件路径、修改时间和大小决定，并记录在 datasets 表中。
+缓存目录超出磁盘上限时删除最久未使用的缓存。
+"""
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+from models.dataset import read_table
+from utils.logger import logger
+
+MANIFEST_FILE = "manifest.json"
+
+
+class DatasetCache:
+    """列式数据集缓存
+
+    数值、布尔和不带时区的日期时间列直接保存为 .npy；文本等其他列做字典编码，
+    保存 int32 编码数组和取值列表，缺失值编码为 -1。取值无法写入JSON清单的列
+    (例如带时区的时间、Decimal) 使整个数据集不写入缓存。
+    读取缓存时数值列以写时复制方式映射，修改返回的 DataFrame 不会改动缓存文件。
+    """
+
+    def __init__(self, cache_dir: str = "cache/datasets", db=None, enabled: bool = True,
+                 max_size_mb: int = 0):
+        """
+        Args:
+            cache_dir: 缓存目录
+            db: 数据库管理器，默认延迟创建
+            enabled: 是否启用缓存
+            max_size_mb: 缓存目录的磁盘上限(MB)，0 为不限制
+        """
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.max_size = max_size_mb * 1024 * 1024
+        self._db = db
+
+    @property
+    def db(self):
+        """延迟创建数据库管理器"""
+        if self._db is None:
+            from database.db_manager import DatabaseManager
+            self._db = DatabaseManager()
+        return self._db
+
+    @staticmethod
+    def source_key(file_path: str) -> str:
+        """根据文件绝对路径、修改时间和大小生成缓存键"""
+        stat = os.stat(file_path)
+        source = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def matrix_path(self, file_path: str, columns: List[str]) -> str:
+        """内存映射特征矩阵的文件路径，由源文件和所选列共同决定
+
+        矩阵文件由调用方写入，这里只按最近使用时间参与缓存目录的清理。
+        """
+        digest = hashlib.sha1("\x1f".join(columns).encode('utf-8')).hexdigest()[:16]
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, f"{self.source_key(file_path)}_{digest}.f32")
+        if os.path.exists(path):
+            self.touch(path)
+        else:
+            self.prune()
+        return path
+
+    def load(self, file_path: str, user_id: Optional[int] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """加载数据集：命中缓存时读取缓存，否则解析源文件并写入缓存"""
+        if not self.enabled:
+            df = read_table(file_path, usecols=columns)
+            return df[columns] if columns else df
+
+        key = self.source_key(file_path)
+        cache_path = self.lookup(key)
+        if cache_path:
+            logger.info(f"从缓存加载数据集: {file_path}")
+            self.touch(cache_path)
+            return self.read(cache_path, columns)
+
+        df = read_table(file_path)
+        try:
+            cache_path = self.store(df, key, file_path, user_id)
+            self.prune(keep=cache_path)
+        except Exception as e:
+            # 缓存失败不影响数据加载
+            logger.warning(f"写入数据集缓存失败: {str(e)}")
+        return df[columns] if columns else df
+
+    def lookup(self, key: str) -> Optional[str]:
+        """查找缓存目录，优先使用数据库记录，其次检查磁盘"""
+        candidates = []
+        try:
+            record = self.db.get_dataset_cache(key)
+            if record and record["cache_path"]:
+                candidates.append(record["cache_path"])
+        except Exception as e:
+            logger.warning(f"查询数据集缓存记录失败: {str(e)}")
+        candidates.append(os.path.join(self.cache_dir, key))
+
+        for cache_path in candidates:
+            if os.path.exists(os.path.join(cache_path, MANIFEST_FILE)):
+                return cache_path
+        return None
+
+    def store(self, df: pd.DataFrame, key: str, file_path: str,
+              user_id: Optional[int] = None) -> str:
+        """把 DataFrame 按列写入缓存目录并登记到数据库"""
+        cache_path = os.path.join(self.cache_dir, key)
+        temp_path = f"{cache_path}.tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+
+        try:
+            manifest = {"source": os.path.abspath(file_path), "rows": len(df), "columns": []}
+            for i, column in enumerate(df.columns):
+                series = df[column]
+                entry = {"name": column, "file": f"col_{i}.npy", "dtype": str(series.dtype)}
+                values = series.to_numpy()
+                if values.dtype.kind in "biufmM":
+                    np.save(os.path.join(temp_path, entry["file"]), values)
+                    entry["kind"] = "numeric"
+                else:
+                    codes, uniques = pd.factorize(series)
+                    np.save(os.path.join(temp_path, entry["file"]), codes.astype(np.int32))
+                    entry["kind"] = "category"
+                    entry["categories"] = [self.json_value(column, v) for v in uniques]
+                manifest["columns"].append(entry)
+
+            with open(os.path.join(temp_path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False)
+
+            # 先写临时目录再整体替换，避免留下不完整的缓存
+            shutil.rmtree(cache_path, ignore_errors=True)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+        logger.info(f"数据集缓存已写入: {cache_path}")
+
+        if user_id is not None:
+            self.db.add_dataset_cache(user_id, os.path.basename(file_path),
+                                      os.path.abspath(file_path), key, cache_path)
+        return cache_path
+
+    @staticmethod
+    def json_value(column: str, value):
+        """把字典编码的取值转换为可以写入清单的JSON类型，不支持的类型抛出 ValueError"""
+        if isinstance(value, np.generic):
+            value = value.item()
+        if not isinstance(value, (str, bool, int, float)):
+            raise ValueError(f"列 {column} 的取值类型 {type(value).__name__} 无法写入缓存")
+        return value
+
+    @staticmethod
+    def read_manifest(cache_path: str) -> dict:
+        """读取缓存清单"""
+        with open(os.path.join(cache_path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def read(self, cache_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """从缓存目录读取 DataFrame，数值列以内存映射方式打开"""
+        manifest = self.read_manifest(cache_path)
+        entries = {entry["name"]: entry for entry in manifest["columns"]}
+        names = columns if columns else [entry["name"] for entry in manifest["columns"]]
+
+        data = {}
+        for name in names:
+            entry = entries[name]
+            # 写时复制：修改只发生在进程内存中，与首次从源文件加载时一样可以直接修改
+            values = np.load(os.path.join(cache_path, entry["file"]), mmap_mode='c')
+            if entry["kind"] == "category":
+                categories = np.empty(len(entry["categories"]) + 1, dtype=object)
+                categories[:-1] = entry["categories"]
+                categories[-1] = np.nan
+                # 编码 -1 正好索引到末尾的 NaN
+                values = pd.Series(categories[values]).astype(entry["dtype"]).array
+            data[name] = values
+        return pd.DataFrame(data, columns=names, copy=False)
+
+    @staticmethod
+    def touch(path: str):
+        """记录缓存的使用时间，清理时按该时间淘汰"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def entry_size(path: str) -> int:
+        """一个缓存目录或矩阵文件占用的字节数"""
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def prune(self, keep: Optional[str] = None) -> int:
+        """缓存目录超出上限时删除最久未使用的缓存，``keep`` 不会被删除；返回删除的个数"""
+        if not self.max_size or not os.path.isdir(self.cache_dir):
+            return 0
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                continue
+            try:
+                entries.append((os.path.getmtime(path), path, self.entry_size(path)))
+            except OSError:
+                continue
+        total = sum(size for _, _, size in entries)
+
+        removed = 0
+        for _, path, size in sorted(entries):
+            if total <= self.max_size:
+                break
+            if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError as e:
+                # Windows 上仍被映射的文件无法删除，下次再清理
+                logger.warning(f"删除数据集缓存失败: {str(e)}")
+                continue
+            total -= size
+            removed += 1
+            logger.info(f"数据集缓存超出上限，已删除: {path}")
+        return removed
+
+
+# 全局数据集缓存实例
+_dataset_cache: Optional[DatasetCache] = None
+
+
+def get_dataset_cache() -> DatasetCache:
+    """获取全局数据集缓存实例"""
+    global _dataset_cache
+    if _dataset_cache is None:
+        from config.config_manager import get_config
+        data_config = get_config().data
+        _dataset_cache = DatasetCache(data_config.cache_dir, enabled=data_config.cache_enabled,
+                                      max_size_mb=data_config.cache_max_mb)
+    return _dataset_cache
@@ -0,0 +1,198 @@
+"""
+多进程数据并行训练
+在本机启动多个工作进程，通过 gloo 后端和 DistributedDataParallel 同步梯度。
+每个进程只训练数据集的一个分片，并使用各自的计算线程；
+0号进程把全局汇总后的每轮历史记录和最终权重通过队列发回主进程。
+"""
+import copy
+import io
+import os
+import queue
+import socket
+from typing import Callable, Optional
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+from torch.nn.parallel import DistributedDataParallel
+from models.compiled import build_sequential, COMPILE_MODE_NONE
+from models.dataset import TabularDataset, ShardedBatchLoader, dataset_source, open_dataset_source
+from models.metrics import MetricAccumulator
+from models.trainer import Trainer, History, EpochCallback, new_history
+from utils.logger import logger
+
+BACKEND = "gloo"
+# 主进程轮询工作进程消息的间隔(秒)
+POLL_INTERVAL = 0.2
+
+
+def is_available() -> bool:
+    """当前 PyTorch 是否支持 gloo 后端的多进程训练"""
+    return dist.is_available() and dist.is_gloo_available()
+
+
+def threads_per_worker(num_workers: int) -> int:
+    """把本机的CPU核心平均分给各个工作进程"""
+    return max(1, (os.cpu_count() or 1) // num_workers)
+
+
+def _free_port() -> int:
+    """获取一个空闲的本地端口用于进程组初始化"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class DistributedTrainer(Trainer):
+    """在已初始化的进程组中训练，梯度由 DistributedDataParallel 在反向传播时求平均"""
+
+    def __init__(self, model: nn.Module, train_params: dict, stop_event=None):
+        super().__init__(model, train_params, device=torch.device("cpu"))
+        # 各进程验证集的批次数可能不同，不在前向计算时广播缓冲区，避免集合通信互相等待
+        self.ddp = DistributedDataParallel(self.model, broadcast_buffers=False)
+        self.stop_event = stop_event
+        # 各进程参数相同，只由0号进程写检查点
+        self.is_main = dist.get_rank() == 0
+
+    def build_forward(self):
+        return self.ddp
+
+    def no_sync(self):
+        return self.ddp.no_sync()
+
+    def should_stop(self) -> bool:
+        # 所有进程必须在同一个epoch停止，否则未停止的进程会一直等待梯度同步
+        stopping = not self.is_running or (self.stop_event is not None and self.stop_event.is_set())
+        flag = torch.tensor([int(stopping)])
+        dist.all_reduce(flag, op=dist.ReduceOp.MAX)
+        return bool(flag.item())
+
+    def reduce_metrics(self, metrics: MetricAccumulator):
+        metrics.all_reduce()
+        return metrics.compute()
+
+
+def _worker(rank: int, world_size: int, init_method: str, model: nn.Module, train_params: dict,
+            train_source, val_source, num_threads: int, messages, stop_event):
+    """工作进程入口，数据集由 :func:`dataset_source` 的结果还原"""
+    try:
+        torch.set_num_threads(num_threads)
+        train_dataset = open_dataset_source(train_source)
+        val_dataset = open_dataset_source(val_source)
+        dist.init_process_group(BACKEND, init_method=init_method, rank=rank, world_size=world_size)
+        # 传入的参数位于共享内存中，复制一份再训练，避免各进程写同一块内存
+        model = copy.deepcopy(model)
+        trainer = DistributedTrainer(model, train_params, stop_event)
+
+        batch_size = train_params["batch_size"]
+        seed = train_params.get("seed", 0)
+        train_loader = ShardedBatchLoader(train_dataset, batch_size, rank, world_size,
+                                          shuffle=True, seed=seed)
+        val_loader = ShardedBatchLoader(val_dataset, batch_size, rank, world_size, pad=False)
+
+        report = None
+        if rank == 0:
+            sent = 0
+
+            def report(epoch: int, history: History):
+                # 只发送上次之后新增的记录，每个epoch的传输量不随训练轮数增长；
+                # 从检查点继续时第一次会带上之前的记录
+                nonlocal sent
+                messages.put(("epoch", epoch, {k: v[sent:] for k, v in history.items()}))
+                sent = len(history["loss"])
+
+        history = trainer.fit(train_loader, val_loader, report)
+
+        if rank == 0:
+            buffer = io.BytesIO()
+            torch.save(model.state_dict(), buffer)
+            messages.put(("done", history, buffer.getvalue()))
+    except Exception as e:
+        messages.put(("error", rank, str(e)))
+    finally:
+        if dist.is_initialized():
+            dist.destroy_process_group()
+
+
+def train_data_parallel(model: nn.Module, train_params: dict, train_dataset: TabularDataset,
+                        val_dataset: TabularDataset, num_workers: int,
+                        on_epoch_end: Optional[EpochCallback] = None,
+                        should_stop: Optional[Callable[[], bool]] = None) -> History:
+    """启动 ``num_workers`` 个进程做数据并行训练，训练结束后把权重载入 ``model``
+
+    ``batch_size`` 是每个进程的批次大小，每次参数更新使用的样本数为
+    ``batch_size × accumulation_steps × num_workers``。
+    返回全体样本上汇总的历史记录；``on_epoch_end`` 在主进程中调用。
+    """
+    if not is_available():
+        raise RuntimeError("当前 PyTorch 不支持 gloo 后端，无法进行多进程训练")
+    if num_workers < 2:
+        raise ValueError(f"多进程训练至少需要2个进程: {num_workers}")
+    if not isinstance(train_dataset, TabularDataset) or not isinstance(val_dataset, TabularDataset):
+        raise ValueError("多进程训练只支持全部加载或内存映射的数据，不支持流式读取")
+    if train_params.get("use_gpu"):
+        logger.info("多进程训练使用CPU，忽略GPU加速选项")
+    if train_params.get("compile_mode", COMPILE_MODE_NONE) != COMPILE_MODE_NONE:
+        logger.info("多进程训练不编译模型，按不编译方式执行")
+    if train_params.get("profile_steps", 0) > 0:
+        # 分析结果在工作进程中，无法返回界面
+        logger.info("多进程训练不做算子分析，请使用单进程训练分析")
+        train_params = dict(train_params, profile_steps=0)
+
+    sequential = build_sequential(model).cpu()
+    init_method = f"tcp://127.0.0.1:{_free_port()}"
+    num_threads = threads_per_worker(num_workers)
+    ctx = mp.get_context("spawn")
+    messages = ctx.Queue()
+    stop_event = ctx.Event()
+
+    # 内存映射的数据集由各进程按路径重新映射，不复制到共享内存
+    train_source, val_source = dataset_source(train_dataset), dataset_source(val_dataset)
+    processes = [
+        ctx.Process(target=_worker, daemon=True,
+                    args=(rank, num_workers, init_method, sequential, train_params,
+                          train_source, val_source, num_threads, messages, stop_event))
+        for rank in range(num_workers)
+    ]
+    logger.info(f"启动 {num_workers} 个训练进程，每个进程 {num_threads} 个计算线程")
+    for process in processes:
+        process.start()
+
+    finished = False
+    progress = new_history()  # 按工作进程发来的增量拼接的历史记录
+    try:
+        while True:
+            if should_stop is not None and should_stop():
+                stop_event.set()
+            try:
+                message = messages.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                failed = [p.exitcode for p in processes if p.exitcode not in (None, 0)]
+                if failed:
+                    raise RuntimeError(f"训练进程异常退出，退出码: {failed[0]}")
+                continue
+
+            kind = message[0]
+            if kind == "epoch":
+                for key, values in message[2].items():
+                    progress.setdefault(key, []).extend(values)
+                if on_epoch_end is not None:
+                    on_epoch_end(message[1], progress)
+            elif kind == "error":
+                raise RuntimeError(f"训练进程 {message[1]} 出错: {message[2]}")
+            else:
+                history, state = message[1], message[2]
+                finished = True
+                break
+    finally:
+        # 出错时其余进程可能在等待梯度同步，直接结束
+        for process in processes:
+            if finished:
+                process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        messages.close()
+
+    sequential.load_state_dict(torch.load(io.BytesIO(state), map_location="cpu"))
+    return history
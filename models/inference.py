@@ -0,0 +1,199 @@
+"""
+分批推理引擎
+按固定大小的批次在 torch.inference_mode() 下执行前向计算，
+逐批产出预测结果并可增量写入文件
+"""
+import threading
+from contextlib import nullcontext
+from queue import Queue
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from models.compiled import CompiledModel, COMPILE_MODE_NONE
+from models.dataset import iter_csv_chunks, read_table, DEFAULT_CHUNK_SIZE
+from models.neural_network import NNModel
+from models.quantization import is_quantized_path, load_quantized
+from models.onnx_backend import is_onnx_path, load_onnx_model
+from models.profiling import NullProfileWindow, ProfileWindow
+
+_END = object()
+
+
+def prefetch(iterable: Iterable, depth: int = 2) -> Iterator:
+    """在后台线程中提前读取 ``depth`` 个元素，使数据读取与计算重叠"""
+    queue: Queue = Queue(maxsize=depth)
+
+    def producer():
+        try:
+            for item in iterable:
+                queue.put(item)
+        except Exception as e:
+            queue.put(e)
+        finally:
+            queue.put(_END)
+
+    threading.Thread(target=producer, daemon=True).start()
+    while True:
+        item = queue.get()
+        if item is _END:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def load_model(model_id: int, weights_path: str) -> nn.Module:
+    """从数据库加载模型结构，再加载权重文件，返回评估模式的模型
+
+    权重文件是量化模型 (.int8.pt) 或 ONNX 模型 (.onnx) 时直接加载，不需要查询模型结构。
+    """
+    if is_quantized_path(weights_path):
+        return load_quantized(weights_path)
+    if is_onnx_path(weights_path):
+        return load_onnx_model(weights_path)
+    model = NNModel.load(model_id=model_id)
+    state_dict = torch.load(weights_path, map_location="cpu")
+    model.load_state_dict(state_dict)
+    model.eval()
+    return model
+
+
+def iter_feature_chunks(file_path: str, columns: Optional[List[str]] = None,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[torch.Tensor]:
+    """按块读取输入文件的特征列，产出 float32 张量；未指定列时使用全部列"""
+    if columns is None:
+        columns = list(read_table(file_path, nrows=0).columns)
+
+    if file_path.endswith('.csv'):
+        chunks = iter_csv_chunks(file_path, columns, chunk_size)
+    else:
+        chunks = [read_table(file_path, usecols=columns)[columns]]
+    for chunk in chunks:
+        yield torch.from_numpy(chunk.to_numpy(dtype=np.float32, copy=True))
+
+
+class PredictionWriter:
+    """把预测结果按块追加写入CSV文件"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = None
+        self._header_written = False
+
+    def __enter__(self):
+        self._file = open(self.file_path, 'w', encoding='utf-8', newline='')
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def write(self, start: int, predictions: np.ndarray):
+        """写入从第 start 行开始的一批预测结果"""
+        rows = np.arange(start, start + len(predictions))
+        if predictions.ndim > 1:
+            data = {f"prediction_{i}": predictions[:, i] for i in range(predictions.shape[1])}
+        else:
+            data = {"prediction": predictions}
+        chunk = pd.DataFrame({"row": rows, **data})
+        chunk.to_csv(self._file, header=not self._header_written, index=False)
+        self._header_written = True
+
+
+class InferenceEngine:
+    """分批推理引擎
+
+    ``profile_steps`` 大于0时，``run`` 用 torch.profiler 分析前若干个批次，
+    结果汇总在 ``profile_summary`` 中。
+    """
+
+    def __init__(self, model: nn.Module, batch_size: int = 4096, task_type: str = "分类",
+                 compile_mode: str = COMPILE_MODE_NONE, profile_steps: int = 0):
+        if batch_size < 1:
+            raise ValueError(f"批次大小必须大于0: {batch_size}")
+        self.model = model
+        self.batch_size = batch_size
+        self.task_type = task_type
+        self.compile_mode = compile_mode
+        self.profile_steps = profile_steps
+        self.profile_summary = None
+        # 第一个批次到达时才编译
+        self.forward = CompiledModel(model, compile_mode) if compile_mode != COMPILE_MODE_NONE else model
+
+    def predict_batch(self, inputs: torch.Tensor) -> torch.Tensor:
+        """对一个批次做前向计算并转换为预测结果"""
+        outputs = self.forward(inputs)
+        if self.task_type == "分类":
+            return outputs.argmax(dim=1)
+        # 单输出回归去掉最后一维，保证批次大小为1时仍是一维结果
+        if outputs.dim() > 1 and outputs.size(-1) == 1:
+            return outputs.squeeze(-1)
+        return outputs
+
+    def iter_predictions(self, inputs: torch.Tensor) -> Iterator[Tuple[int, np.ndarray]]:
+        """逐批产出 ``(起始行, 预测结果)``，输入只在切片时才被读取"""
+        self.model.eval()
+        for start in range(0, len(inputs), self.batch_size):
+            with torch.inference_mode():
+                predictions = self.predict_batch(inputs[start:start + self.batch_size])
+            yield start, predictions.cpu().numpy()
+
+    def run(self, inputs: torch.Tensor, output_path: Optional[str] = None,
+            progress_callback: Optional[Callable[[int, int, np.ndarray], None]] = None,
+            should_stop: Optional[Callable[[], bool]] = None) -> np.ndarray:
+        """执行完整推理，返回全部预测结果
+
+        Args:
+            inputs: 输入特征矩阵，可以是内存映射的张量
+            output_path: 如果提供，预测结果按批追加写入该CSV文件
+            progress_callback: 每批完成后调用，参数为 (已完成行数, 总行数, 本批预测结果)
+            should_stop: 返回 True 时提前结束
+        """
+        total = len(inputs)
+        chunks = []
+        profiler = self.build_profiler()
+        self.profile_summary = None
+        profiler.start()
+        try:
+            with (PredictionWriter(output_path) if output_path else nullcontext()) as writer:
+                for start, predictions in self.iter_predictions(inputs):
+                    profiler.step()
+                    chunks.append(predictions)
+                    if writer is not None:
+                        writer.write(start, predictions)
+                    if progress_callback:
+                        progress_callback(start + len(predictions), total, predictions)
+                    if should_stop and should_stop():
+                        break
+        finally:
+            profiler.stop()
+            self.profile_summary = profiler.summary
+
+        if not chunks:
+            return np.empty(0)
+        return np.concatenate(chunks)
+
+    def build_profiler(self):
+        """算子分析窗口；推理的批次通常不多，从第一个批次开始分析，不跳过也不预热"""
+        if self.profile_steps > 0:
+            return ProfileWindow("inference", self.profile_steps, skip=0, warmup=0)
+        return NullProfileWindow()
+
+    def run_chunks(self, chunks: Iterable[torch.Tensor], output_path: str,
+                   progress_callback: Optional[Callable[[int], None]] = None) -> int:
+        """对按块到达的输入逐块推理并写入文件，返回处理的总行数
+
+        结果不在内存中保留，适合对超出内存的文件打分。
+        """
+        offset = 0
+        with PredictionWriter(output_path) as writer:
+            for chunk in chunks:
+                for start, predictions in self.iter_predictions(chunk):
+                    writer.write(offset + start, predictions)
+                offset += len(chunk)
+                if progress_callback:
+                    progress_callback(offset)
+        return offset
@@ -0,0 +1,73 @@
+"""
+训练指标累加器
+在训练设备上以张量形式累计损失和正确样本数，避免每个批次都进行主机同步
+"""
+import torch
+from typing import Dict
+
+
+class MetricAccumulator:
+    """设备端指标累加器
+
+    每个批次只做张量加法，不调用 ``.item()``；
+    只有在 ``compute()`` 或到达同步间隔时才把结果搬回主机。
+    """
+
+    def __init__(self, device: torch.device, sync_interval: int = 0):
+        """
+        Args:
+            device: 累加张量所在的设备，应与模型输出一致
+            sync_interval: 每隔多少个批次把设备端结果合并到主机，0 表示只在 compute() 时同步
+        """
+        self.device = torch.device(device)
+        self.sync_interval = max(0, int(sync_interval))
+        self.reset()
+
+    def reset(self):
+        """清空累计结果"""
+        self._loss_sum = torch.zeros((), dtype=torch.float64, device=self.device)
+        self._correct = torch.zeros((), dtype=torch.int64, device=self.device)
+        self._host_loss = 0.0
+        self._host_correct = 0
+        # 批次数和样本数来自张量形状，不需要同步
+        self.steps = 0
+        self.total = 0
+
+    @torch.no_grad()
+    def update(self, loss: torch.Tensor, outputs: torch.Tensor, targets: torch.Tensor):
+        """累计一个批次的损失和正确数"""
+        self._loss_sum += loss.detach().to(torch.float64)
+        _, predicted = outputs.max(1)
+        self._correct += predicted.eq(targets).sum()
+        self.total += targets.size(0)
+        self.steps += 1
+
+        if self.sync_interval and self.steps % self.sync_interval == 0:
+            self._sync()
+
+    def _sync(self):
+        """把设备端结果合并到主机并清零设备端累加器"""
+        self._host_loss += self._loss_sum.item()
+        self._host_correct += int(self._correct.item())
+        self._loss_sum.zero_()
+        self._correct.zero_()
+
+    def compute(self) -> Dict[str, float]:
+        """物化累计结果：返回批次平均损失和准确率（百分比）"""
+        self._sync()
+        loss = self._host_loss / self.steps if self.steps else 0.0
+        accuracy = 100. * self._host_correct / self.total if self.total else 0.0
+        return {"loss": loss, "accuracy": accuracy}
+
+    def all_reduce(self):
+        """数据并行训练时把各进程的累计结果求和，之后 compute() 返回全体样本上的指标"""
+        import torch.distributed as dist
+
+        self._sync()
+        totals = torch.tensor([self._host_loss, self._host_correct, self.steps, self.total],
+                              dtype=torch.float64)
+        dist.all_reduce(totals)
+        self._host_loss = totals[0].item()
+        self._host_correct = int(totals[1].item())
+        self.steps = int(totals[2].item())
+        self.total = int(totals[3].item())
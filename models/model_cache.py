@@ -0,0 +1,139 @@
+"""
+已加载模型缓存
+按 (模型ID, 用户ID, 权重文件路径, 权重文件修改时间) 缓存重建好的模型，
+在多个模型之间反复切换时不再重复查询数据库和读取权重文件。
+缓存按模型参数占用的内存做 LRU 淘汰。
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+import torch
+import torch.nn as nn
+from models.neural_network import NNModel
+from models.quantization import is_quantized_path, load_quantized
+from models.onnx_backend import is_onnx_path, load_onnx_model
+from utils.logger import logger
+
+CacheKey = Tuple[int, Optional[int], Optional[str], Optional[int]]
+
+
+def model_nbytes(model: nn.Module) -> int:
+    """模型参数和缓冲区占用的字节数"""
+    if not isinstance(model, nn.Module):
+        return 0
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelCache:
+    """模型 LRU 缓存
+
+    缓存中的模型处于评估模式并被多个页面共享，调用方不应修改其参数；
+    需要训练或修改时使用 ``copy=True`` 取得独立副本。
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[nn.Module, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_id: int, weights_path: Optional[str] = None,
+                 user_id: Optional[int] = None) -> CacheKey:
+        """生成缓存键，权重文件被覆盖后修改时间变化，旧缓存自然失效"""
+        if weights_path is None:
+            return model_id, user_id, None, None
+        return model_id, user_id, os.path.abspath(weights_path), os.stat(weights_path).st_mtime_ns
+
+    def get(self, model_id: int, weights_path: Optional[str] = None,
+            user_id: Optional[int] = None, copy: bool = False) -> nn.Module:
+        """获取模型，未命中时从数据库和权重文件加载
+
+        Args:
+            model_id: models表中的模型ID
+            weights_path: 权重文件路径，为 None 时只加载结构
+            user_id: 如果提供，加载时校验模型归属
+            copy: 返回独立副本；未指定权重文件时副本的参数重新初始化
+        """
+        key = self.make_key(model_id, weights_path, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            model = self._load(model_id, weights_path, user_id)
+            # 量化模型的参数打包在算子中、ONNX模型不在PyTorch中，按文件大小估算占用
+            nbytes = model_nbytes(model) or (os.path.getsize(weights_path) if weights_path else 0)
+            self._insert(key, model, nbytes)
+            with self._lock:
+                self.misses += 1
+        else:
+            model = entry[0]
+            logger.debug(f"模型缓存命中: {key}")
+
+        if copy:
+            return model.clone(copy_weights=weights_path is not None)
+        return model
+
+    @staticmethod
+    def _load(model_id: int, weights_path: Optional[str], user_id: Optional[int]) -> nn.Module:
+        """从数据库加载结构并加载权重；量化模型和ONNX模型文件直接加载"""
+        if weights_path is not None and is_quantized_path(weights_path):
+            return load_quantized(weights_path)
+        if weights_path is not None and is_onnx_path(weights_path):
+            return load_onnx_model(weights_path)
+        model = NNModel.load(model_id=model_id, user_id=user_id)
+        if weights_path is not None:
+            state_dict = torch.load(weights_path, map_location="cpu")
+            model.load_state_dict(state_dict)
+        model.eval()
+        return model
+
+    def _insert(self, key: CacheKey, model: nn.Module, nbytes: int):
+        """放入缓存并按内存上限淘汰最久未使用的模型"""
+        if nbytes > self.max_bytes:
+            logger.info(f"模型占用 {nbytes} 字节，超过缓存上限，不缓存: {key}")
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (model, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                evicted_key, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                logger.debug(f"模型缓存淘汰: {evicted_key}")
+
+    def invalidate(self, model_id: int):
+        """丢弃某个模型ID的全部缓存，模型结构更新后调用"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == model_id]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# 全局模型缓存实例
+_model_cache: Optional[ModelCache] = None
+
+
+def get_model_cache() -> ModelCache:
+    """获取全局模型缓存实例"""
+    global _model_cache
+    if _model_cache is None:
+        from config.config_manager import get_config
+        _model_cache = ModelCache(get_config().model.cache_size_mb * 1024 * 1024)
+    return _model_cache
@@ -3,6 +3,7 @@ import torch
 import torch.nn as nn
 from typing import List, Dict, Any
 from database.db_manager import DatabaseManager
+from utils.tracing import traced
 import os
 
 class NNLayer:
@@ -43,9 +44,20 @@ class NNModel(nn.Module):
     def __init__(self):
         super(NNModel, self).__init__()
         self.layers: List[NNLayer] = []
-        self.db = DatabaseManager()
+        self._db = None
         self.pytorch_layers = nn.ModuleList()
         self.user_id = None
+
+    @property
+    def db(self) -> DatabaseManager:
+        """延迟创建数据库管理器，只做前向计算的模型不需要连接数据库"""
+        if self._db is None:
+            self._db = DatabaseManager()
+        return self._db
+
+    @db.setter
+    def db(self, value: DatabaseManager):
+        self._db = value
     
     def add_layer(self, layer: NNLayer):
         self.layers.append(layer)
@@ -60,9 +72,21 @@ class NNModel(nn.Module):
         return {
             "layers": [layer.to_dict() for layer in self.layers]
         }
+
+    def clone(self, copy_weights: bool = True) -> 'NNModel':
+        """复制模型结构；copy_weights 为 False 时各层重新初始化参数"""
+        model = NNModel()
+        model.user_id = self.user_id
+        for layer in self.layers:
+            model.add_layer(NNLayer.from_dict(json.loads(json.dumps(layer.to_dict()))))
+        if copy_weights:
+            model.load_state_dict(self.state_dict())
+        model.train(self.training)
+        return model
     
-    def save(self, name: str = "default_model", user_id: int = None):
-        """保存模型到数据库，必须指定用户ID"""
+    @traced("NNModel.save", "model")
+    def save(self, name: str = "default_model", user_id: int = None) -> str:
+        """保存模型到数据库，必须指定用户ID，返回权重文件路径"""
         if user_id is None:
             raise ValueError("必须提供用户ID才能保存模型")
             
@@ -79,6 +103,7 @@ class NNModel(nn.Module):
             existing = cursor.fetchone()
             
             if existing:
+                model_id = existing[0]
                 # 更新现有模型，同时更新创建时间使其出现在列表顶部
                 cursor.execute(
                     """
@@ -97,9 +122,14 @@ class NNModel(nn.Module):
                     """,
                     (user_id, name, model_data, "{}")
                 )
+                model_id = cursor.lastrowid
             
             # 重要：提交事务
             conn.commit()
+
+        # 结构已更新，丢弃该模型已缓存的实例
+        from models.model_cache import get_model_cache
+        get_model_cache().invalidate(model_id)
         
         # 确保保存目录存在
         save_dir = "saved_models"
@@ -111,8 +141,10 @@ class NNModel(nn.Module):
             torch.save(self.state_dict(), save_path)
         except Exception as e:
             raise Exception(f"保存模型参数失败: {str(e)}")
+        return save_path
     
     @classmethod
+    @traced("NNModel.load", "model")
     def load(cls, model_id: int = None, user_id: int = None) -> 'NNModel':
         """从数据库加载模型，可选择验证用户ID"""
             
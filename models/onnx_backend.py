@@ -0,0 +1,132 @@
+"""
+ONNX 导出与 ONNX Runtime 推理后端
+把 NNModel 导出为批次维度可变的 ONNX 模型，并用 ONNX Runtime 执行。
+onnxruntime 是可选依赖，只有选择该后端时才会导入；
+本模块在模块级别不导入 torch，只做推理的服务端可以不加载 PyTorch。
+"""
+import copy
+import inspect
+import os
+import warnings
+from typing import Optional
+import numpy as np
+from utils.logger import logger
+
+ONNX_SUFFIX = ".onnx"
+BACKEND_PYTORCH = "PyTorch"
+BACKEND_ONNX = "ONNX Runtime"
+BACKENDS = [BACKEND_PYTORCH, BACKEND_ONNX]
+
+INPUT_NAME = "input"
+OUTPUT_NAME = "output"
+
+
+def onnx_path(weights_path: str) -> str:
+    """ONNX 模型文件路径：与权重文件同目录同名，扩展名为 .onnx"""
+    return os.path.splitext(weights_path)[0] + ONNX_SUFFIX
+
+
+def is_onnx_path(path: str) -> bool:
+    """是否为 ONNX 模型文件"""
+    return path.endswith(ONNX_SUFFIX)
+
+
+def example_input(model):
+    """根据第一层推断单个样本的输入形状，用于导出"""
+    import torch
+    import torch.nn as nn
+
+    first = model.pytorch_layers[0] if len(model.pytorch_layers) else None
+    if isinstance(first, nn.Linear):
+        return torch.zeros(1, first.in_features)
+    raise ValueError("无法从模型结构推断输入形状，请提供示例输入")
+
+
+def export_onnx(model, path: str, example_inputs=None, opset_version: int = 17) -> str:
+    """导出 ONNX 模型，批次维度设为动态，返回文件路径
+
+    Args:
+        model: 要导出的 NNModel
+        path: 输出文件路径
+        example_inputs: 示例输入；为 None 时按第一层的输入维度构造
+        opset_version: ONNX 算子集版本
+    """
+    import torch
+    from models.compiled import build_sequential
+
+    if example_inputs is None:
+        example_inputs = example_input(model)
+    # 复制后再移到CPU，不改变原模型所在设备和训练状态
+    sequential = copy.deepcopy(build_sequential(model)).cpu().eval()
+
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # 使用基于 TorchScript 的导出器，不依赖 onnxscript
+        kwargs["dynamo"] = False
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        torch.onnx.export(
+            sequential, (example_inputs[:1].cpu(),), path,
+            input_names=[INPUT_NAME], output_names=[OUTPUT_NAME],
+            dynamic_axes={INPUT_NAME: {0: "batch"}, OUTPUT_NAME: {0: "batch"}},
+            opset_version=opset_version, **kwargs
+        )
+    logger.info(f"ONNX模型已导出: {path}")
+    return path
+
+
+class OnnxRuntimeModel:
+    """用 ONNX Runtime 执行 ONNX 模型
+
+    调用方式与 nn.Module 相同：传入 torch 张量时返回 torch 张量，
+    传入 numpy 数组时返回 numpy 数组，因此可以直接交给 InferenceEngine 使用。
+    """
+
+    def __init__(self, path: str, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("未安装 onnxruntime，请先执行 pip install onnxruntime")
+
+        options = ort.SessionOptions()
+        # 0 表示由 ONNX Runtime 自动决定线程数
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        if inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, inputs):
+        if isinstance(inputs, np.ndarray):
+            return self.run(inputs)
+        import torch
+        return torch.from_numpy(self.run(inputs.detach().cpu().numpy()))
+
+    def run(self, inputs: np.ndarray) -> np.ndarray:
+        """对 numpy 输入执行前向计算"""
+        inputs = np.ascontiguousarray(inputs, dtype=np.float32)
+        return self.session.run(None, {self.input_name: inputs})[0]
+
+    def eval(self) -> "OnnxRuntimeModel":
+        """与 nn.Module 接口保持一致，ONNX 模型始终处于推理模式"""
+        return self
+
+    def to(self, *args, **kwargs) -> "OnnxRuntimeModel":
+        return self
+
+
+def load_onnx_model(path: str, intra_op_threads: Optional[int] = None,
+                    inter_op_threads: Optional[int] = None) -> OnnxRuntimeModel:
+    """加载 ONNX 模型，未指定线程数时使用配置文件中的设置"""
+    if intra_op_threads is None or inter_op_threads is None:
+        from config.config_manager import get_config
+        model_config = get_config().model
+        if intra_op_threads is None:
+            intra_op_threads = model_config.onnx_intra_op_threads
+        if inter_op_threads is None:
+            inter_op_threads = model_config.onnx_inter_op_threads
+    return OnnxRuntimeModel(path, intra_op_threads, inter_op_threads)
@@ -0,0 +1,130 @@
+"""
+算子级性能分析
+用 torch.profiler 分析训练或推理中连续若干步的算子耗时和内存，
+每次运行在单独的目录中保存算子统计表和可在 chrome://tracing 中打开的trace文件，
+并汇总CPU耗时和内存最多的算子供界面显示。
+"""
+import os
+import warnings
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import torch
+from torch.profiler import ProfilerActivity, profile, schedule
+from utils.logger import logger
+
+PROFILE_DIR = os.path.join("logs", "profiles")
+
+# 界面中显示的算子数
+DEFAULT_TOP_K = 10
+
+# 算子统计表保存的行数
+TABLE_ROW_LIMIT = 50
+
+# torch.profiler 为每一步添加的区间，不是实际的算子
+_STEP_PREFIX = "ProfilerStep"
+
+
+def top_operators(averages, sort_key: str, k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+    """按 ``sort_key`` 从大到小取前 ``k`` 个算子，时间单位为毫秒，内存单位为MB"""
+    events = [e for e in averages if not e.key.startswith(_STEP_PREFIX)]
+    events.sort(key=lambda e: getattr(e, sort_key), reverse=True)
+    return [{
+        "name": e.key,
+        "calls": e.count,
+        "self_cpu_ms": e.self_cpu_time_total / 1000,
+        "cpu_total_ms": e.cpu_time_total / 1000,
+        "self_cpu_memory_mb": e.self_cpu_memory_usage / 1024 / 1024
+    } for e in events[:k]]
+
+
+class NullProfileWindow:
+    """不做算子分析时使用，所有方法都不做任何事"""
+
+    summary: Optional[Dict[str, Any]] = None
+
+    def start(self):
+        pass
+
+    def step(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class ProfileWindow(NullProfileWindow):
+    """对第 ``skip + warmup`` 步之后的连续 ``steps`` 步做算子级分析
+
+    跳过的步骤避开第一个批次的编译和内存分配；预热的步骤已开始记录但不计入结果。
+    分析窗口结束或提前 ``stop`` 时保存结果，``summary`` 中是保存的路径和耗时/内存最多的算子。
+    """
+
+    def __init__(self, name: str, steps: int, skip: int = 1, warmup: int = 1,
+                 output_dir: str = PROFILE_DIR, top_k: int = DEFAULT_TOP_K,
+                 device: Optional[torch.device] = None):
+        """
+        Args:
+            name: 运行名称，作为结果目录名的前缀
+            steps: 分析的步数
+            skip: 开始记录前跳过的步数
+            warmup: 开始记录后不计入结果的步数
+            output_dir: 结果目录的上级目录
+            top_k: 汇总的算子数
+            device: 训练或推理使用的设备，GPU上同时记录CUDA算子
+        """
+        self.run_dir = os.path.join(output_dir, f"{name}_{datetime.now():%Y%m%d_%H%M%S_%f}")
+        self.steps = steps
+        self.top_k = top_k
+        self.summary = None
+        activities = [ProfilerActivity.CPU]
+        if device is not None and device.type == "cuda":
+            activities.append(ProfilerActivity.CUDA)
+        with warnings.catch_warnings():
+            # 不预热时 torch.profiler 会给出警告，推理批次少时允许不预热
+            warnings.simplefilter("ignore", UserWarning)
+            self.profiler = profile(
+                activities=activities,
+                schedule=schedule(wait=skip, warmup=warmup, active=steps, repeat=1),
+                on_trace_ready=self._save,
+                record_shapes=True,
+                profile_memory=True
+            )
+
+    def start(self):
+        self.profiler.start()
+
+    def step(self):
+        """一步结束时调用"""
+        self.profiler.step()
+
+    def stop(self):
+        """结束分析；仍在分析窗口内时保存已记录的步骤"""
+        self.profiler.stop()
+        if self.summary is None:
+            logger.warning(f"运行的步数不足，未完成算子分析 (需要先跳过/预热若干步再分析 {self.steps} 步)")
+
+    def _save(self, prof):
+        """保存算子统计表和trace文件，并汇总耗时和内存最多的算子"""
+        try:
+            os.makedirs(self.run_dir, exist_ok=True)
+            trace_path = os.path.join(self.run_dir, "trace.json")
+            table_path = os.path.join(self.run_dir, "operators.txt")
+            prof.export_chrome_trace(trace_path)
+
+            averages = prof.key_averages()
+            with open(table_path, 'w', encoding='utf-8') as f:
+                f.write(averages.table(sort_by="self_cpu_time_total", row_limit=TABLE_ROW_LIMIT))
+                f.write("\n\n")
+                f.write(averages.table(sort_by="self_cpu_memory_usage", row_limit=TABLE_ROW_LIMIT))
+
+            self.summary = {
+                "directory": self.run_dir,
+                "trace_path": trace_path,
+                "table_path": table_path,
+                "steps": self.steps,
+                "by_cpu_time": top_operators(averages, "self_cpu_time_total", self.top_k),
+                "by_memory": top_operators(averages, "self_cpu_memory_usage", self.top_k)
+            }
+            logger.info(f"算子分析结果已保存到: {self.run_dir}")
+        except Exception as e:
+            logger.warning(f"保存算子分析结果失败: {str(e)}")
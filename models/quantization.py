@@ -0,0 +1,131 @@
+"""
+训练后 int8 量化
+全连接层做动态量化；卷积层（连同其后的 ReLU 和池化层）做静态量化，
+用训练数据中抽取的样本校准激活值范围。量化后的模型保存为 TorchScript 文件，
+与 .pth 权重文件放在一起，加载时不需要再从数据库重建结构。
+"""
+import copy
+import os
+import warnings
+from typing import List
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from torch.ao.quantization import (DeQuantStub, QuantStub, convert, fuse_modules,
+                                   get_default_qconfig, prepare, quantize_dynamic)
+from models.compiled import build_sequential
+from models.neural_network import NNModel
+from utils.logger import logger
+
+QUANTIZED_SUFFIX = ".int8.pt"
+CALIBRATION_ROWS = 512
+
+# 可以留在量化域中、跟随卷积层一起静态量化的层
+_STATIC_FOLLOWERS = (nn.Conv2d, nn.ReLU, nn.MaxPool2d, nn.AvgPool2d)
+
+
+class _StaticQuantBlock(nn.Module):
+    """连续的卷积层块，输入量化、输出反量化"""
+
+    def __init__(self, layers: List[nn.Module]):
+        super().__init__()
+        self.quant = QuantStub()
+        self.layers = nn.Sequential(*layers)
+        self.dequant = DeQuantStub()
+
+    def forward(self, x):
+        return self.dequant(self.layers(self.quant(x)))
+
+    def fuse(self):
+        """把 Conv2d+ReLU 融合为一个算子"""
+        layers = list(self.layers)
+        pairs = [[str(i), str(i + 1)] for i in range(len(layers) - 1)
+                 if isinstance(layers[i], nn.Conv2d) and isinstance(layers[i + 1], nn.ReLU)]
+        if pairs:
+            self.layers = fuse_modules(self.layers, pairs)
+
+
+def quantized_path(weights_path: str) -> str:
+    """量化模型文件路径：与权重文件同目录同名，扩展名为 .int8.pt"""
+    return os.path.splitext(weights_path)[0] + QUANTIZED_SUFFIX
+
+
+def is_quantized_path(path: str) -> bool:
+    """是否为量化模型文件"""
+    return path.endswith(QUANTIZED_SUFFIX)
+
+
+def calibration_tensor(df: pd.DataFrame, columns: List[str],
+                       rows: int = CALIBRATION_ROWS, seed: int = 0) -> torch.Tensor:
+    """从训练数据中随机抽取校准样本"""
+    sample = df[columns]
+    if len(sample) > rows:
+        sample = sample.sample(n=rows, random_state=seed)
+    return torch.from_numpy(sample.to_numpy(dtype=np.float32, copy=True))
+
+
+def _group_static_blocks(layers: List[nn.Module]) -> nn.Sequential:
+    """把以卷积层开头的连续层包装为静态量化块"""
+    grouped = []
+    i = 0
+    while i < len(layers):
+        if isinstance(layers[i], nn.Conv2d):
+            block = [layers[i]]
+            i += 1
+            while i < len(layers) and isinstance(layers[i], _STATIC_FOLLOWERS):
+                block.append(layers[i])
+                i += 1
+            grouped.append(_StaticQuantBlock(block))
+        else:
+            grouped.append(layers[i])
+            i += 1
+    return nn.Sequential(*grouped)
+
+
+def quantize_model(model: NNModel, calibration_inputs: torch.Tensor) -> nn.Module:
+    """量化模型，原模型不受影响
+
+    Args:
+        model: 训练好的模型
+        calibration_inputs: 校准样本，卷积层按这些样本统计激活值范围
+    """
+    layers = [copy.deepcopy(layer).cpu() for layer in build_sequential(model)]
+    quantized = _group_static_blocks(layers).eval()
+
+    blocks = [m for m in quantized if isinstance(m, _StaticQuantBlock)]
+    if blocks:
+        qconfig = get_default_qconfig(torch.backends.quantized.engine)
+        for block in blocks:
+            block.fuse()
+            block.qconfig = qconfig
+        prepare(quantized, inplace=True)
+        with torch.no_grad():
+            quantized(calibration_inputs)
+        convert(quantized, inplace=True)
+
+    return quantize_dynamic(quantized, {nn.Linear}, dtype=torch.qint8)
+
+
+def save_quantized(model: NNModel, weights_path: str, calibration_inputs: torch.Tensor) -> str:
+    """量化模型并保存到权重文件旁边，返回量化模型文件路径"""
+    quantized = quantize_model(model, calibration_inputs)
+    path = quantized_path(weights_path)
+    with warnings.catch_warnings():
+        # 新版本 PyTorch 对 TorchScript 接口给出弃用提示，功能不受影响
+        warnings.simplefilter("ignore", FutureWarning)
+        with torch.no_grad():
+            traced = torch.jit.trace(quantized, calibration_inputs[:1])
+        torch.jit.save(traced, path)
+    logger.info(f"量化模型已保存: {path} ({os.path.getsize(path)} 字节，"
+                f"原权重 {os.path.getsize(weights_path)} 字节)")
+    return path
+
+
+def load_quantized(path: str) -> torch.jit.ScriptModule:
+    """加载量化模型文件"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        model = torch.jit.load(path, map_location="cpu")
+    model.eval()
+    return model
@@ -0,0 +1,281 @@
+"""
+超参数搜索
+在进程池中并行训练多组超参数，每个进程使用固定数量的计算线程；
+用逐次减半 (successive halving) 先以少量epoch训练全部组合，
+每一轮只保留验证损失最低的一部分继续以更多epoch训练，提前淘汰表现差的组合。
+"""
+import copy
+import itertools
+import json
+import math
+import os
+import random
+import uuid
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional
+import torch
+import torch.multiprocessing as mp
+import torch.nn as nn
+from models.compiled import build_sequential
+from models.dataset import TabularDataset, TensorBatchLoader, dataset_source, open_dataset_source
+from models.trainer import Trainer
+from utils.logger import logger
+
+SEARCH_GRID = "网格搜索"
+SEARCH_RANDOM = "随机搜索"
+SEARCH_MODES = [SEARCH_GRID, SEARCH_RANDOM]
+
+STATUS_COMPLETED = "completed"
+STATUS_PRUNED = "pruned"
+STATUS_FAILED = "failed"
+STATUS_STOPPED = "stopped"
+
+# 主进程检查停止请求的间隔(秒)
+POLL_INTERVAL = 0.2
+
+SearchSpace = Dict[str, Any]
+TrialCallback = Callable[[Dict[str, Any]], None]
+
+
+def parse_values(text: str, value_type) -> list:
+    """解析逗号分隔的候选值"""
+    values = [value_type(v.strip()) for v in text.split(",") if v.strip()]
+    if not values:
+        raise ValueError("候选值不能为空")
+    return values
+
+
+def grid_trials(space: SearchSpace) -> List[Dict[str, Any]]:
+    """网格搜索：取每个参数候选值的全部组合，单个值视为只有一个候选"""
+    names = list(space)
+    values = [v if isinstance(v, list) else [v] for v in space.values()]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def random_trials(space: SearchSpace, num_trials: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """随机搜索
+
+    列表表示从候选值中随机选取；``(low, high)`` 元组表示在区间内按对数均匀采样，
+    适合学习率这类跨多个数量级的参数；其他值保持不变。
+    """
+    rng = random.Random(seed)
+    trials = []
+    for _ in range(num_trials):
+        trial = {}
+        for name, value in space.items():
+            if isinstance(value, list):
+                trial[name] = rng.choice(value)
+            elif isinstance(value, tuple):
+                low, high = value
+                trial[name] = math.exp(rng.uniform(math.log(low), math.log(high)))
+            else:
+                trial[name] = value
+        trials.append(trial)
+    return trials
+
+
+def halving_budgets(max_epochs: int, min_epochs: int = 1, reduction_factor: int = 3) -> List[int]:
+    """逐次减半每一轮的训练epoch数，按 ``reduction_factor`` 倍增长，最后一轮为 ``max_epochs``"""
+    if reduction_factor < 2:
+        raise ValueError(f"淘汰倍数至少为2: {reduction_factor}")
+    budgets = []
+    budget = max(1, min(min_epochs, max_epochs))
+    while budget < max_epochs:
+        budgets.append(budget)
+        budget *= reduction_factor
+    budgets.append(max_epochs)
+    return budgets
+
+
+def best_epoch(val_losses: List[float]) -> Optional[int]:
+    """验证损失最低的epoch；发散为 NaN/inf 的epoch不参与比较，全部发散时返回 None"""
+    finite = [i for i, loss in enumerate(val_losses) if math.isfinite(loss)]
+    return min(finite, key=val_losses.__getitem__) if finite else None
+
+
+def _rank_key(result: Dict[str, Any]):
+    """排序键：没有有效验证损失的试验排在最后"""
+    loss = result["val_loss"]
+    valid = loss is not None and math.isfinite(loss)
+    return (not valid, loss if valid else 0.0)
+
+
+# 工作进程中的模型模板、数据集和停止事件，由进程池初始化时传入一次
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(num_threads: int, template: nn.Module, train_source, val_source, stop_event):
+    """进程池初始化：限制计算线程数，保存共享内存中的模型模板和停止事件，
+    并由 :func:`dataset_source` 的结果还原数据集"""
+    torch.set_num_threads(num_threads)
+    _worker_state.update(template=template, train_dataset=open_dataset_source(train_source),
+                         val_dataset=open_dataset_source(val_source), stop_event=stop_event)
+
+
+class _TrialTrainer(Trainer):
+    """试验的训练器，主进程要求停止时在下一个epoch开始前结束"""
+
+    def __init__(self, model: nn.Module, train_params: dict, stop_event=None):
+        super().__init__(model, train_params, device=torch.device("cpu"))
+        self.stop_event = stop_event
+
+    def should_stop(self) -> bool:
+        return super().should_stop() or (self.stop_event is not None and self.stop_event.is_set())
+
+
+def _run_trial(train_params: dict, epochs: int, seed: int) -> Dict[str, List[float]]:
+    """在工作进程中训练一组超参数，返回历史记录"""
+    torch.manual_seed(seed)
+    model = copy.deepcopy(_worker_state["template"])
+    # 试验之间互不相关，不写检查点也不从检查点继续；遥测和算子分析的结果留在工作进程中，不记录
+    params = dict(train_params, epochs=epochs, use_gpu=False, checkpoint_dir=None, resume_from=None,
+                  telemetry=False, profile_steps=0)
+    generator = torch.Generator().manual_seed(seed)
+    train_loader = TensorBatchLoader(_worker_state["train_dataset"], params["batch_size"],
+                                     shuffle=True, generator=generator)
+    val_loader = TensorBatchLoader(_worker_state["val_dataset"], params["batch_size"])
+    return _TrialTrainer(model, params, _worker_state["stop_event"]).fit(train_loader, val_loader)
+
+
+class SweepRunner:
+    """并行超参数搜索
+
+    每个试验都从模型当前的参数开始训练，试验之间只有超参数不同；
+    进入下一轮的试验以更多epoch重新训练，结果与轮次安排无关、可以复现。
+    """
+
+    def __init__(self, model: nn.Module, base_params: dict, train_dataset: TabularDataset,
+                 val_dataset: TabularDataset, max_workers: Optional[int] = None,
+                 threads_per_trial: Optional[int] = None, min_epochs: int = 1,
+                 reduction_factor: int = 3, seed: int = 0):
+        """
+        Args:
+            model: 要训练的模型，参数作为所有试验的初始参数
+            base_params: 默认训练参数，试验中的超参数覆盖对应的项
+            train_dataset: 训练集
+            val_dataset: 验证集，用于比较和淘汰试验
+            max_workers: 同时训练的试验数，默认使用全部核心
+            threads_per_trial: 每个试验的计算线程数，默认把核心平均分给各试验
+            min_epochs: 第一轮的训练epoch数
+            reduction_factor: 每轮保留 1/reduction_factor 的试验，epoch数乘以该倍数
+            seed: 试验内数据打乱和参数初始化使用的随机种子
+        """
+        if not isinstance(train_dataset, TabularDataset) or not isinstance(val_dataset, TabularDataset):
+            raise ValueError("超参数搜索只支持全部加载或内存映射的数据，不支持流式读取")
+        self.template = build_sequential(model).cpu()
+        self.base_params = base_params
+        self.train_dataset = train_dataset
+        self.val_dataset = val_dataset
+        self.max_workers = max_workers or (os.cpu_count() or 1)
+        self.threads_per_trial = threads_per_trial or max(1, (os.cpu_count() or 1) // self.max_workers)
+        self.min_epochs = min_epochs
+        self.reduction_factor = reduction_factor
+        self.seed = seed
+
+    def run(self, trials: List[Dict[str, Any]], on_trial_done: Optional[TrialCallback] = None,
+            should_stop: Optional[Callable[[], bool]] = None) -> List[Dict[str, Any]]:
+        """执行搜索，返回按验证损失从低到高排序的试验结果
+
+        每个结果包含 ``trial``、``params``、``status``、``epochs``、``val_loss``、
+        ``val_accuracy`` 和 ``history``；每完成一次训练调用一次 ``on_trial_done``。
+        """
+        results = [{"trial": i, "params": dict(self.base_params, **trial), "status": STATUS_PRUNED,
+                    "epochs": 0, "val_loss": None, "val_accuracy": None, "history": None}
+                   for i, trial in enumerate(trials)]
+        if not results:
+            return []
+        budgets = halving_budgets(max(r["params"]["epochs"] for r in results),
+                                  self.min_epochs, self.reduction_factor)
+        workers = min(self.max_workers, len(results))
+        logger.info(f"超参数搜索: {len(results)} 组参数，{workers} 个并行进程，"
+                    f"每个进程 {self.threads_per_trial} 个线程，各轮epoch数 {budgets}")
+
+        context = mp.get_context("spawn")
+        stop_event = context.Event()
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=_init_worker,
+            # 内存映射的数据集由各进程按路径重新映射，不复制到共享内存
+            initargs=(self.threads_per_trial, self.template, dataset_source(self.train_dataset),
+                      dataset_source(self.val_dataset), stop_event)
+        )
+        alive = results
+        stopped = False
+        try:
+            for rung, budget in enumerate(budgets):
+                stopped = self._run_rung(executor, alive, budget, on_trial_done, should_stop)
+                alive = [r for r in alive if r["status"] != STATUS_FAILED]
+                if stopped or rung == len(budgets) - 1:
+                    break
+                # 保留验证损失最低的 1/reduction_factor，其余试验被淘汰
+                alive.sort(key=_rank_key)
+                alive = alive[:max(1, math.ceil(len(alive) / self.reduction_factor))]
+        finally:
+            if stopped:
+                # 运行中的试验在当前epoch结束后退出，不等待它们
+                stop_event.set()
+            executor.shutdown(wait=not stopped, cancel_futures=True)
+
+        # 被要求停止时，尚未被淘汰的试验标记为已停止
+        for result in alive:
+            result["status"] = STATUS_STOPPED if stopped else STATUS_COMPLETED
+        return sorted(results, key=_rank_key)
+
+    def _run_rung(self, executor: ProcessPoolExecutor, results: List[Dict[str, Any]], budget: int,
+                  on_trial_done: Optional[TrialCallback],
+                  should_stop: Optional[Callable[[], bool]]) -> bool:
+        """以 ``budget`` 个epoch训练一轮试验，返回是否被要求停止"""
+        futures = {}
+        for result in results:
+            epochs = min(budget, result["params"]["epochs"])
+            if epochs == result["epochs"]:
+                # 该试验在上一轮已训练到自身的epoch上限，结果不变
+                continue
+            future = executor.submit(_run_trial, result["params"], epochs, self.seed)
+            futures[future] = (result, epochs)
+
+        pending = set(futures)
+        while pending:
+            if should_stop is not None and should_stop():
+                for future in pending:
+                    future.cancel()
+                return True
+            done, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                result, epochs = futures[future]
+                try:
+                    history = future.result()
+                except Exception as e:
+                    logger.warning(f"试验 {result['trial']} 训练失败: {str(e)}")
+                    result.update(status=STATUS_FAILED, history=None, val_loss=None,
+                                  val_accuracy=None, error=str(e))
+                else:
+                    # 评价指标为各epoch中最低的验证损失，学习率过大发散的试验视为失败
+                    best = best_epoch(history["val_loss"])
+                    if best is None:
+                        logger.warning(f"试验 {result['trial']} 的验证损失发散")
+                        result.update(status=STATUS_FAILED, epochs=epochs, history=history,
+                                      val_loss=None, val_accuracy=None, error="验证损失发散")
+                    else:
+                        result.update(epochs=epochs, history=history, val_loss=history["val_loss"][best],
+                                      val_accuracy=history["val_accuracy"][best])
+                if on_trial_done is not None:
+                    on_trial_done(dict(result))
+        return False
+
+
+def new_sweep_id() -> str:
+    """生成一次搜索的标识"""
+    return uuid.uuid4().hex[:12]
+
+
+def save_sweep_results(db, sweep_id: str, results: List[Dict[str, Any]],
+                       user_id: Optional[int] = None, model_id: Optional[int] = None):
+    """把试验结果写入 sweep_trials 表"""
+    for result in results:
+        db.add_sweep_trial(
+            sweep_id=sweep_id, trial_no=result["trial"], user_id=user_id, model_id=model_id,
+            params=json.dumps(result["params"], ensure_ascii=False), status=result["status"],
+            epochs=result["epochs"], val_loss=result["val_loss"],
+            val_accuracy=result["val_accuracy"],
+            history=json.dumps(result["history"]) if result["history"] is not None else None
+        )
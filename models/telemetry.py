@@ -0,0 +1,119 @@
+"""
+训练步骤遥测
+把每个训练步骤的耗时拆分为数据读取、拷贝到设备、前向、反向和参数更新，
+连同吞吐量和峰值内存写入性能监控器的 ``training`` 类别，
+用于判断训练慢在数据输入还是计算上。
+"""
+import sys
+import time
+from typing import Dict, Optional
+import psutil
+import torch
+from utils.logger import logger
+from utils.performance_monitor import PerformanceMonitor, get_performance_monitor
+
+TELEMETRY_CATEGORY = "training"
+
+STAGE_DATA = "data"
+STAGE_H2D = "h2d"
+STAGE_FORWARD = "forward"
+STAGE_BACKWARD = "backward"
+STAGE_OPTIMIZER = "optimizer"
+STAGES = [STAGE_DATA, STAGE_H2D, STAGE_FORWARD, STAGE_BACKWARD, STAGE_OPTIMIZER]
+
+
+def peak_rss_mb() -> float:
+    """进程启动以来的峰值常驻内存(MB)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 上单位为KB，macOS 上为字节
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        # Windows 没有 resource 模块，psutil 提供峰值工作集
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+
+
+class NullTelemetry:
+    """不记录遥测时使用，所有方法都不做任何事"""
+
+    def start_epoch(self):
+        pass
+
+    def mark(self, stage: str):
+        pass
+
+    def end_step(self, samples: int):
+        pass
+
+    def end_epoch(self, epoch: int):
+        pass
+
+
+class StepTelemetry(NullTelemetry):
+    """记录训练步骤各阶段的耗时
+
+    每个阶段结束时调用 ``mark``，记录的是距上一次 ``mark`` 经过的时间：
+    取到批次时 ``mark("data")``，拷贝到设备后 ``mark("h2d")``，依此类推。
+    GPU上的计算是异步的，计时前先同步设备，否则耗时会记到之后第一个需要等待的阶段上。
+    """
+
+    def __init__(self, device: Optional[torch.device] = None,
+                 monitor: Optional[PerformanceMonitor] = None):
+        self.monitor = monitor or get_performance_monitor()
+        self._synchronize = device is not None and device.type == "cuda"
+        self._last = 0.0
+        self._step: Dict[str, float] = {}
+        self._epoch: Dict[str, float] = {}
+        self._epoch_samples = 0
+        self._epoch_steps = 0
+
+    def start_epoch(self):
+        """epoch开始时调用，之后取第一个批次的时间计入数据读取"""
+        self._step = dict.fromkeys(STAGES, 0.0)
+        self._epoch = dict.fromkeys(STAGES, 0.0)
+        self._epoch_samples = 0
+        self._epoch_steps = 0
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        """结束一个阶段"""
+        if self._synchronize:
+            torch.cuda.synchronize()
+        now = time.perf_counter()
+        self._step[stage] += now - self._last
+        self._last = now
+
+    def end_step(self, samples: int):
+        """一个批次结束，把各阶段耗时和吞吐量写入性能监控器"""
+        timestamp = time.time()
+        step_time = sum(self._step.values())
+        for stage, seconds in self._step.items():
+            self.monitor.add_metric(f"step_{stage}", seconds * 1000, "ms", timestamp, TELEMETRY_CATEGORY)
+            self._epoch[stage] += seconds
+            self._step[stage] = 0.0
+        self.monitor.add_metric("step_time", step_time * 1000, "ms", timestamp, TELEMETRY_CATEGORY)
+        if step_time > 0:
+            self.monitor.add_metric("samples_per_sec", samples / step_time, "samples/s",
+                                    timestamp, TELEMETRY_CATEGORY)
+        self._epoch_samples += samples
+        self._epoch_steps += 1
+
+    def end_epoch(self, epoch: int):
+        """训练部分结束 (不含验证)，记录整个epoch的吞吐量、数据读取占比和峰值内存"""
+        timestamp = time.time()
+        total = sum(self._epoch.values())
+        if total <= 0:
+            return
+        throughput = self._epoch_samples / total
+        data_ratio = self._epoch[STAGE_DATA] / total * 100
+        peak = peak_rss_mb()
+        self.monitor.add_metric("epoch_samples_per_sec", throughput, "samples/s", timestamp, TELEMETRY_CATEGORY)
+        self.monitor.add_metric("data_wait_ratio", data_ratio, "%", timestamp, TELEMETRY_CATEGORY)
+        self.monitor.add_metric("peak_rss", peak, "MB", timestamp, TELEMETRY_CATEGORY)
+
+        stages = ", ".join(f"{stage} {self._epoch[stage] / self._epoch_steps * 1000:.2f}ms"
+                           for stage in STAGES)
+        logger.info(f"第 {epoch + 1} 轮训练 {self._epoch_steps} 步，{throughput:.1f} 样本/秒，"
+                    f"数据读取占 {data_ratio:.1f}%，峰值内存 {peak:.1f}MB；每步平均 {stages}")
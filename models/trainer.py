@@ -0,0 +1,353 @@
+"""
+训练循环
+不依赖 Qt 的单进程训练实现，训练线程和数据并行的工作进程共用同一套循环。
+"""
+import contextlib
+from typing import Callable, Dict, Iterable, List, Optional
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from models.metrics import MetricAccumulator
+from models.compiled import CompiledModel, COMPILE_MODE_NONE
+from models.checkpoint import (CheckpointWriter, load_checkpoint, snapshot,
+                               from_checkpoint_keys, to_checkpoint_keys)
+from models.profiling import NullProfileWindow, ProfileWindow
+from utils.tracing import trace_span, traced
+from models.telemetry import (NullTelemetry, StepTelemetry, STAGE_DATA, STAGE_H2D,
+                              STAGE_FORWARD, STAGE_BACKWARD, STAGE_OPTIMIZER)
+
+OPTIMIZERS = {
+    "SGD": optim.SGD,
+    "Adam": optim.Adam,
+    "RMSprop": optim.RMSprop
+}
+
+CRITERIA = {
+    "CrossEntropyLoss": nn.CrossEntropyLoss,
+    "MSELoss": nn.MSELoss,
+    "BCELoss": nn.BCELoss
+}
+
+SCHEDULER_NONE = "固定学习率"
+SCHEDULER_STEP = "StepLR"
+SCHEDULER_COSINE = "CosineAnnealingLR"
+SCHEDULER_PLATEAU = "ReduceLROnPlateau"
+SCHEDULERS = [SCHEDULER_NONE, SCHEDULER_STEP, SCHEDULER_COSINE, SCHEDULER_PLATEAU]
+
+History = Dict[str, List[float]]
+EpochCallback = Callable[[int, History], None]
+
+
+def get_optimizer(optimizer_name: str, parameters: Iterable, learning_rate: float):
+    """获取优化器"""
+    return OPTIMIZERS[optimizer_name](parameters, lr=learning_rate)
+
+
+def get_criterion(loss_name: str):
+    """获取损失函数"""
+    return CRITERIA[loss_name]()
+
+
+def get_scheduler(optimizer, train_params: dict):
+    """按 ``lr_scheduler`` 创建学习率调度器，固定学习率时返回 None
+
+    StepLR 每 ``lr_step_size`` 个epoch把学习率乘以 ``lr_gamma``；
+    CosineAnnealingLR 在 ``epochs`` 个epoch内按余弦曲线降到0；
+    ReduceLROnPlateau 在验证损失连续 ``lr_patience`` 个epoch未下降时把学习率乘以 ``lr_gamma``。
+    """
+    name = train_params.get("lr_scheduler", SCHEDULER_NONE)
+    gamma = train_params.get("lr_gamma", 0.1)
+    if name == SCHEDULER_NONE:
+        return None
+    if name == SCHEDULER_STEP:
+        return optim.lr_scheduler.StepLR(optimizer, step_size=train_params.get("lr_step_size", 10),
+                                         gamma=gamma)
+    if name == SCHEDULER_COSINE:
+        return optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=max(1, train_params["epochs"]))
+    if name == SCHEDULER_PLATEAU:
+        return optim.lr_scheduler.ReduceLROnPlateau(optimizer, factor=gamma,
+                                                    patience=train_params.get("lr_patience", 5))
+    raise ValueError(f"不支持的学习率调度器: {name}")
+
+
+def new_history() -> History:
+    """空的训练历史记录"""
+    return {"loss": [], "val_loss": [], "accuracy": [], "val_accuracy": []}
+
+
+class Trainer:
+    """按 train_params 训练模型
+
+    子类可以替换前向计算、梯度同步、停止判断和指标汇总，
+    数据并行训练通过这些方法接入 DistributedDataParallel。
+
+    ``early_stopping_patience`` 大于0时，验证损失连续这么多个epoch没有比最佳值
+    降低超过 ``early_stopping_min_delta`` 就提前结束；``restore_best_weights`` 为真时
+    在内存中保留验证损失最低时的参数，训练结束后恢复。
+    每个epoch使用的学习率记录在 ``lr_history`` 中，不放入历史记录。
+
+    ``checkpoint_dir`` 不为空时每 ``checkpoint_interval`` 个epoch保存一次检查点，
+    最多保留 ``checkpoint_keep`` 个；``resume_from`` 指定检查点时从其下一个epoch继续训练。
+
+    ``telemetry`` 为真时记录每个训练步骤各阶段的耗时，写入性能监控器。
+    ``profile_steps`` 大于0时用 torch.profiler 分析第一个批次之后的若干个训练步骤，
+    结果汇总在 ``profile_summary`` 中。
+    """
+
+    def __init__(self, model: nn.Module, train_params: dict,
+                 device: Optional[torch.device] = None):
+        if device is None:
+            device = torch.device("cuda" if train_params["use_gpu"] and
+                                  torch.cuda.is_available() else "cpu")
+        self.device = device
+        self.model = model.to(device)
+        self.train_params = train_params
+        self.is_running = True
+        self.best_epoch = None  # 验证损失最低的epoch，从0开始
+        self.stopped_early = False
+        self.is_main = True  # 是否负责写检查点，数据并行时只有0号进程写
+        self.profile_summary = None  # 算子分析结果，见 models.profiling.ProfileWindow
+        self.lr_history: List[float] = []  # 每个epoch使用的学习率
+
+    def build_forward(self):
+        """编译后的前向计算与模型共享参数，第一个批次到达时才编译"""
+        return CompiledModel(self.model, self.train_params.get("compile_mode", COMPILE_MODE_NONE),
+                             for_training=True)
+
+    def build_telemetry(self):
+        """训练步骤遥测，未开启时返回不做任何事的实现"""
+        if self.train_params.get("telemetry", False) and self.is_main:
+            return StepTelemetry(self.device)
+        return NullTelemetry()
+
+    def build_profiler(self):
+        """算子分析窗口，未开启时返回不做任何事的实现"""
+        steps = self.train_params.get("profile_steps", 0)
+        if steps > 0 and self.is_main:
+            return ProfileWindow("training", steps, device=self.device)
+        return NullProfileWindow()
+
+    def no_sync(self):
+        """累积梯度、暂不更新参数的微批次在此上下文中反向传播"""
+        return contextlib.nullcontext()
+
+    def should_stop(self) -> bool:
+        """每个epoch开始前检查是否停止训练"""
+        return not self.is_running
+
+    def reduce_metrics(self, metrics: MetricAccumulator) -> Dict[str, float]:
+        """汇总一个epoch的指标"""
+        return metrics.compute()
+
+    def stop(self):
+        """停止训练，当前epoch结束后生效"""
+        self.is_running = False
+
+    @traced(category="training")
+    def fit(self, train_loader, val_loader,
+            on_epoch_end: Optional[EpochCallback] = None) -> History:
+        """训练 ``epochs`` 轮，每轮结束后以 (epoch, history) 调用 ``on_epoch_end``"""
+        device = self.device
+        forward = self.build_forward()
+
+        # 混合精度：CPU上使用bfloat16，GPU上使用float16并配合梯度缩放防止下溢
+        use_amp = self.train_params.get("mixed_precision", False)
+        amp_dtype = torch.float16 if device.type == "cuda" else torch.bfloat16
+        scaler = torch.amp.GradScaler(device.type, enabled=use_amp and device.type == "cuda")
+
+        optimizer = get_optimizer(self.train_params["optimizer"], self.model.parameters(),
+                                  self.train_params["learning_rate"])
+
+        # 梯度累积：每个微批次的损失除以累积步数，累积满后更新一次参数
+        accumulation_steps = max(1, self.train_params.get("accumulation_steps", 1))
+
+        def optimizer_step():
+            scaler.step(optimizer)
+            scaler.update()
+            optimizer.zero_grad()
+
+        scheduler = get_scheduler(optimizer, self.train_params)
+        telemetry = self.build_telemetry()
+        profiler = self.build_profiler()
+        self.profile_summary = None
+
+        # 早停和最佳参数：比较全体样本上汇总后的验证损失，数据并行时各进程的判断一致
+        patience = self.train_params.get("early_stopping_patience", 0)
+        min_delta = self.train_params.get("early_stopping_min_delta", 0.0)
+        restore_best = self.train_params.get("restore_best_weights", False)
+        best_loss = float("inf")
+        best_state = None
+        bad_epochs = 0
+        self.best_epoch = None
+        self.stopped_early = False
+
+        loss_function = self.train_params["loss_function"]
+        criterion = get_criterion(loss_function)
+
+        epochs = self.train_params["epochs"]
+        history = new_history()
+        self.lr_history = []
+
+        start_epoch = 0
+        resume_from = self.train_params.get("resume_from")
+        if resume_from:
+            state = load_checkpoint(resume_from)
+            # 单进程和多进程训练的检查点可以互相继续
+            self.model.load_state_dict(from_checkpoint_keys(self.model, state["model"]))
+            optimizer.load_state_dict(state["optimizer"])
+            if scheduler is not None and state.get("scheduler") is not None:
+                scheduler.load_state_dict(state["scheduler"])
+            if state["scaler"]:
+                scaler.load_state_dict(state["scaler"])
+            torch.set_rng_state(state["rng_state"])
+            history = state["history"]
+            self.lr_history = state.get("lr_history", [])
+            best_loss, self.best_epoch, bad_epochs = state["best_loss"], state["best_epoch"], state["bad_epochs"]
+            if restore_best and state.get("best_state") is not None:
+                best_state = {k: v.to(device) for k, v in
+                              from_checkpoint_keys(self.model, state["best_state"]).items()}
+            start_epoch = state["epoch"] + 1
+
+        checkpoint_dir = self.train_params.get("checkpoint_dir")
+        checkpoint_interval = max(1, self.train_params.get("checkpoint_interval", 1))
+        writer = None
+        if checkpoint_dir and self.is_main:
+            writer = CheckpointWriter(checkpoint_dir, self.train_params.get("checkpoint_keep"))
+
+        # 指标在设备上累计，每个epoch只同步一次
+        sync_interval = self.train_params.get("metric_sync_interval", 0)
+        train_metrics = MetricAccumulator(device, sync_interval)
+        val_metrics = MetricAccumulator(device, sync_interval)
+
+        profiler.start()
+        try:
+            for epoch in range(start_epoch, epochs):
+                if self.should_stop():
+                    break
+                if hasattr(train_loader, "set_epoch"):
+                    train_loader.set_epoch(epoch)
+
+                # 训练模式
+                with trace_span("train", "training", epoch=epoch):
+                    self.model.train()
+                    train_metrics.reset()
+
+                    optimizer.zero_grad()
+                    num_batches = len(train_loader) if hasattr(train_loader, "__len__") else None
+                    pending = 0  # 已累积梯度、尚未更新参数的微批次数
+                    telemetry.start_epoch()
+                    for i, (inputs, targets) in enumerate(train_loader):
+                        telemetry.mark(STAGE_DATA)
+                        inputs, targets = inputs.to(device), targets.to(device)
+                        if loss_function == "CrossEntropyLoss":
+                            targets = targets.to(torch.long)
+                        telemetry.mark(STAGE_H2D)
+                        pending += 1
+                        # 本批次之后不更新参数时跳过梯度同步；epoch的最后一个批次必须同步
+                        syncing = pending == accumulation_steps or i + 1 == num_batches
+                        with contextlib.nullcontext() if syncing else self.no_sync():
+                            with torch.autocast(device.type, dtype=amp_dtype, enabled=use_amp):
+                                outputs = forward(inputs)
+                            # 损失和指标始终按float32计算，历史记录与不开启混合精度时一致
+                            outputs = outputs.to(torch.float32)
+                            loss = criterion(outputs, targets)
+                            telemetry.mark(STAGE_FORWARD)
+                            scaler.scale(loss / accumulation_steps).backward()
+                            telemetry.mark(STAGE_BACKWARD)
+                        if pending == accumulation_steps:
+                            optimizer_step()
+                            pending = 0
+
+                        # 指标使用未缩放的损失
+                        train_metrics.update(loss, outputs, targets)
+                        # 指标累计只是设备上的加法，耗时计入参数更新阶段
+                        telemetry.mark(STAGE_OPTIMIZER)
+                        telemetry.end_step(len(inputs))
+                        profiler.step()
+
+                    if pending:
+                        # epoch末尾不足一组时按实际微批次数修正梯度后再更新
+                        for param in self.model.parameters():
+                            if param.grad is not None:
+                                param.grad.mul_(accumulation_steps / pending)
+                        optimizer_step()
+                    telemetry.end_epoch(epoch)
+
+                # 验证模式
+                with trace_span("validate", "training", epoch=epoch):
+                    self.model.eval()
+                    val_metrics.reset()
+
+                    with torch.no_grad():
+                        for inputs, targets in val_loader:
+                            inputs, targets = inputs.to(device), targets.to(device)
+                            if loss_function == "CrossEntropyLoss":
+                                targets = targets.to(torch.long)
+                            with torch.autocast(device.type, dtype=amp_dtype, enabled=use_amp):
+                                outputs = forward(inputs)
+                            outputs = outputs.to(torch.float32)
+                            loss = criterion(outputs, targets)
+
+                            val_metrics.update(loss, outputs, targets)
+
+                # 更新历史记录
+                train_result = self.reduce_metrics(train_metrics)
+                val_result = self.reduce_metrics(val_metrics)
+                history["loss"].append(train_result["loss"])
+                history["val_loss"].append(val_result["loss"])
+                history["accuracy"].append(train_result["accuracy"])
+                history["val_accuracy"].append(val_result["accuracy"])
+                self.lr_history.append(optimizer.param_groups[0]["lr"])
+
+                val_loss = val_result["loss"]
+                if scheduler is not None:
+                    if isinstance(scheduler, optim.lr_scheduler.ReduceLROnPlateau):
+                        scheduler.step(val_loss)
+                    else:
+                        scheduler.step()
+
+                if val_loss < best_loss - min_delta:
+                    best_loss = val_loss
+                    self.best_epoch = epoch
+                    bad_epochs = 0
+                    if restore_best:
+                        # 复制到同一设备上，不需要主机同步
+                        best_state = {k: v.detach().clone() for k, v in self.model.state_dict().items()}
+                else:
+                    bad_epochs += 1
+
+                if on_epoch_end is not None:
+                    on_epoch_end(epoch, history)
+
+                self.stopped_early = bool(patience) and bad_epochs >= patience
+                last_epoch = epoch + 1 == epochs or self.stopped_early
+                if writer is not None and ((epoch + 1) % checkpoint_interval == 0 or last_epoch):
+                    # 训练线程只负责复制到CPU，序列化和写盘在后台线程完成
+                    with trace_span("checkpoint", "training", epoch=epoch):
+                        writer.submit(epoch, snapshot({
+                            "epoch": epoch,
+                            "model": to_checkpoint_keys(self.model, self.model.state_dict()),
+                            "optimizer": optimizer.state_dict(),
+                            "scheduler": scheduler.state_dict() if scheduler is not None else None,
+                            "scaler": scaler.state_dict(),
+                            "rng_state": torch.get_rng_state(),
+                            "history": history,
+                            "lr_history": self.lr_history,
+                            "best_loss": best_loss,
+                            "best_epoch": self.best_epoch,
+                            "bad_epochs": bad_epochs,
+                            "best_state": to_checkpoint_keys(self.model, best_state),
+                            "train_params": dict(self.train_params)
+                        }))
+
+                if self.stopped_early:
+                    break
+        finally:
+            profiler.stop()
+            self.profile_summary = profiler.summary
+            if writer is not None:
+                writer.close()
+
+        if best_state is not None:
+            self.model.load_state_dict(best_state)
+        return history
@@ -0,0 +1,77 @@
+"""
+无界面批量打分入口
+从数据库加载模型结构和权重文件，对输入CSV分批推理并把结果写入文件，
+可在没有显示器的服务器或定时任务中运行
+
+用法:
+    python score.py --model-id 3 --weights saved_models/1_model.pth \
+        --input data/input.csv --output predictions.csv
+"""
+import argparse
+import sys
+import os
+import time
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(project_root)
+
+import torch
+from models.inference import InferenceEngine, iter_feature_chunks, load_model, prefetch
+from models.dataset import DEFAULT_CHUNK_SIZE
+from utils.logger import logger
+
+TASK_TYPES = {"classification": "分类", "regression": "回归"}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="使用已训练的模型对CSV文件批量打分")
+    parser.add_argument("--model-id", type=int, required=True, help="models表中的模型ID")
+    parser.add_argument("--weights", required=True, help="模型权重文件 (.pth)")
+    parser.add_argument("--input", required=True, help="输入数据文件 (CSV或Excel)")
+    parser.add_argument("--output", required=True, help="预测结果输出CSV文件")
+    parser.add_argument("--columns", help="用作特征的列名，用逗号分隔，默认使用全部列")
+    parser.add_argument("--task", choices=sorted(TASK_TYPES), default="classification",
+                        help="任务类型，默认 classification")
+    parser.add_argument("--batch-size", type=int, default=4096, help="每批推理的样本数")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="每次从输入文件读取的行数")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="PyTorch计算线程数，默认使用全部核心")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """命令行主入口，返回退出码"""
+    args = parse_args(argv)
+    try:
+        if args.threads:
+            torch.set_num_threads(args.threads)
+
+        logger.info(f"加载模型 {args.model_id}，权重: {args.weights}")
+        model = load_model(args.model_id, args.weights)
+
+        columns = [c.strip() for c in args.columns.split(",")] if args.columns else None
+        engine = InferenceEngine(model, args.batch_size, TASK_TYPES[args.task])
+
+        start_time = time.perf_counter()
+        # 读取下一块数据的同时对当前块推理
+        chunks = prefetch(iter_feature_chunks(args.input, columns, args.chunk_size))
+        total = engine.run_chunks(
+            chunks, args.output,
+            progress_callback=lambda rows: logger.info(f"已完成 {rows} 行")
+        )
+        elapsed = time.perf_counter() - start_time
+
+        rate = total / elapsed if elapsed > 0 else float("inf")
+        logger.info(f"打分完成: {total} 行，耗时 {elapsed:.2f}s ({rate:.0f} 行/秒)，结果: {args.output}")
+        return 0
+
+    except Exception as e:
+        logger.error(f"批量打分失败: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""
+本地模型服务
+通过 HTTP 提供模型推理接口，并把并发到达的请求合并成小批次统一前向计算
+
+接口:
+    POST /predict  请求体为 JSON {"inputs": [[...], ...]}，返回 {"predictions": [...]}；
+                   Content-Type 为 application/x-npy 时请求体和响应体都是 np.save 格式
+    GET  /health   健康检查
+    GET  /stats    最近一段时间的延迟分位数和吞吐量
+
+用法:
+    python -m services.model_server --model-id 3 --weights saved_models/1_model.pth --port 8000
+"""
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Empty, Queue
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+import torch
+import torch.nn as nn
+from models.inference import InferenceEngine, load_model
+from utils.logger import logger
+from utils.performance_monitor import PerformanceMonitor, get_performance_monitor
+
+NPY_CONTENT_TYPE = "application/x-npy"
+STATS_WINDOW = 60.0
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """动态小批次合并器
+
+    后台线程取到第一个请求后，最多再等待 ``max_latency_ms`` 毫秒收集后续请求，
+    凑够 ``max_batch_size`` 行或等待超时即合并执行一次前向计算，再把结果按行拆回各请求。
+    合并后的批次出错时逐个请求重新执行，只有出错的请求收到异常。
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 256, max_latency_ms: float = 5.0,
+                 monitor: Optional[PerformanceMonitor] = None):
+        if max_batch_size < 1:
+            raise ValueError(f"批次大小必须大于0: {max_batch_size}")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.monitor = monitor or get_performance_monitor()
+        self._queue: Queue = Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """启动合并线程"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """处理完已排队的请求后停止合并线程"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, inputs: np.ndarray) -> Future:
+        """提交一个二维输入，返回对应预测结果的 Future"""
+        future: Future = Future()
+        self._queue.put((inputs, future))
+        return future
+
+    def _loop(self):
+        """合并线程主循环"""
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            rows = len(item[0])
+            deadline = time.perf_counter() + self.max_latency
+            while rows < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except Empty:
+                    break
+                if item is _STOP:
+                    running = False
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[Tuple[np.ndarray, Future]]):
+        """执行一个合并后的批次并把结果分发给各请求"""
+        try:
+            inputs = np.concatenate([part for part, _ in batch])
+            outputs = self.predict_fn(inputs)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # 不知道是哪个请求导致的错误，逐个重新执行，其他请求不受影响
+            logger.warning(f"合并批次推理失败，逐个请求重试: {str(e)}")
+            for item in batch:
+                self._run_batch([item])
+            return
+
+        self.monitor.add_metric("serving_batch_size", len(inputs), "rows", category="serving")
+        offset = 0
+        for part, future in batch:
+            future.set_result(outputs[offset:offset + len(part)])
+            offset += len(part)
+
+
+def input_features(model: nn.Module) -> Optional[int]:
+    """模型第一个全连接层的输入特征数，无法推断时返回 None"""
+    for module in model.modules():
+        # 动态量化后的全连接层不是 nn.Linear 的子类，但同样有 in_features
+        in_features = getattr(module, "in_features", None)
+        if isinstance(in_features, int):
+            return in_features
+    return None
+
+
+class _PredictHandler(BaseHTTPRequestHandler):
+    """HTTP 请求处理器，实际推理交给 ModelServer"""
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send_json(200, self.server.model_server.get_stats())
+        else:
+            self._send_json(404, {"error": f"未知路径: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"未知路径: {self.path}"})
+            return
+
+        use_npy = NPY_CONTENT_TYPE in self.headers.get("Content-Type", "")
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if use_npy:
+                inputs = np.load(io.BytesIO(body), allow_pickle=False)
+            else:
+                inputs = json.loads(body)["inputs"]
+            inputs = self.server.model_server.check_inputs(np.asarray(inputs, dtype=np.float32))
+        except (ValueError, KeyError, TypeError, EOFError, OSError) as e:
+            # 空的或截断的npy请求体会引发 EOFError
+            self._send_json(400, {"error": f"无法解析输入: {str(e)}"})
+            return
+
+        try:
+            predictions = self.server.model_server.predict(inputs)
+        except Exception as e:
+            logger.error(f"模型服务推理失败: {str(e)}")
+            self._send_json(500, {"error": str(e)})
+            return
+
+        if use_npy:
+            buffer = io.BytesIO()
+            np.save(buffer, predictions, allow_pickle=False)
+            self._send(200, buffer.getvalue(), NPY_CONTENT_TYPE)
+        else:
+            self._send_json(200, {"predictions": predictions.tolist()})
+
+    def _send_json(self, status: int, payload: dict):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                   "application/json; charset=utf-8")
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"模型服务 {self.address_string()} {format % args}")
+
+
+class ModelServer:
+    """本地 HTTP 模型服务"""
+
+    def __init__(self, model: nn.Module, host: str = "127.0.0.1", port: int = 8000,
+                 task_type: str = "分类", max_batch_size: int = 256,
+                 max_latency_ms: float = 5.0, monitor: Optional[PerformanceMonitor] = None):
+        self.engine = InferenceEngine(model, task_type=task_type)
+        self.input_size = input_features(model)
+        self.monitor = monitor or get_performance_monitor()
+        self.batcher = MicroBatcher(self._predict_batch, max_batch_size, max_latency_ms, self.monitor)
+        self.host = host
+        self.port = port
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_time: Optional[float] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """在后台线程中启动服务；port 为 0 时由系统分配空闲端口"""
+        if self._httpd is not None:
+            return
+        self.engine.model.eval()
+        self.batcher.start()
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _PredictHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.model_server = self
+        self.port = self._httpd.server_address[1]
+        self._start_time = time.time()
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"模型服务已启动: {self.url}")
+
+    def stop(self):
+        """停止服务"""
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+        self.batcher.stop()
+        self._httpd = None
+        self._thread = None
+        logger.info("模型服务已停止")
+
+    def _predict_batch(self, inputs: np.ndarray) -> np.ndarray:
+        """在合并线程中执行一次前向计算"""
+        with torch.inference_mode():
+            predictions = self.engine.predict_batch(torch.from_numpy(inputs))
+        return predictions.cpu().numpy()
+
+    def check_inputs(self, inputs: np.ndarray) -> np.ndarray:
+        """检查输入形状，一维输入视为单个样本；形状不符时抛出 ValueError，不进入合并批次"""
+        if inputs.ndim == 1:
+            inputs = inputs[np.newaxis, :]
+        if inputs.ndim != 2:
+            raise ValueError(f"输入必须是一维或二维数组: {inputs.shape}")
+        if self.input_size is not None and inputs.shape[1] != self.input_size:
+            raise ValueError(f"输入特征数为 {inputs.shape[1]}，模型需要 {self.input_size} 个")
+        return inputs
+
+    def predict(self, inputs: np.ndarray) -> np.ndarray:
+        """提交一次请求并等待结果"""
+        inputs = self.check_inputs(inputs)
+        start = time.perf_counter()
+        predictions = self.batcher.submit(inputs).result()
+        latency = (time.perf_counter() - start) * 1000
+        self.monitor.add_metric("serving_latency", latency, "ms", category="serving")
+        return predictions
+
+    def get_stats(self, time_window: float = STATS_WINDOW) -> dict:
+        """最近 time_window 秒内的请求数、p50/p99 延迟(ms)和吞吐量(请求/秒)"""
+        latency = self.monitor.get_metric_percentiles(
+            "serving_latency", (50, 99), time_window) or {"count": 0, "p50": None, "p99": None}
+        elapsed = min(time_window, time.time() - self._start_time) if self._start_time else 0
+        return {
+            "requests": latency["count"],
+            "p50_ms": latency["p50"],
+            "p99_ms": latency["p99"],
+            "throughput_rps": latency["count"] / elapsed if elapsed > 0 else 0.0,
+            "avg_batch_size": self.monitor.get_average_metric("serving_batch_size", time_window),
+        }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="启动本地模型推理服务")
+    parser.add_argument("--model-id", type=int, required=True, help="models表中的模型ID")
+    parser.add_argument("--weights", required=True, help="模型权重文件 (.pth)")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址，默认只监听本机")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    parser.add_argument("--task", choices=["classification", "regression"], default="classification",
+                        help="任务类型，默认 classification")
+    parser.add_argument("--max-batch-size", type=int, default=256, help="合并批次的最大行数")
+    parser.add_argument("--max-latency-ms", type=float, default=5.0,
+                        help="收集同一批次请求的最长等待时间(毫秒)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="PyTorch计算线程数，默认使用全部核心")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """命令行主入口，返回退出码"""
+    args = parse_args(argv)
+    try:
+        if args.threads:
+            torch.set_num_threads(args.threads)
+        model = load_model(args.model_id, args.weights)
+        task_type = "分类" if args.task == "classification" else "回归"
+        server = ModelServer(model, args.host, args.port, task_type,
+                             args.max_batch_size, args.max_latency_ms)
+    except Exception as e:
+        logger.error(f"启动模型服务失败: {str(e)}")
+        return 1
+
+    server.start()
+    try:
+        while True:
+            time.sleep(STATS_WINDOW)
+            logger.info(f"模型服务统计: {server.get_stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+无界面超参数搜索入口
+从数据库加载模型结构，对CSV数据并行训练多组超参数，
+结果写入 sweep_trials 表并打印按验证损失排序的列表
+
+用法:
+    python sweep.py --model-id 3 --data data/train.csv --features a,b,c --label y \
+        --lr 0.1,0.01,0.001 --batch-sizes 32,64 --optimizers Adam,SGD --epochs 27 --workers 8
+    python sweep.py --model-id 3 --data data/train.csv --features a,b,c --label y \
+        --mode random --trials 50 --lr 0.0001,0.1
+"""
+import argparse
+import os
+import sys
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(project_root)
+
+from models.dataset import build_tabular_datasets, read_table
+from models.neural_network import NNModel
+from models.sweep import (SweepRunner, grid_trials, random_trials, new_sweep_id, parse_values,
+                          save_sweep_results)
+from models.trainer import CRITERIA
+from utils.logger import logger
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="并行搜索训练超参数")
+    parser.add_argument("--model-id", type=int, required=True, help="models表中的模型ID")
+    parser.add_argument("--user-id", type=int, help="记录搜索结果的用户ID")
+    parser.add_argument("--data", required=True, help="训练数据文件 (CSV或Excel)")
+    parser.add_argument("--features", required=True, help="特征列名，用逗号分隔")
+    parser.add_argument("--label", required=True, help="标签列名")
+    parser.add_argument("--loss", choices=sorted(CRITERIA), default="CrossEntropyLoss", help="损失函数")
+    parser.add_argument("--mode", choices=["grid", "random"], default="grid", help="搜索方式")
+    parser.add_argument("--trials", type=int, default=20, help="随机搜索的试验次数")
+    parser.add_argument("--lr", default="0.01,0.001", help="学习率候选值；随机搜索时取最小到最大值的对数均匀分布")
+    parser.add_argument("--batch-sizes", default="32", help="批次大小候选值")
+    parser.add_argument("--optimizers", default="Adam", help="优化器候选值")
+    parser.add_argument("--epochs", default="10", help="训练轮数候选值")
+    parser.add_argument("--workers", type=int, default=None, help="并行试验数，默认使用全部核心")
+    parser.add_argument("--threads", type=int, default=None, help="每个试验的计算线程数")
+    parser.add_argument("--min-epochs", type=int, default=1, help="逐次减半第一轮的训练轮数")
+    parser.add_argument("--reduction-factor", type=int, default=3, help="每轮保留 1/N 的试验")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """命令行主入口，返回退出码"""
+    args = parse_args(argv)
+    try:
+        model = NNModel.load(model_id=args.model_id, user_id=args.user_id)
+        features = parse_values(args.features, str)
+        df = read_table(args.data, usecols=features + [args.label])
+        train_dataset, val_dataset = build_tabular_datasets(df, features, args.label,
+                                                            val_ratio=0.2, seed=42)
+
+        learning_rates = parse_values(args.lr, float)
+        space = {
+            "learning_rate": learning_rates,
+            "batch_size": parse_values(args.batch_sizes, int),
+            "optimizer": parse_values(args.optimizers, str),
+            "epochs": parse_values(args.epochs, int)
+        }
+        if args.mode == "random":
+            if min(learning_rates) < max(learning_rates):
+                space["learning_rate"] = (min(learning_rates), max(learning_rates))
+            trials = random_trials(space, args.trials)
+        else:
+            trials = grid_trials(space)
+
+        base_params = {"loss_function": args.loss, "use_gpu": False}
+        runner = SweepRunner(model, base_params, train_dataset, val_dataset,
+                             max_workers=args.workers, threads_per_trial=args.threads,
+                             min_epochs=args.min_epochs, reduction_factor=args.reduction_factor)
+        results = runner.run(
+            trials,
+            on_trial_done=lambda r: logger.info(
+                f"试验 {r['trial']} 训练 {r['epochs']} 轮，验证损失 {r['val_loss']}")
+        )
+
+        sweep_id = new_sweep_id()
+        save_sweep_results(model.db, sweep_id, results, user_id=args.user_id, model_id=args.model_id)
+
+        print(f"搜索 {sweep_id} 完成，按验证损失排序:")
+        for result in results:
+            params = result["params"]
+            val_loss = f"{result['val_loss']:.4f}" if result["val_loss"] is not None else "-"
+            print(f"  #{result['trial']:<4}{result['status']:<10}lr={params['learning_rate']:<10.4g}"
+                  f"batch={params['batch_size']:<6}{params['optimizer']:<8}"
+                  f"epochs={result['epochs']}/{params['epochs']:<6}val_loss={val_loss}")
+        return 0
+
+    except Exception as e:
+        logger.error(f"超参数搜索失败: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+"""
+测试公用的模型构建函数
+"""
+
+import torch
+
+from models.neural_network import NNModel, NNLayer
+
+
+def build_model(in_features: int = 4, hidden: int = 8, out_features: int = 3, seed: int = 0) -> NNModel:
+    """构建测试用的 Linear-ReLU-Linear 小型模型，参数由 ``seed`` 决定"""
+    torch.manual_seed(seed)
+    model = NNModel()
+    model.add_layer(NNLayer("Linear", {"in_features": in_features, "out_features": hidden}))
+    model.add_layer(NNLayer("Relu", {}))
+    model.add_layer(NNLayer("Linear", {"in_features": hidden, "out_features": out_features}))
+    return model
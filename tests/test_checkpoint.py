@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+训练检查点测试
+测试后台写入、旧检查点轮换以及从检查点继续训练
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import torch
+from torch.utils.data import TensorDataset, DataLoader
+
+from models.checkpoint import (CheckpointWriter, checkpoint_path, latest_checkpoint, list_checkpoints,
+                               list_runs, load_checkpoint, new_run_directory, prune_runs, snapshot)
+from models.trainer import Trainer
+from tests.helpers import build_model
+
+
+def build_loaders():
+    """构建随机分类数据加载器，训练集每个epoch按全局随机数打乱"""
+    generator = torch.Generator().manual_seed(0)
+    X = torch.randn(100, 4, generator=generator)
+    y = (X[:, 0] > 0).float() + (X[:, 1] > 0).float()
+    return (DataLoader(TensorDataset(X[:80], y[:80]), batch_size=16, shuffle=True),
+            DataLoader(TensorDataset(X[80:], y[80:]), batch_size=16))
+
+
+def train_params(**overrides) -> dict:
+    params = {
+        "learning_rate": 0.01,
+        "batch_size": 16,
+        "epochs": 4,
+        "optimizer": "Adam",
+        "loss_function": "CrossEntropyLoss",
+        "use_gpu": False
+    }
+    params.update(overrides)
+    return params
+
+
+class TestCheckpointWriter(unittest.TestCase):
+    """测试后台写入器"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, "run")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_rotation_keeps_latest(self):
+        """只保留最新的 max_keep 个检查点"""
+        writer = CheckpointWriter(self.directory, max_keep=2)
+        for epoch in range(5):
+            writer.submit(epoch, {"epoch": epoch})
+            writer.flush()
+        writer.close()
+
+        paths = list_checkpoints(self.directory)
+        self.assertEqual(paths, [checkpoint_path(self.directory, 3), checkpoint_path(self.directory, 4)])
+        self.assertEqual(load_checkpoint(latest_checkpoint(self.directory))["epoch"], 4)
+        self.assertEqual(writer.written, 5)
+
+    def test_close_writes_pending_snapshot(self):
+        """关闭时写完最后提交的快照，不留下临时文件"""
+        writer = CheckpointWriter(self.directory, max_keep=10)
+        for epoch in range(3):
+            writer.submit(epoch, {"epoch": epoch})
+        writer.close()
+
+        self.assertEqual(load_checkpoint(latest_checkpoint(self.directory))["epoch"], 2)
+        self.assertFalse([f for f in os.listdir(self.directory) if f.endswith(".tmp")])
+
+    def test_snapshot_is_independent_copy(self):
+        """快照之后继续修改参数不影响快照内容"""
+        weight = torch.ones(3)
+        state = snapshot({"model": {"weight": weight}, "history": {"loss": [1.0]}})
+        weight.add_(1)
+        self.assertTrue(torch.equal(state["model"]["weight"], torch.ones(3)))
+
+    def test_latest_checkpoint_missing(self):
+        self.assertIsNone(latest_checkpoint(self.directory))
+
+
+class TestResumeTraining(unittest.TestCase):
+    """测试训练中保存检查点并继续训练"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _fit(self, **params):
+        model = build_model()
+        torch.manual_seed(1)
+        history = Trainer(model, train_params(**params)).fit(*build_loaders())
+        return model, history
+
+    def test_resume_matches_uninterrupted_run(self):
+        """中断后从检查点继续训练，参数和历史记录与不中断时一致"""
+        reference, reference_history = self._fit(epochs=4)
+
+        directory = os.path.join(self.temp_dir.name, "run")
+        self._fit(epochs=2, checkpoint_dir=directory, checkpoint_keep=3)
+        checkpoint = latest_checkpoint(directory)
+        self.assertEqual(load_checkpoint(checkpoint)["epoch"], 1)
+
+        model = build_model()
+        trainer = Trainer(model, train_params(epochs=4, resume_from=checkpoint))
+        history = trainer.fit(*build_loaders())
+
+        self.assertEqual(len(history["loss"]), 4)
+        self.assertEqual(len(trainer.lr_history), 4)
+        for key in ("loss", "val_loss"):
+            for actual, expected in zip(history[key], reference_history[key]):
+                self.assertAlmostEqual(actual, expected, places=5)
+        for a, b in zip(model.parameters(), reference.parameters()):
+            torch.testing.assert_close(a, b)
+
+    def test_interval_and_rotation(self):
+        """按间隔保存，最后一个epoch总会保存，超出上限的旧检查点被删除"""
+        directory = os.path.join(self.temp_dir.name, "run")
+        self._fit(epochs=5, checkpoint_dir=directory, checkpoint_interval=2, checkpoint_keep=2)
+
+        self.assertEqual(list_checkpoints(directory),
+                         [checkpoint_path(directory, 3), checkpoint_path(directory, 4)])
+
+    def test_fresh_run_after_longer_run(self):
+        """较长的旧运行之后从头训练，新检查点不会被旧运行的轮换删除，继续训练时使用新运行的检查点"""
+        base = self.temp_dir.name
+        old_run = new_run_directory(base)
+        self._fit(epochs=10, checkpoint_dir=old_run, checkpoint_keep=3)
+        new_run = new_run_directory(base)
+        self._fit(epochs=3, checkpoint_dir=new_run, checkpoint_keep=3)
+
+        self.assertEqual(list_runs(base), [old_run, new_run])
+        self.assertEqual(list_checkpoints(new_run), [checkpoint_path(new_run, epoch) for epoch in range(3)])
+        self.assertEqual(len(list_checkpoints(old_run)), 3)
+        checkpoint = latest_checkpoint(base)
+        self.assertEqual(os.path.dirname(checkpoint), new_run)
+        self.assertEqual(load_checkpoint(checkpoint)["epoch"], 2)
+
+        prune_runs(base, 1)
+        self.assertEqual(list_runs(base), [new_run])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+编译执行模式测试
+测试 TorchScript 跟踪结果的正确性、训练时的参数共享和编译失败时的回退
+"""
+
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import torch
+
+from models.compiled import (CompiledModel, compile_model, trace_model, COMPILE_MODE_COMPILE,
+                             COMPILE_MODE_NONE, COMPILE_MODE_TRACE)
+from models.inference import InferenceEngine
+from models.neural_network import NNModel, NNLayer
+from tests.helpers import build_model
+
+
+def build_conv_model() -> NNModel:
+    """构建包含卷积层的模型"""
+    torch.manual_seed(0)
+    model = NNModel()
+    model.add_layer(NNLayer("Conv2d", {"in_channels": 1, "out_channels": 4, "kernel_size": 3}))
+    model.add_layer(NNLayer("Relu", {}))
+    model.add_layer(NNLayer("MaxPool2d", {"kernel_size": 2}))
+    return model
+
+
+class TestCompiledModel(unittest.TestCase):
+    """测试编译后的前向计算"""
+
+    def test_trace_matches_eager(self):
+        """跟踪后的推理结果与原模型一致，并支持不同批次大小"""
+        model = build_model().eval()
+        forward = CompiledModel(model, COMPILE_MODE_TRACE)
+
+        with torch.inference_mode():
+            for batch_size in (16, 5):
+                inputs = torch.randn(batch_size, 4)
+                torch.testing.assert_close(forward(inputs), model(inputs))
+        self.assertIsInstance(forward._forward, torch.jit.ScriptModule)
+
+    def test_trace_conv_model(self):
+        """含卷积的模型做融合优化后结果不变"""
+        model = build_conv_model().eval()
+        inputs = torch.randn(2, 1, 8, 8)
+        forward = CompiledModel(model, COMPILE_MODE_TRACE)
+
+        with torch.inference_mode():
+            torch.testing.assert_close(forward(inputs), model(inputs), rtol=1e-4, atol=1e-5)
+
+    def test_trace_optimize_for_inference(self):
+        """全连接模型做或不做 optimize_for_inference 结果都不变，默认保留示例批次上较快的一个"""
+        model = build_model().eval()
+        inputs = torch.randn(16, 4)
+        candidates = []
+
+        def pick_last(forwards, example_inputs):
+            candidates.extend(forwards)
+            return forwards[-1]
+
+        with torch.inference_mode():
+            for optimize in (False, True):
+                traced = trace_model(model, inputs, optimize=optimize)
+                torch.testing.assert_close(traced(inputs), model(inputs), rtol=1e-4, atol=1e-5)
+            with patch("models.compiled.fastest", side_effect=pick_last):
+                selected = trace_model(model, inputs)
+        self.assertEqual(len(candidates), 2)
+        self.assertIs(selected, candidates[1])
+
+    def test_training_trace_shares_parameters(self):
+        """训练模式的跟踪结果与原模型共享参数，优化器更新后前向结果随之变化"""
+        model = build_model()
+        forward = CompiledModel(model, COMPILE_MODE_TRACE, for_training=True)
+        optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+        inputs = torch.randn(8, 4)
+
+        before = forward(inputs).detach().clone()
+        loss = forward(inputs).pow(2).mean()
+        loss.backward()
+        self.assertIsNotNone(model.pytorch_layers[0].weight.grad)
+        optimizer.step()
+
+        after = forward(inputs).detach()
+        self.assertFalse(torch.allclose(before, after))
+        torch.testing.assert_close(after, model(inputs).detach())
+
+    def test_none_mode_uses_model(self):
+        """不编译时直接调用原模型"""
+        model = build_model()
+        forward = CompiledModel(model, COMPILE_MODE_NONE)
+        forward(torch.randn(2, 4))
+        self.assertIs(forward._forward, model)
+
+    def test_compile_falls_back_to_trace(self):
+        """torch.compile 不可用时回退到 TorchScript"""
+        model = build_model().eval()
+        with patch("models.compiled.torch.compile", side_effect=RuntimeError("no compiler")):
+            forward = compile_model(model, torch.randn(4, 4), COMPILE_MODE_COMPILE)
+        self.assertIsInstance(forward, torch.jit.ScriptModule)
+
+    def test_trace_failure_falls_back_to_eager(self):
+        """跟踪失败时使用原模型"""
+        model = build_model().eval()
+        with patch("models.compiled.torch.jit.trace", side_effect=RuntimeError("trace failed")):
+            forward = compile_model(model, torch.randn(4, 4), COMPILE_MODE_TRACE)
+        self.assertIs(forward, model)
+
+    def test_inference_engine_with_trace(self):
+        """推理引擎使用编译模式时预测结果不变"""
+        model = build_model().eval()
+        inputs = torch.randn(50, 4)
+        expected = InferenceEngine(model, batch_size=16).run(inputs)
+
+        predictions = InferenceEngine(model, batch_size=16, compile_mode=COMPILE_MODE_TRACE).run(inputs)
+
+        self.assertEqual(predictions.tolist(), expected.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+数据集构建测试
+测试 DataFrame 到训练张量的转换和数据划分
+"""
+
+import sys
+import os
+import pickle
+import unittest
+import tempfile
+from unittest.mock import Mock, patch
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import numpy as np
+import pandas as pd
+import torch
+
+from models.dataset import (build_tabular_datasets, dataframe_to_tensors, split_indices,
+                            TensorBatchLoader, build_streaming_datasets, StreamingTabularDataset,
+                            build_memmap_datasets, ShardedBatchLoader, TabularDataset,
+                            dataset_source, open_dataset_source)
+from models.dataset_cache import DatasetCache
+
+
+def make_dataframe(rows: int = 50) -> pd.DataFrame:
+    """生成包含整数和浮点列的测试数据"""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "a": rng.normal(size=rows),
+        "b": rng.integers(0, 10, size=rows),
+        "c": rng.normal(size=rows).astype(np.float32),
+        "label": rng.integers(0, 3, size=rows)
+    })
+
+
+class TestTabularDataset(unittest.TestCase):
+    """测试表格数据集构建"""
+
+    def test_tensors_are_float32_and_match_dataframe(self):
+        """转换结果应为 float32 且数值与原数据一致"""
+        df = make_dataframe()
+        features, labels = dataframe_to_tensors(df, ["a", "b", "c"], "label")
+
+        self.assertEqual(features.dtype, torch.float32)
+        self.assertEqual(labels.dtype, torch.float32)
+        self.assertTrue(features.is_contiguous())
+        np.testing.assert_allclose(features.numpy(), df[["a", "b", "c"]].values.astype(np.float32))
+        np.testing.assert_allclose(labels.numpy(), df["label"].values.astype(np.float32))
+
+    def test_splits_share_buffer(self):
+        """训练集和验证集应共享同一份底层数据"""
+        train_ds, val_ds = build_tabular_datasets(make_dataframe(), ["a", "b"], "label")
+
+        self.assertIs(train_ds.features, val_ds.features)
+        self.assertEqual(len(train_ds), 40)
+        self.assertEqual(len(val_ds), 10)
+        overlap = set(train_ds.indices.tolist()) & set(val_ds.indices.tolist())
+        self.assertFalse(overlap)
+
+        x, y = train_ds[0]
+        row = train_ds.indices[0]
+        self.assertTrue(torch.equal(x, train_ds.features[row]))
+        self.assertEqual(y.item(), train_ds.labels[row].item())
+
+    def test_split_is_deterministic(self):
+        """相同的随机种子应得到相同的划分"""
+        first = split_indices(100, 0.2, seed=7)
+        second = split_indices(100, 0.2, seed=7)
+        self.assertTrue(torch.equal(first[0], second[0]))
+        self.assertTrue(torch.equal(first[1], second[1]))
+
+
+class TestTensorBatchLoader(unittest.TestCase):
+    """测试批量切片加载器"""
+
+    def setUp(self):
+        self.train_ds, self.val_ds = build_tabular_datasets(make_dataframe(), ["a", "b", "c"], "label")
+
+    def test_covers_every_row_once(self):
+        """打乱后每个样本在一个epoch内恰好出现一次"""
+        loader = TensorBatchLoader(self.train_ds, batch_size=16, shuffle=True)
+        self.assertEqual(len(loader), 3)
+
+        seen = []
+        for inputs, targets in loader:
+            self.assertEqual(inputs.shape[1], 3)
+            self.assertEqual(len(inputs), len(targets))
+            seen.append(inputs)
+        seen = torch.cat(seen)
+        expected = self.train_ds.features[self.train_ds.indices]
+        self.assertEqual(len(seen), len(expected))
+        self.assertEqual(sorted(map(tuple, seen.tolist())), sorted(map(tuple, expected.tolist())))
+
+    def test_unshuffled_order_and_drop_last(self):
+        """不打乱时按索引顺序输出，drop_last丢弃不完整批次"""
+        loader = TensorBatchLoader(self.val_ds, batch_size=4, shuffle=False)
+        inputs, targets = next(iter(loader))
+        self.assertTrue(torch.equal(inputs, self.val_ds.features[self.val_ds.indices[:4]]))
+        self.assertEqual(len(loader), 3)
+
+        loader = TensorBatchLoader(self.val_ds, batch_size=4, drop_last=True)
+        self.assertEqual(len(loader), 2)
+        self.assertEqual(sum(len(x) for x, _ in loader), 8)
+
+
+class TestShardedBatchLoader(unittest.TestCase):
+    """测试数据并行训练的分片加载器"""
+
+    def _rows(self, loader):
+        return torch.cat([targets for _, targets in loader]).long().tolist()
+
+    def test_shards_are_disjoint_and_equal(self):
+        """各进程样本互不重叠、数量相同，合起来覆盖全部样本"""
+        dataset = TabularDataset(torch.zeros(10, 2), torch.arange(10).float())
+        loaders = [ShardedBatchLoader(dataset, 2, rank, 3, shuffle=True, seed=1) for rank in range(3)]
+
+        shards = [self._rows(loader) for loader in loaders]
+
+        self.assertEqual({len(shard) for shard in shards}, {4})
+        self.assertEqual({len(loader) for loader in loaders}, {2})
+        # 补齐的2个样本重复出现，其余样本恰好出现一次
+        combined = sum(shards, [])
+        self.assertEqual(set(combined), set(range(10)))
+        self.assertEqual(len(combined), 12)
+
+    def test_set_epoch_changes_order(self):
+        """同一epoch各进程的排列一致，不同epoch的排列不同"""
+        dataset = TabularDataset(torch.zeros(32, 2), torch.arange(32).float())
+        loader = ShardedBatchLoader(dataset, 4, 0, 2, shuffle=True)
+        first = self._rows(loader)
+        self.assertEqual(self._rows(loader), first)
+        loader.set_epoch(1)
+        self.assertNotEqual(self._rows(loader), first)
+
+    def test_without_padding(self):
+        """验证集不补齐，按进程序号间隔取样"""
+        dataset = TabularDataset(torch.zeros(5, 2), torch.arange(5).float())
+        self.assertEqual(self._rows(ShardedBatchLoader(dataset, 8, 0, 2, pad=False)), [0, 2, 4])
+        self.assertEqual(self._rows(ShardedBatchLoader(dataset, 8, 1, 2, pad=False)), [1, 3])
+        with self.assertRaises(ValueError):
+            ShardedBatchLoader(dataset, 8, 2, 2)
+
+
+class TestStreamingDataset(unittest.TestCase):
+    """测试流式CSV数据集"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.temp_dir.name, "data.csv")
+        self.df = make_dataframe(rows=237)
+        self.df["row_id"] = np.arange(len(self.df))
+        self.df.to_csv(self.csv_path, index=False)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _row_ids(self, loader):
+        return [int(v) for x, _ in loader for v in x[:, 0].tolist()]
+
+    def test_full_pass_matches_file(self):
+        """不划分时应按原顺序输出所有行，列顺序与指定顺序一致"""
+        loader = StreamingTabularDataset(self.csv_path, ["row_id", "c", "a"], "label",
+                                         batch_size=32, chunk_size=50)
+        batches = list(loader)
+        self.assertTrue(all(len(x) == 32 for x, _ in batches[:-1]))
+
+        features = torch.cat([x for x, _ in batches])
+        labels = torch.cat([y for _, y in batches])
+        self.assertEqual(features.dtype, torch.float32)
+        np.testing.assert_allclose(features.numpy(),
+                                   self.df[["row_id", "c", "a"]].values.astype(np.float32))
+        np.testing.assert_allclose(labels.numpy(), self.df["label"].values.astype(np.float32))
+
+    def test_train_val_split_is_disjoint_and_stable(self):
+        """训练集和验证集互不重叠、覆盖所有行，且每个epoch划分一致"""
+        train_loader, val_loader = build_streaming_datasets(
+            self.csv_path, ["row_id", "a"], "label", batch_size=16, chunk_size=40
+        )
+        train_ids = self._row_ids(train_loader)
+        val_ids = self._row_ids(val_loader)
+
+        self.assertFalse(set(train_ids) & set(val_ids))
+        self.assertEqual(sorted(train_ids + val_ids), list(range(len(self.df))))
+        self.assertEqual(sorted(self._row_ids(train_loader)), sorted(train_ids))
+        self.assertEqual(self._row_ids(val_loader), val_ids)
+
+    def test_rejects_excel(self):
+        """Excel文件不支持流式读取"""
+        loader = StreamingTabularDataset("data.xlsx", ["a"], "label")
+        with self.assertRaises(ValueError):
+            list(loader)
+
+
+class TestMemmapDataset(unittest.TestCase):
+    """测试内存映射特征矩阵"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.temp_dir.name, "data.csv")
+        self.matrix_path = os.path.join(self.temp_dir.name, "data.f32")
+        self.df = make_dataframe(rows=90)
+        self.df.to_csv(self.csv_path, index=False)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_matches_in_memory_datasets(self):
+        """内存映射数据集应与内存数据集的划分和数值一致"""
+        train_ds, val_ds = build_memmap_datasets(self.csv_path, ["c", "a"], "label",
+                                                 self.matrix_path, chunk_size=25)
+        ref_train, ref_val = build_tabular_datasets(self.df, ["c", "a"], "label")
+
+        self.assertTrue(os.path.exists(self.matrix_path))
+        self.assertTrue(torch.equal(train_ds.indices, ref_train.indices))
+        self.assertTrue(torch.equal(val_ds.indices, ref_val.indices))
+        np.testing.assert_allclose(train_ds.features.numpy(), ref_train.features.numpy())
+        np.testing.assert_allclose(train_ds.labels.numpy(), ref_train.labels.numpy())
+
+        inputs, targets = next(iter(TensorBatchLoader(val_ds, batch_size=8)))
+        ref_inputs, ref_targets = next(iter(TensorBatchLoader(ref_val, batch_size=8)))
+        self.assertTrue(torch.equal(inputs, ref_inputs))
+        self.assertTrue(torch.equal(targets, ref_targets))
+
+    def test_existing_matrix_is_reused(self):
+        """矩阵文件已存在时不应重新读取源文件"""
+        build_memmap_datasets(self.csv_path, ["a"], "label", self.matrix_path)
+        with patch("models.dataset.write_feature_matrix") as mock_write:
+            build_memmap_datasets(self.csv_path, ["a"], "label", self.matrix_path)
+            mock_write.assert_not_called()
+
+    def test_source_reopens_matrix(self):
+        """传给子进程的描述只包含矩阵路径和索引，还原后与原数据集一致"""
+        train_ds, _ = build_memmap_datasets(self.csv_path, ["c", "a"], "label", self.matrix_path)
+        source = dataset_source(train_ds)
+        self.assertEqual(source[0], self.matrix_path)
+
+        restored = open_dataset_source(pickle.loads(pickle.dumps(source)))
+        self.assertEqual(restored.matrix_path, self.matrix_path)
+        self.assertTrue(torch.equal(restored.indices, train_ds.indices))
+        self.assertTrue(torch.equal(restored.features, train_ds.features))
+        self.assertTrue(torch.equal(restored.labels, train_ds.labels))
+
+        # 内存中的数据集原样传递
+        memory_ds, _ = build_tabular_datasets(self.df, ["a"], "label")
+        self.assertIs(open_dataset_source(dataset_source(memory_ds)), memory_ds)
+
+
+class TestDatasetCache(unittest.TestCase):
+    """测试列式数据集缓存"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.temp_dir.name, "data.csv")
+        df = make_dataframe(rows=20)
+        df["name"] = ["x", None, "y", "z"] * 5
+        df["flag"] = df["b"] > 4
+        df.loc[3, "a"] = np.nan
+        df.to_csv(self.csv_path, index=False)
+
+        self.db = Mock()
+        self.db.get_dataset_cache.return_value = None
+        self.cache = DatasetCache(os.path.join(self.temp_dir.name, "cache"), db=self.db)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_second_load_served_from_cache(self):
+        """第二次加载应读取缓存且内容与首次解析一致"""
+        first = self.cache.load(self.csv_path, user_id=1)
+        self.db.add_dataset_cache.assert_called_once()
+
+        with patch("models.dataset_cache.read_table") as mock_read:
+            second = self.cache.load(self.csv_path)
+            mock_read.assert_not_called()
+
+        self.assertIsInstance(second["a"].values, np.memmap)
+        pd.testing.assert_frame_equal(first, second.copy())
+        pd.testing.assert_frame_equal(first[["flag", "a"]],
+                                      self.cache.load(self.csv_path, columns=["flag", "a"]).copy())
+
+    def test_datetime_columns(self):
+        """日期时间列按原类型缓存，无法写入清单的列使整个数据集不缓存且不留下临时目录"""
+        df = pd.DataFrame({"when": pd.date_range("2026-01-01", periods=4, freq="D"),
+                           "took": pd.to_timedelta([1, 2, 3, 4], unit="s"),
+                           "day": [pd.Timestamp("2026-01-01").date()] * 4})
+        with self.assertRaises(ValueError):
+            self.cache.store(df, "bad", self.csv_path)
+        self.assertEqual(os.listdir(self.cache.cache_dir), [])
+
+        df = df.drop(columns=["day"])
+        cache_path = self.cache.store(df, "good", self.csv_path)
+        pd.testing.assert_frame_equal(self.cache.read(cache_path).copy(), df)
+
+    def test_cached_frame_is_writable(self):
+        """缓存读取的 DataFrame 与首次加载一样可以修改，修改不影响缓存文件"""
+        self.cache.load(self.csv_path, user_id=1)
+        cached = self.cache.load(self.csv_path)
+        cached.loc[0, "a"] = 100.0
+        self.assertEqual(cached.loc[0, "a"], 100.0)
+        self.assertNotEqual(self.cache.load(self.csv_path).loc[0, "a"], 100.0)
+
+    def test_prune_removes_least_recently_used(self):
+        """超出上限时删除最久未使用的缓存，保留刚写入的缓存"""
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.temp_dir.name, f"data_{i}.csv")
+            make_dataframe(rows=2000).to_csv(path, index=False)
+            self.cache.load(path, user_id=1)
+            paths.append(path)
+            entry = os.path.join(self.cache.cache_dir, DatasetCache.source_key(path))
+            os.utime(entry, (1000 + i, 1000 + i))
+        # 第一个缓存最近被使用过
+        self.cache.load(paths[0])
+
+        size = DatasetCache.entry_size(entry)
+        self.cache.max_size = int(size * 2.5)
+        self.assertEqual(self.cache.prune(), 1)
+        remaining = set(os.listdir(self.cache.cache_dir))
+        self.assertEqual(remaining, {DatasetCache.source_key(paths[0]), DatasetCache.source_key(paths[2])})
+
+    def test_key_changes_with_file(self):
+        """源文件修改后缓存键随之改变"""
+        key = DatasetCache.source_key(self.csv_path)
+        with open(self.csv_path, "a") as f:
+            f.write("1,2,3,4,w,True\n")
+        self.assertNotEqual(key, DatasetCache.source_key(self.csv_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
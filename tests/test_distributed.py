@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+多进程数据并行训练测试
+测试 gloo 后端下多个进程训练的结果与单进程大批次训练一致
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import pandas as pd
+import torch
+
+from models.checkpoint import latest_checkpoint, load_checkpoint
+from models.dataset import TabularDataset, TensorBatchLoader, build_memmap_datasets
+from models.distributed import is_available, train_data_parallel
+from models.trainer import Trainer
+from ui.training_page import TrainingThread
+from tests.helpers import build_model
+
+
+def build_datasets(samples: int = 80, val_samples: int = 16):
+    """构建共享同一缓冲区的训练集和验证集"""
+    generator = torch.Generator().manual_seed(0)
+    X = torch.randn(samples, 4, generator=generator)
+    y = (X[:, 0] > 0).float()
+    indices = torch.arange(samples)
+    return (TabularDataset(X, y, indices[val_samples:]),
+            TabularDataset(X, y, indices[:val_samples]))
+
+
+def train_params(**overrides) -> dict:
+    params = {
+        "learning_rate": 0.1,
+        "batch_size": 8,
+        "epochs": 2,
+        "optimizer": "SGD",
+        "loss_function": "CrossEntropyLoss",
+        "use_gpu": False
+    }
+    params.update(overrides)
+    return params
+
+
+@unittest.skipUnless(is_available(), "当前 PyTorch 不支持 gloo 后端")
+class TestDataParallel(unittest.TestCase):
+    """测试多进程数据并行训练"""
+
+    def test_matches_single_process_large_batch(self):
+        """2个进程各用批次大小8训练，与单进程按相同顺序用批次大小16训练的参数一致"""
+        train_ds, val_ds = build_datasets()
+        model = build_model(out_features=2)
+        epochs = []
+
+        history = train_data_parallel(model, train_params(epochs=1), train_ds, val_ds, num_workers=2,
+                                      on_epoch_end=lambda epoch, h: epochs.append(epoch))
+
+        # 单进程参照：与分片加载器使用同一个排列，每16行组成一个批次
+        reference = build_model(out_features=2)
+        permutation = train_ds.indices[torch.randperm(len(train_ds),
+                                                      generator=torch.Generator().manual_seed(0))]
+        optimizer = torch.optim.SGD(reference.parameters(), lr=0.1)
+        for i in range(0, len(permutation), 16):
+            rows = permutation[i:i + 16]
+            optimizer.zero_grad()
+            loss = torch.nn.functional.cross_entropy(reference(train_ds.features[rows]),
+                                                     train_ds.labels[rows].long())
+            loss.backward()
+            optimizer.step()
+
+        for a, b in zip(model.parameters(), reference.parameters()):
+            torch.testing.assert_close(a, b, rtol=1e-5, atol=1e-6)
+        self.assertEqual(epochs, [0])
+        self.assertEqual(len(history["loss"]), 1)
+
+    def test_training_thread(self):
+        """训练线程按进程数启动数据并行训练，每个epoch发送一次汇总后的历史记录"""
+        train_ds, val_ds = build_datasets()
+        model = build_model(out_features=2)
+        initial = model.pytorch_layers[0].weight.detach().clone()
+        data = {"train_loader": TensorBatchLoader(train_ds, 8, shuffle=True),
+                "val_loader": TensorBatchLoader(val_ds, 8)}
+        thread = TrainingThread(model, train_params(num_workers=2, accumulation_steps=2,
+                                                    mixed_precision=True), data)
+        progress, results = [], []
+        thread.progress_updated.connect(lambda value, history: progress.append(value))
+        thread.training_finished.connect(lambda history, trained: results.append((history, trained)))
+        thread.error_occurred.connect(self.fail)
+        thread.run()
+
+        self.assertEqual(progress, [50, 100])
+        history, trained = results[0]
+        self.assertIs(trained, model)
+        for key in ("loss", "val_loss", "accuracy", "val_accuracy"):
+            self.assertEqual(len(history[key]), 2)
+        self.assertFalse(torch.equal(initial, model.pytorch_layers[0].weight.detach()))
+
+    def test_resume_across_modes(self):
+        """多进程和单进程训练保存的检查点键名相同，可以互相继续训练"""
+        train_ds, val_ds = build_datasets()
+        data = {"train_loader": TensorBatchLoader(train_ds, 8, shuffle=True),
+                "val_loader": TensorBatchLoader(val_ds, 8)}
+        with tempfile.TemporaryDirectory() as directory:
+            first = os.path.join(directory, "first")
+            train_data_parallel(build_model(out_features=2), train_params(epochs=1, checkpoint_dir=first),
+                                train_ds, val_ds, num_workers=2)
+            path = latest_checkpoint(first)
+            model = build_model(out_features=2)
+            self.assertEqual(set(load_checkpoint(path)["model"]), set(model.state_dict()))
+
+            # 多进程 -> 单进程
+            second = os.path.join(directory, "second")
+            history = Trainer(model, train_params(epochs=2, resume_from=path, checkpoint_dir=second)).fit(
+                data["train_loader"], data["val_loader"])
+            self.assertEqual(len(history["loss"]), 2)
+
+            # 单进程 -> 多进程
+            resumed = build_model(out_features=2, seed=1)
+            history = train_data_parallel(resumed, train_params(epochs=3, resume_from=latest_checkpoint(second)),
+                                          train_ds, val_ds, num_workers=2)
+            self.assertEqual(len(history["loss"]), 3)
+            self.assertFalse(torch.equal(resumed.pytorch_layers[0].weight,
+                                         build_model(out_features=2, seed=1).pytorch_layers[0].weight))
+
+    def test_memmap_data_not_copied(self):
+        """内存映射的数据集由工作进程按路径重新映射，主进程的矩阵不会被移到共享内存"""
+        generator = torch.Generator().manual_seed(0)
+        X = torch.randn(80, 4, generator=generator)
+        y = (X[:, 0] > 0).float()
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "data.csv")
+            pd.DataFrame(dict({f"x{i}": X[:, i].numpy() for i in range(4)}, label=y.numpy())).to_csv(
+                csv_path, index=False)
+            train_ds, val_ds = build_memmap_datasets(csv_path, [f"x{i}" for i in range(4)], "label",
+                                                     os.path.join(directory, "data.f32"))
+            history = train_data_parallel(build_model(out_features=2), train_params(epochs=1),
+                                          train_ds, val_ds, num_workers=2)
+
+            self.assertEqual(len(history["loss"]), 1)
+            self.assertFalse(train_ds.features.is_shared())
+
+    def test_rejects_streaming_data(self):
+        """流式数据集无法分片，给出明确的错误"""
+        model = build_model(out_features=2)
+        with self.assertRaises(ValueError):
+            train_data_parallel(model, train_params(), object(), object(), num_workers=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+推理流程测试
+测试分批推理引擎和推理线程
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import numpy as np
+import pandas as pd
+import torch
+
+from models.inference import InferenceEngine, prefetch
+from models.neural_network import NNModel
+from ui.inference_page import InferenceThread, plot_indices
+from tests.helpers import build_model
+import score
+
+
+class TestInferenceEngine(unittest.TestCase):
+    """测试分批推理引擎"""
+
+    def setUp(self):
+        self.model = build_model()
+        self.inputs = torch.randn(103, 4)
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_batched_matches_single_pass(self):
+        """分批预测结果应与整体前向计算一致"""
+        with torch.no_grad():
+            expected = self.model(self.inputs).argmax(dim=1).numpy()
+
+        engine = InferenceEngine(self.model, batch_size=10, task_type="分类")
+        progress = []
+        predictions = engine.run(self.inputs, progress_callback=lambda done, total, p: progress.append(done))
+
+        np.testing.assert_array_equal(predictions, expected)
+        self.assertEqual(len(progress), 11)
+        self.assertEqual(progress[-1], 103)
+
+    def test_regression_single_row(self):
+        """单输出回归在只有一行时也应返回一维结果"""
+        engine = InferenceEngine(build_model(out_features=1), batch_size=8, task_type="回归")
+        predictions = engine.run(torch.randn(1, 4))
+        self.assertEqual(predictions.shape, (1,))
+
+    def test_writes_predictions_incrementally(self):
+        """预测结果应按批写入CSV文件"""
+        output_path = os.path.join(self.temp_dir.name, "predictions.csv")
+        engine = InferenceEngine(self.model, batch_size=16)
+        predictions = engine.run(self.inputs, output_path=output_path)
+
+        written = pd.read_csv(output_path)
+        self.assertEqual(list(written.columns), ["row", "prediction"])
+        np.testing.assert_array_equal(written["row"].values, np.arange(103))
+        np.testing.assert_array_equal(written["prediction"].values, predictions)
+
+    def test_should_stop(self):
+        """should_stop 返回 True 时应提前结束"""
+        engine = InferenceEngine(self.model, batch_size=10)
+        predictions = engine.run(self.inputs, should_stop=lambda: True)
+        self.assertEqual(len(predictions), 10)
+
+
+class TestInferenceThread(unittest.TestCase):
+    """测试推理线程"""
+
+    def test_emits_partial_and_final_results(self):
+        """推理线程应逐批发送进度并在结束时发送全部结果"""
+        inputs = torch.randn(50, 4)
+        engine = InferenceEngine(build_model(), batch_size=20)
+        thread = InferenceThread(engine, lambda: inputs)
+
+        partial, finished = [], []
+        thread.progress_updated.connect(lambda progress, start, p: partial.append((progress, start, len(p))))
+        thread.inference_finished.connect(finished.append)
+        thread.error_occurred.connect(self.fail)
+        thread.run()
+
+        self.assertEqual(partial, [(40, 0, 20), (80, 20, 20), (100, 40, 10)])
+        self.assertEqual(len(finished[0]), 50)
+
+
+class TestPlotIndices(unittest.TestCase):
+    """测试结果散点图的抽样"""
+
+    def test_limits_point_count(self):
+        """样本少时全部绘制，样本多时等间隔抽取不超过上限的点"""
+        np.testing.assert_array_equal(plot_indices(10, max_points=100), np.arange(10))
+        indices = plot_indices(1000001, max_points=5000)
+        self.assertLessEqual(len(indices), 5000)
+        self.assertEqual(indices[0], 0)
+        self.assertTrue(np.all(np.diff(indices) == indices[1]))
+        self.assertEqual(plot_indices(0).size, 0)
+
+
+class TestScoreCli(unittest.TestCase):
+    """测试无界面批量打分入口"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model = build_model()
+        self.weights_path = os.path.join(self.temp_dir.name, "model.pth")
+        torch.save(self.model.state_dict(), self.weights_path)
+
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame(rng.normal(size=(250, 5)), columns=["a", "b", "c", "d", "id"])
+        self.input_path = os.path.join(self.temp_dir.name, "input.csv")
+        self.df.to_csv(self.input_path, index=False)
+        self.output_path = os.path.join(self.temp_dir.name, "output.csv")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_scores_selected_columns_in_chunks(self):
+        """按块读取所选列打分，结果与整体推理一致"""
+        with patch("models.inference.NNModel.load", return_value=build_model()) as mock_load:
+            exit_code = score.main([
+                "--model-id", "7", "--weights", self.weights_path,
+                "--input", self.input_path, "--output", self.output_path,
+                "--columns", "a,b,c,d", "--chunk-size", "60", "--batch-size", "25",
+                "--threads", "2"
+            ])
+        self.assertEqual(exit_code, 0)
+        mock_load.assert_called_once_with(model_id=7)
+
+        with torch.no_grad():
+            inputs = torch.from_numpy(self.df[["a", "b", "c", "d"]].to_numpy(dtype=np.float32, copy=True))
+            expected = self.model(inputs).argmax(dim=1).numpy()
+        written = pd.read_csv(self.output_path)
+        np.testing.assert_array_equal(written["row"].values, np.arange(250))
+        np.testing.assert_array_equal(written["prediction"].values, expected)
+
+    def test_failure_returns_nonzero(self):
+        """加载失败时返回非零退出码"""
+        with patch("models.inference.NNModel.load", side_effect=Exception("找不到指定的模型或无权访问")):
+            exit_code = score.main([
+                "--model-id", "1", "--weights", self.weights_path,
+                "--input", self.input_path, "--output", self.output_path
+            ])
+        self.assertEqual(exit_code, 1)
+
+    def test_prefetch_propagates_errors(self):
+        """后台读取出错时应在消费端抛出"""
+        def broken():
+            yield 1
+            raise ValueError("读取失败")
+
+        items = prefetch(broken())
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ValueError):
+            next(items)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+训练曲线实时绘制测试
+测试训练线程只发送新增记录，以及曲线图的增量更新和限频重绘
+"""
+
+import sys
+import os
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+from ui.live_plot import LivePlot
+from ui.training_page import TrainingThread
+from tests.helpers import build_model
+from tests.test_training import build_loaders, default_train_params
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+def epoch_delta(epoch: int) -> dict:
+    """一个epoch的新增记录"""
+    return {"loss": [1.0 / (epoch + 1)], "val_loss": [1.2 / (epoch + 1)],
+            "accuracy": [50.0 + epoch], "val_accuracy": [45.0 + epoch]}
+
+
+class TestProgressDelta(unittest.TestCase):
+    """测试训练线程的进度信号"""
+
+    def test_progress_sends_only_new_epochs(self):
+        """每次只发送新增的一个epoch，拼接后与完整历史记录一致"""
+        thread = TrainingThread(build_model(), default_train_params(epochs=4), build_loaders())
+        deltas, results = [], []
+        thread.progress_updated.connect(lambda progress, delta: deltas.append((progress, delta)))
+        thread.training_finished.connect(lambda history, model: results.append(history))
+        thread.error_occurred.connect(self.fail)
+        thread.run()
+
+        self.assertEqual([p for p, _ in deltas], [25, 50, 75, 100])
+        history = results[0]
+        for key, values in history.items():
+            self.assertTrue(all(len(delta[key]) == 1 for _, delta in deltas))
+            self.assertEqual(sum((delta[key] for _, delta in deltas), []), values)
+
+
+class TestLivePlot(unittest.TestCase):
+    """测试曲线图的增量更新"""
+
+    def setUp(self):
+        self.figure = Figure(figsize=(6, 4))
+        self.canvas = FigureCanvas(self.figure)
+        self.plot = LivePlot(self.figure, self.canvas)
+        self.plot.reset(epochs=100)
+
+    def test_append_does_not_draw(self):
+        """追加数据只标记需要重绘，多个epoch合并为一次重绘"""
+        draws = self.plot.full_draws
+        for epoch in range(50):
+            self.plot.append(epoch_delta(epoch))
+        self.assertEqual(self.plot.full_draws, draws)
+        self.assertEqual(self.plot.blits, 0)
+        self.assertTrue(self.plot._timer.isActive())
+
+        self.plot.refresh()
+        x, y = self.plot.lines["loss"].get_data()
+        self.assertEqual(len(x), 50)
+        self.assertEqual(list(y), self.plot.history["loss"])
+
+        # 没有新数据时定时器停止
+        self.plot.refresh()
+        self.assertFalse(self.plot._timer.isActive())
+
+    def test_blit_within_limits(self):
+        """坐标范围足够时只重画曲线，不做完整重绘"""
+        self.plot.append({"loss": [2.0, 1.0], "val_loss": [2.0, 1.0],
+                          "accuracy": [40.0, 60.0], "val_accuracy": [40.0, 60.0]})
+        self.plot.refresh()
+        draws = self.plot.full_draws
+        for epoch in range(2, 21):
+            value = 1.0 + (epoch % 5) / 5
+            self.plot.append({"loss": [value], "val_loss": [value],
+                              "accuracy": [40.0 + 4 * (epoch % 5)], "val_accuracy": [50.0]})
+            self.plot.refresh()
+        self.assertEqual(self.plot.full_draws, draws)
+        self.assertEqual(self.plot.blits, 19)
+
+    def test_limits_expand_and_flush(self):
+        """数据超出范围时扩大坐标，结束时收紧到数据范围"""
+        self.plot.append(epoch_delta(0))
+        self.plot.refresh()
+        self.plot.append({"loss": [5.0], "val_loss": [5.0], "accuracy": [90.0], "val_accuracy": [90.0]})
+        draws = self.plot.full_draws
+        self.plot.refresh()
+        self.assertEqual(self.plot.full_draws, draws + 1)
+        self.assertGreaterEqual(self.plot.axes[0].get_ylim()[1], 5.0)
+
+        for epoch in range(2, 150):
+            self.plot.append(epoch_delta(epoch))
+        self.plot.refresh()
+        self.assertGreaterEqual(self.plot.axes[0].get_xlim()[1], 149)
+
+        self.plot.flush()
+        self.assertEqual(self.plot.axes[0].get_xlim(), (0, 149))
+        low, high = self.plot.axes[1].get_ylim()
+        self.assertLessEqual(low, 45.0)
+        self.assertLess(high, 215.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+模型缓存测试
+测试缓存命中、权重文件变化后失效、按内存淘汰和独立副本
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import torch
+
+from models.model_cache import ModelCache, model_nbytes
+from models.neural_network import NNModel
+from tests.helpers import build_model
+
+
+class TestModelCache(unittest.TestCase):
+    """测试模型LRU缓存"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.weights_path = os.path.join(self.temp_dir, "model.pth")
+        torch.manual_seed(0)
+        self.trained = build_model()
+        torch.save(self.trained.state_dict(), self.weights_path)
+
+        patcher = patch("models.model_cache.NNModel.load", side_effect=lambda **kwargs: build_model())
+        self.mock_load = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_repeated_get_hits_cache(self):
+        """同一模型和权重只加载一次，返回同一个评估模式的实例"""
+        cache = ModelCache()
+
+        first = cache.get(1, self.weights_path)
+        second = cache.get(1, self.weights_path)
+
+        self.assertIs(first, second)
+        self.assertFalse(first.training)
+        self.assertEqual(self.mock_load.call_count, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        for name, value in self.trained.state_dict().items():
+            torch.testing.assert_close(first.state_dict()[name], value)
+
+    def test_weights_file_change_reloads(self):
+        """权重文件被覆盖后重新加载"""
+        cache = ModelCache()
+        first = cache.get(1, self.weights_path)
+
+        torch.manual_seed(1)
+        torch.save(build_model().state_dict(), self.weights_path)
+        stat = os.stat(self.weights_path)
+        os.utime(self.weights_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        second = cache.get(1, self.weights_path)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(self.mock_load.call_count, 2)
+
+    def test_lru_eviction_by_memory(self):
+        """超过内存上限时淘汰最久未使用的模型"""
+        nbytes = model_nbytes(build_model())
+        cache = ModelCache(max_bytes=2 * nbytes)
+
+        cache.get(1, self.weights_path)
+        cache.get(2, self.weights_path)
+        cache.get(1, self.weights_path)  # 模型1变为最近使用
+        cache.get(3, self.weights_path)  # 淘汰模型2
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.current_bytes, 2 * nbytes)
+        cache.get(1, self.weights_path)
+        self.assertEqual(self.mock_load.call_count, 3)
+        cache.get(2, self.weights_path)
+        self.assertEqual(self.mock_load.call_count, 4)
+
+    def test_model_larger_than_limit_not_cached(self):
+        """单个模型超过上限时照常返回但不缓存"""
+        cache = ModelCache(max_bytes=16)
+        model = cache.get(1, self.weights_path)
+
+        self.assertIsInstance(model, NNModel)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.current_bytes, 0)
+
+    def test_copy_is_independent(self):
+        """副本修改参数不影响缓存中的模型"""
+        cache = ModelCache()
+        cached = cache.get(1, self.weights_path)
+        copy = cache.get(1, self.weights_path, copy=True)
+
+        self.assertIsNot(copy, cached)
+        with torch.no_grad():
+            for param in copy.parameters():
+                param.add_(1.0)
+        for name, value in self.trained.state_dict().items():
+            torch.testing.assert_close(cached.state_dict()[name], value)
+
+    def test_structure_copy_is_reinitialized(self):
+        """只加载结构时副本的参数重新初始化"""
+        cache = ModelCache()
+        cached = cache.get(1)
+        copy = cache.get(1, copy=True)
+
+        self.assertEqual([l.type for l in copy.layers], [l.type for l in cached.layers])
+        self.assertFalse(torch.equal(copy.pytorch_layers[0].weight, cached.pytorch_layers[0].weight))
+        self.assertEqual(self.mock_load.call_count, 1)
+
+    def test_invalidate(self):
+        """模型结构更新后丢弃该模型的全部缓存"""
+        cache = ModelCache()
+        cache.get(1)
+        cache.get(1, self.weights_path)
+        cache.get(2, self.weights_path)
+
+        cache.invalidate(1)
+
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.current_bytes, model_nbytes(build_model()))
+
+
+if __name__ == "__main__":
+    unittest.main()
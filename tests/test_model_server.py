@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+模型服务测试
+在本机端口上启动服务，测试请求合并、延迟统计和错误处理
+"""
+
+import sys
+import os
+import io
+import json
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import numpy as np
+import torch
+
+from services.model_server import MicroBatcher, ModelServer, NPY_CONTENT_TYPE
+from utils.performance_monitor import PerformanceMonitor
+from tests.helpers import build_model
+
+
+def post(url: str, body: bytes, content_type: str) -> bytes:
+    """发送POST请求并返回响应体"""
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return response.read()
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """测试动态小批次合并"""
+
+    def test_concurrent_requests_are_merged(self):
+        """并发提交的请求应合并为一次前向计算，并按行拆回结果"""
+        calls = []
+
+        def predict_fn(inputs):
+            calls.append(len(inputs))
+            return inputs.sum(axis=1)
+
+        batcher = MicroBatcher(predict_fn, max_batch_size=64, max_latency_ms=200,
+                               monitor=PerformanceMonitor())
+        requests = [np.full((2, 3), i, dtype=np.float32) for i in range(5)]
+        futures = [batcher.submit(x) for x in requests]
+        batcher.start()
+        try:
+            for i, future in enumerate(futures):
+                np.testing.assert_allclose(future.result(timeout=5), [3 * i, 3 * i])
+        finally:
+            batcher.stop()
+
+        self.assertEqual(calls, [10])
+
+    def test_batch_size_limit(self):
+        """达到最大批次行数后不再等待"""
+        calls = []
+
+        def predict_fn(inputs):
+            calls.append(len(inputs))
+            return inputs[:, 0]
+
+        batcher = MicroBatcher(predict_fn, max_batch_size=4, max_latency_ms=200,
+                               monitor=PerformanceMonitor())
+        futures = [batcher.submit(np.zeros((2, 1), dtype=np.float32)) for _ in range(3)]
+        batcher.start()
+        try:
+            for future in futures:
+                future.result(timeout=5)
+        finally:
+            batcher.stop()
+
+        self.assertEqual(calls, [4, 2])
+
+    def test_error_propagates_to_all_requests(self):
+        """前向计算出错时批次内每个请求都应收到异常"""
+        def predict_fn(inputs):
+            raise RuntimeError("shape mismatch")
+
+        batcher = MicroBatcher(predict_fn, max_latency_ms=50, monitor=PerformanceMonitor())
+        batcher.start()
+        try:
+            futures = [batcher.submit(np.zeros((1, 2), dtype=np.float32)) for _ in range(2)]
+            for future in futures:
+                with self.assertRaises(RuntimeError):
+                    future.result(timeout=5)
+        finally:
+            batcher.stop()
+
+
+    def test_bad_request_does_not_fail_batch(self):
+        """合并批次中一个请求出错时，其他请求仍得到各自的结果"""
+        calls = []
+
+        def predict_fn(inputs):
+            if inputs.shape[1] != 3:
+                raise ValueError("shape mismatch")
+            calls.append(len(inputs))
+            return inputs.sum(axis=1)
+
+        batcher = MicroBatcher(predict_fn, max_batch_size=64, max_latency_ms=200,
+                               monitor=PerformanceMonitor())
+        good = [np.full((1, 3), i, dtype=np.float32) for i in range(3)]
+        futures = [batcher.submit(good[0]), batcher.submit(np.zeros((1, 2), dtype=np.float32)),
+                   batcher.submit(good[1]), batcher.submit(good[2])]
+        batcher.start()
+        try:
+            with self.assertRaises(ValueError):
+                futures[1].result(timeout=5)
+            for i, future in enumerate(futures[:1] + futures[2:]):
+                np.testing.assert_allclose(future.result(timeout=5), [3 * i])
+        finally:
+            batcher.stop()
+
+        self.assertEqual(calls, [1, 1, 1])
+
+
+class TestModelServer(unittest.TestCase):
+    """测试本机HTTP模型服务"""
+
+    def setUp(self):
+        self.model = build_model()
+        self.monitor = PerformanceMonitor()
+        self.server = ModelServer(self.model, port=0, max_batch_size=64,
+                                  max_latency_ms=20, monitor=self.monitor)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def expected(self, inputs: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return self.model(torch.from_numpy(inputs)).argmax(dim=1).numpy()
+
+    def test_json_predict(self):
+        """JSON请求返回与直接前向计算一致的分类结果"""
+        inputs = np.random.rand(5, 4).astype(np.float32)
+        body = json.dumps({"inputs": inputs.tolist()}).encode("utf-8")
+
+        response = json.loads(post(f"{self.server.url}/predict", body, "application/json"))
+
+        np.testing.assert_array_equal(response["predictions"], self.expected(inputs))
+
+    def test_npy_predict(self):
+        """npy格式的请求和响应"""
+        inputs = np.random.rand(3, 4).astype(np.float32)
+        buffer = io.BytesIO()
+        np.save(buffer, inputs)
+
+        response = post(f"{self.server.url}/predict", buffer.getvalue(), NPY_CONTENT_TYPE)
+
+        np.testing.assert_array_equal(np.load(io.BytesIO(response)), self.expected(inputs))
+
+    def test_concurrent_clients_and_stats(self):
+        """并发客户端的结果各自正确，统计中包含延迟分位数和吞吐量"""
+        samples = [np.random.rand(1, 4).astype(np.float32) for _ in range(32)]
+
+        def send(inputs):
+            body = json.dumps({"inputs": inputs[0].tolist()}).encode("utf-8")
+            return json.loads(post(f"{self.server.url}/predict", body, "application/json"))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(send, samples))
+
+        for inputs, response in zip(samples, responses):
+            self.assertEqual(response["predictions"], self.expected(inputs).tolist())
+
+        with urllib.request.urlopen(f"{self.server.url}/stats", timeout=10) as response:
+            stats = json.loads(response.read())
+        self.assertEqual(stats["requests"], 32)
+        self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+        self.assertGreater(stats["throughput_rps"], 0)
+        batch_sizes = [m.value for m in self.monitor.get_metrics(category="serving")
+                       if m.name == "serving_batch_size"]
+        self.assertEqual(sum(batch_sizes), 32)
+
+    def test_bad_request(self):
+        """无法解析的输入返回400"""
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            post(f"{self.server.url}/predict", b"not json", "application/json")
+        self.assertEqual(ctx.exception.code, 400)
+
+    def test_malformed_npy(self):
+        """空的、截断的npy请求体返回400，服务继续正常工作"""
+        buffer = io.BytesIO()
+        np.save(buffer, np.random.rand(3, 4).astype(np.float32))
+        body = buffer.getvalue()
+        for malformed in (b"", body[:60], body[:-8]):
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                post(f"{self.server.url}/predict", malformed, NPY_CONTENT_TYPE)
+            self.assertEqual(ctx.exception.code, 400)
+
+        response = post(f"{self.server.url}/predict", body, NPY_CONTENT_TYPE)
+        self.assertEqual(len(np.load(io.BytesIO(response))), 3)
+
+    def test_wrong_feature_count(self):
+        """特征数与模型不符时返回400，不进入合并批次"""
+        body = json.dumps({"inputs": [[1.0, 2.0]]}).encode("utf-8")
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            post(f"{self.server.url}/predict", body, "application/json")
+        self.assertEqual(ctx.exception.code, 400)
+        self.assertIn("4", json.loads(ctx.exception.read())["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+ONNX 后端测试
+测试 ONNX 导出的动态批次维度以及 ONNX Runtime 推理结果
+"""
+
+import sys
+import os
+import importlib.util
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import numpy as np
+import torch
+
+from models.inference import InferenceEngine, load_model
+from models.model_cache import ModelCache
+from models.neural_network import NNModel
+from models.onnx_backend import (OnnxRuntimeModel, export_onnx, example_input, onnx_path,
+                                 is_onnx_path)
+from tests.helpers import build_model
+
+HAS_ONNX = (importlib.util.find_spec("onnx") is not None
+            and importlib.util.find_spec("onnxruntime") is not None)
+
+
+class TestOnnxPaths(unittest.TestCase):
+    """测试文件路径和输入形状推断"""
+
+    def test_onnx_path(self):
+        path = onnx_path("saved_models/1_model.pth")
+        self.assertEqual(path, os.path.join("saved_models", "1_model.onnx"))
+        self.assertTrue(is_onnx_path(path))
+
+    def test_example_input(self):
+        self.assertEqual(tuple(example_input(build_model(in_features=6)).shape), (1, 6))
+
+    def test_missing_onnxruntime(self):
+        """未安装onnxruntime时给出明确的错误"""
+        with patch.dict(sys.modules, {"onnxruntime": None}):
+            with self.assertRaises(RuntimeError) as ctx:
+                OnnxRuntimeModel("model.onnx")
+        self.assertIn("onnxruntime", str(ctx.exception))
+
+
+@unittest.skipUnless(HAS_ONNX, "未安装 onnx/onnxruntime")
+class TestOnnxRuntimeModel(unittest.TestCase):
+    """测试导出和ONNX Runtime推理"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.model = build_model()
+        self.path = export_onnx(self.model, os.path.join(self.temp_dir, "1_model.onnx"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_dynamic_batch(self):
+        """导出的模型接受任意批次大小，结果与PyTorch一致"""
+        runtime = OnnxRuntimeModel(self.path, intra_op_threads=1, inter_op_threads=1)
+
+        for batch_size in (1, 7, 64):
+            inputs = torch.randn(batch_size, 4)
+            with torch.no_grad():
+                expected = self.model(inputs)
+            torch.testing.assert_close(runtime(inputs), expected, rtol=1e-4, atol=1e-5)
+
+    def test_numpy_in_numpy_out(self):
+        """传入numpy数组时返回numpy数组"""
+        runtime = OnnxRuntimeModel(self.path)
+        outputs = runtime(np.random.rand(5, 4).astype(np.float32))
+        self.assertIsInstance(outputs, np.ndarray)
+        self.assertEqual(outputs.shape, (5, 3))
+
+    def test_export_keeps_model_state(self):
+        """导出不改变原模型的训练状态"""
+        model = build_model()
+        model.train()
+        export_onnx(model, os.path.join(self.temp_dir, "train.onnx"))
+        self.assertTrue(model.training)
+        self.assertTrue(model.pytorch_layers[0].training)
+
+    def test_inference_engine(self):
+        """推理引擎使用ONNX Runtime模型时预测结果与PyTorch一致"""
+        inputs = torch.randn(50, 4)
+        expected = InferenceEngine(self.model.eval(), batch_size=16).run(inputs)
+
+        runtime = load_model(model_id=1, weights_path=self.path)
+        predictions = InferenceEngine(runtime, batch_size=16).run(inputs)
+
+        self.assertIsInstance(runtime, OnnxRuntimeModel)
+        self.assertEqual(predictions.tolist(), expected.tolist())
+
+    def test_model_cache(self):
+        """模型缓存直接加载ONNX文件，按文件大小计算占用"""
+        cache = ModelCache()
+        with patch("models.model_cache.NNModel.load") as mock_load:
+            model = cache.get(1, self.path)
+        mock_load.assert_not_called()
+        self.assertIsInstance(model, OnnxRuntimeModel)
+        self.assertEqual(cache.current_bytes, os.path.getsize(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
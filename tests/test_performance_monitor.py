@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+性能监控测试
+测试环形缓冲区指标存储和窗口统计
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import time
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import numpy as np
+
+from utils.performance_monitor import MetricSeries, PerformanceMonitor
+
+
+class TestMetricSeries(unittest.TestCase):
+    """测试单个指标的环形缓冲区"""
+
+    def test_wraps_and_keeps_order(self):
+        """写满后覆盖最旧的样本，快照仍按写入顺序排列"""
+        series = MetricSeries("latency", "ms", "test", capacity=4)
+        for i in range(10):
+            series.append(float(i), 100.0 + i)
+        timestamps, values = series.snapshot()
+        self.assertEqual(values.tolist(), [6.0, 7.0, 8.0, 9.0])
+        self.assertEqual(timestamps.tolist(), [106.0, 107.0, 108.0, 109.0])
+        self.assertEqual(series.count, 10)
+        self.assertEqual(series.window(last_n=2).tolist(), [8.0, 9.0])
+
+    def test_partial_fill(self):
+        """未写满时只返回已写入的样本"""
+        series = MetricSeries("latency", "ms", "test", capacity=8)
+        series.append(1.0, 1.0)
+        series.append(2.0, 2.0)
+        self.assertEqual(series.snapshot()[1].tolist(), [1.0, 2.0])
+
+
+class TestPerformanceMonitor(unittest.TestCase):
+    """测试性能监控器"""
+
+    def setUp(self):
+        self.monitor = PerformanceMonitor()
+
+    def test_bounded_per_metric(self):
+        """每个指标的样本数不超过上限，其他指标不受影响"""
+        self.monitor.max_metrics = 100
+        self.monitor.add_metric("rare", 1.0, "ms", category="test")
+        for i in range(1000):
+            self.monitor.add_metric("dense", float(i), "ms", category="test")
+        metrics = self.monitor.get_metrics(category="test")
+        self.assertEqual(len(metrics), 101)
+        self.assertEqual(metrics[0].name, "rare")
+        self.assertEqual(metrics[-1].value, 999.0)
+        self.assertEqual(len(self.monitor.get_metrics(last_n=10)), 10)
+
+    def test_window_aggregates(self):
+        """窗口统计与NumPy直接计算的结果一致，窗口外的样本不计入"""
+        now = time.time()
+        self.monitor.add_metric("latency", 1000.0, "ms", now - 3600, "test")
+        values = np.arange(1, 101, dtype=float)
+        for value in values:
+            self.monitor.add_metric("latency", value, "ms", now, "test")
+
+        stats = self.monitor.get_metric_stats("latency", time_window=60)
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["mean"], values.mean())
+        self.assertAlmostEqual(stats["p95"], np.percentile(values, 95))
+        self.assertAlmostEqual(stats["p99"], np.percentile(values, 99))
+        self.assertEqual(stats["max"], 100.0)
+        self.assertAlmostEqual(self.monitor.get_average_metric("latency", 60), values.mean())
+        self.assertEqual(self.monitor.get_metric_stats("latency", time_window=None)["max"], 1000.0)
+        self.assertEqual(self.monitor.get_metric_percentiles("latency", (50,), 60)["p50"],
+                         np.percentile(values, 50))
+        self.assertIsNone(self.monitor.get_metric_stats("missing"))
+
+    def test_summary_and_export(self):
+        """摘要按类别分组，导出的JSON包含全部样本"""
+        for i in range(5):
+            self.monitor.add_metric("step_time", float(i), "ms", category="training")
+        self.monitor.add_metric("cpu_usage", 50.0, "%", category="system")
+        summary = self.monitor.get_performance_summary()
+        self.assertEqual(summary["training"]["step_time"]["current"], 4.0)
+        self.assertEqual(summary["training"]["step_time"]["count"], 5)
+        self.assertEqual(summary["system"]["cpu_usage"]["average"], 50.0)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "report.json")
+            self.assertTrue(self.monitor.export_metrics(path))
+            with open(path, encoding="utf-8") as f:
+                exported = json.load(f)
+        self.assertEqual(len(exported), 6)
+
+    def test_concurrent_writers(self):
+        """多个线程同时写入同一指标不会丢失样本"""
+        def write():
+            for _ in range(1000):
+                self.monitor.add_metric("shared", 1.0, "ms", category="test")
+
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        series = self.monitor._series[("test", "shared")]
+        self.assertEqual(series.count, 4000)
+
+
+class TestSystemSampler(unittest.TestCase):
+    """测试非阻塞系统采样"""
+
+    def setUp(self):
+        self.monitor = PerformanceMonitor()
+
+    def _names(self):
+        return {m.name for m in self.monitor.get_metrics()}
+
+    def test_collect_does_not_block(self):
+        """一次采样远小于1秒，CPU和IO第一次只记录基准"""
+        for name in self.monitor.sample_intervals:
+            self.monitor.set_sample_interval(name, 1.0)
+        start = time.perf_counter()
+        self.monitor._collect_system_metrics(now=0.0)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        names = self._names()
+        self.assertIn("memory_usage", names)
+        self.assertIn("process_threads", names)
+        self.assertNotIn("cpu_usage", names)
+
+        self.monitor._collect_system_metrics(now=1.0)
+        names = self._names()
+        self.assertIn("cpu_usage", names)
+        self.assertIn("cpu_core_0", names)
+        usage = self.monitor.get_metrics(category="system")
+        self.assertTrue(all(0.0 <= m.value <= 100.0 for m in usage if m.name.startswith("cpu")))
+
+    def test_per_metric_intervals(self):
+        """每个采样项按自己的间隔采样，返回距下一个采样项到期的时间"""
+        for name in self.monitor.sample_intervals:
+            self.monitor.set_sample_interval(name, 0)
+        self.monitor.set_sample_interval("memory", 0.1)
+        self.monitor.set_sample_interval("disk", 1.0)
+
+        delay = self.monitor._collect_system_metrics(now=0.0)
+        self.assertAlmostEqual(delay, 0.1)
+        for step in range(1, 10):
+            self.monitor._collect_system_metrics(now=step * 0.1 + 1e-9)
+        series = self.monitor._series
+        self.assertEqual(series[("system", "memory_usage")].count, 10)
+        self.assertEqual(series[("system", "disk_usage")].count, 1)
+        self.assertNotIn(("process", "process_memory"), series)
+
+    def test_off_path(self):
+        """所有采样项关闭时不启动监控线程"""
+        for name in self.monitor.sample_intervals:
+            self.monitor.set_sample_interval(name, 0)
+        self.monitor.start_monitoring()
+        self.assertFalse(self.monitor.is_monitoring)
+        self.assertIsNone(self.monitor.monitor_thread)
+        with self.assertRaises(ValueError):
+            self.monitor.set_sample_interval("unknown", 1.0)
+
+    def test_background_sampling(self):
+        """监控线程以亚秒间隔采样，停止后立即退出"""
+        for name in self.monitor.sample_intervals:
+            self.monitor.set_sample_interval(name, 0)
+        self.monitor.set_sample_interval("cpu", 0.05)
+        self.monitor.start_monitoring()
+        time.sleep(0.5)
+        start = time.perf_counter()
+        self.monitor.stop_monitoring()
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertGreaterEqual(self.monitor._series[("system", "cpu_usage")].count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
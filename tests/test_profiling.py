@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+算子分析测试
+测试 torch.profiler 分析窗口的结果保存和汇总，以及训练、推理中的开关
+"""
+
+import sys
+import os
+import functools
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import torch
+import torch.nn as nn
+from PyQt5.QtWidgets import QApplication
+
+from models.profiling import NullProfileWindow, ProfileWindow
+from models.inference import InferenceEngine
+from models.trainer import Trainer
+from ui.profile_dialog import ProfileDialog, COLUMNS
+from tests.helpers import build_model
+from tests.test_training import build_loaders, default_train_params
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class TestProfileWindow(unittest.TestCase):
+    """测试分析窗口"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model = nn.Sequential(nn.Linear(8, 16), nn.ReLU(), nn.Linear(16, 2))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_steps(self, window, steps: int):
+        window.start()
+        for _ in range(steps):
+            self.model(torch.randn(32, 8)).sum().backward()
+            window.step()
+        window.stop()
+
+    def test_saves_trace_and_table(self):
+        """窗口结束后保存trace文件和统计表，并汇总耗时和内存最多的算子"""
+        window = ProfileWindow("test", steps=2, output_dir=self.temp_dir.name, top_k=3)
+        self.run_steps(window, 6)
+
+        summary = window.summary
+        self.assertIsNotNone(summary)
+        self.assertEqual(summary["steps"], 2)
+        self.assertTrue(summary["directory"].startswith(self.temp_dir.name))
+        with open(summary["trace_path"], encoding="utf-8") as f:
+            self.assertIn("traceEvents", json.load(f))
+        with open(summary["table_path"], encoding="utf-8") as f:
+            self.assertIn("aten::", f.read())
+
+        by_cpu = summary["by_cpu_time"]
+        self.assertEqual(len(by_cpu), 3)
+        self.assertTrue(all(not op["name"].startswith("ProfilerStep") for op in by_cpu))
+        cpu_times = [op["self_cpu_ms"] for op in by_cpu]
+        self.assertEqual(cpu_times, sorted(cpu_times, reverse=True))
+        self.assertLessEqual(len(summary["by_memory"]), 3)
+
+    def test_stop_inside_window(self):
+        """分析窗口内提前结束时保存已记录的步骤"""
+        window = ProfileWindow("test", steps=10, output_dir=self.temp_dir.name)
+        self.run_steps(window, 4)
+        self.assertIsNotNone(window.summary)
+
+    def test_too_few_steps(self):
+        """还没进入分析窗口就结束时没有结果，也不创建目录"""
+        window = ProfileWindow("test", steps=2, skip=3, output_dir=self.temp_dir.name)
+        self.run_steps(window, 2)
+        self.assertIsNone(window.summary)
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    def test_null_window(self):
+        """不分析时所有方法都不做任何事"""
+        window = NullProfileWindow()
+        self.run_steps(window, 2)
+        self.assertIsNone(window.summary)
+
+
+class TestProfilingIntegration(unittest.TestCase):
+    """测试训练和推理中的算子分析"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.window = functools.partial(ProfileWindow, output_dir=self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_trainer_disabled_by_default(self):
+        """未开启时不分析"""
+        trainer = Trainer(build_model(), default_train_params(epochs=1))
+        trainer.fit(build_loaders()["train_loader"], build_loaders()["val_loader"])
+        self.assertIsNone(trainer.profile_summary)
+
+    def test_trainer_profile(self):
+        """开启后训练结束时有分析结果，跨epoch的步骤也计入"""
+        loaders = build_loaders()
+        trainer = Trainer(build_model(), default_train_params(epochs=2, profile_steps=6))
+        with mock.patch("models.trainer.ProfileWindow", self.window):
+            trainer.fit(loaders["train_loader"], loaders["val_loader"])
+        self.assertIsNotNone(trainer.profile_summary)
+        self.assertEqual(trainer.profile_summary["steps"], 6)
+        self.assertTrue(os.path.exists(trainer.profile_summary["trace_path"]))
+
+    def test_inference_profile(self):
+        """推理从第一个批次开始分析，批次不足时分析全部批次"""
+        engine = InferenceEngine(build_model(), batch_size=10, profile_steps=5)
+        with mock.patch("models.inference.ProfileWindow", self.window):
+            predictions = engine.run(torch.randn(30, 4))
+        self.assertEqual(len(predictions), 30)
+        self.assertIsNotNone(engine.profile_summary)
+
+        engine.profile_steps = 0
+        engine.run(torch.randn(30, 4))
+        self.assertIsNone(engine.profile_summary)
+
+    def test_dialog(self):
+        """对话框每个算子一行"""
+        window = self.window("test", steps=1, skip=0, warmup=0, top_k=4)
+        window.start()
+        build_model()(torch.randn(8, 4))
+        window.step()
+        window.stop()
+        dialog = ProfileDialog(window.summary)
+        self.assertEqual(dialog.cpu_table.rowCount(), len(window.summary["by_cpu_time"]))
+        self.assertEqual(dialog.cpu_table.columnCount(), len(COLUMNS))
+        self.assertEqual(dialog.cpu_table.item(0, 0).text(), window.summary["by_cpu_time"][0]["name"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+模型量化测试
+测试全连接层动态量化、卷积层静态量化以及量化模型的保存和加载
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import numpy as np
+import pandas as pd
+import torch
+
+from models.compiled import CompiledModel, COMPILE_MODE_TRACE
+from models.inference import InferenceEngine, load_model
+from models.model_cache import ModelCache
+from models.neural_network import NNModel, NNLayer
+from models.quantization import (calibration_tensor, quantize_model, quantized_path,
+                                 save_quantized, is_quantized_path)
+from tests.helpers import build_model
+
+
+def build_conv_model() -> NNModel:
+    """构建包含卷积层的模型"""
+    torch.manual_seed(0)
+    model = NNModel()
+    model.add_layer(NNLayer("Conv2d", {"in_channels": 1, "out_channels": 4, "kernel_size": 3}))
+    model.add_layer(NNLayer("Relu", {}))
+    model.add_layer(NNLayer("MaxPool2d", {"kernel_size": 2}))
+    return model.eval()
+
+
+class TestQuantizeModel(unittest.TestCase):
+    """测试量化流程"""
+
+    def test_dynamic_linear(self):
+        """全连接层量化后预测结果与原模型基本一致，原模型不变"""
+        model = build_model(16, 64)
+        inputs = torch.randn(256, 16)
+        original = model.pytorch_layers[0].weight.detach().clone()
+
+        quantized = quantize_model(model, inputs)
+
+        with torch.no_grad():
+            agreement = (quantized(inputs).argmax(1) == model(inputs).argmax(1)).float().mean()
+        self.assertGreater(agreement.item(), 0.95)
+        self.assertTrue(torch.equal(model.pytorch_layers[0].weight, original))
+        self.assertEqual(type(quantized[0]).__name__, "Linear")
+        self.assertIn("quantized", type(quantized[0]).__module__)
+
+    def test_static_conv(self):
+        """卷积层用校准数据做静态量化，Conv2d+ReLU被融合"""
+        model = build_conv_model()
+        inputs = torch.randn(32, 1, 8, 8)
+
+        quantized = quantize_model(model, inputs)
+
+        block = quantized[0]
+        self.assertEqual(type(block.layers[0]).__name__, "ConvReLU2d")
+        with torch.no_grad():
+            torch.testing.assert_close(quantized(inputs), model(inputs), atol=0.1, rtol=0.1)
+
+    def test_calibration_tensor(self):
+        """按所选列随机抽取不超过指定行数的校准样本"""
+        df = pd.DataFrame(np.random.rand(100, 3), columns=["a", "b", "c"])
+
+        sample = calibration_tensor(df, ["c", "a"], rows=10)
+
+        self.assertEqual(tuple(sample.shape), (10, 2))
+        self.assertEqual(sample.dtype, torch.float32)
+        self.assertEqual(tuple(calibration_tensor(df, ["a"], rows=500).shape), (100, 1))
+
+
+class TestQuantizedArtifact(unittest.TestCase):
+    """测试量化模型文件"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        # 参数足够多时量化节省的空间才超过TorchScript文件本身的开销
+        self.model = build_model(16, 256)
+        self.weights_path = os.path.join(self.temp_dir, "1_model.pth")
+        torch.save(self.model.state_dict(), self.weights_path)
+        self.inputs = torch.randn(64, 16)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_save_next_to_weights(self):
+        """量化模型保存在权重文件旁边，文件更小，加载后可直接推理"""
+        path = save_quantized(self.model, self.weights_path, self.inputs)
+
+        self.assertEqual(path, os.path.join(self.temp_dir, "1_model.int8.pt"))
+        self.assertEqual(path, quantized_path(self.weights_path))
+        self.assertTrue(is_quantized_path(path))
+        self.assertLess(os.path.getsize(path), os.path.getsize(self.weights_path))
+
+        loaded = load_model(model_id=1, weights_path=path)
+        predictions = InferenceEngine(loaded, batch_size=16).run(self.inputs)
+        self.assertEqual(predictions.shape, (64,))
+
+    def test_model_cache_loads_quantized(self):
+        """模型缓存直接加载量化文件，不查询数据库"""
+        path = save_quantized(self.model, self.weights_path, self.inputs)
+        cache = ModelCache()
+
+        with patch("models.model_cache.NNModel.load") as mock_load:
+            model = cache.get(1, path)
+            self.assertIs(cache.get(1, path), model)
+
+        mock_load.assert_not_called()
+        self.assertGreater(cache.current_bytes, 0)
+
+    def test_compiled_mode_passes_through(self):
+        """量化模型已经是TorchScript，编译模式下直接使用"""
+        loaded = load_model(model_id=1, weights_path=save_quantized(self.model, self.weights_path, self.inputs))
+        forward = CompiledModel(loaded, COMPILE_MODE_TRACE)
+
+        with torch.inference_mode():
+            forward(self.inputs)
+        self.assertIs(forward._forward, loaded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+超参数搜索测试
+测试搜索空间展开、逐次减半的轮次安排、并行试验的淘汰以及结果入库
+"""
+
+import sys
+import os
+import json
+import tempfile
+import time
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import pandas as pd
+import torch
+
+from database.connection_pool import close_connection_pool
+from database.db_manager import DatabaseManager
+from models.dataset import TabularDataset, build_memmap_datasets
+from models.sweep import (SweepRunner, grid_trials, random_trials, halving_budgets, best_epoch,
+                          parse_values, save_sweep_results, _rank_key, STATUS_COMPLETED,
+                          STATUS_PRUNED, STATUS_STOPPED)
+from tests.helpers import build_model
+
+
+def build_datasets(samples: int = 120, val_samples: int = 40):
+    """构建线性可分的训练集和验证集"""
+    generator = torch.Generator().manual_seed(0)
+    X = torch.randn(samples, 4, generator=generator)
+    y = (X[:, 0] + X[:, 1] > 0).float()
+    indices = torch.arange(samples)
+    return (TabularDataset(X, y, indices[val_samples:]),
+            TabularDataset(X, y, indices[:val_samples]))
+
+
+class TestSearchSpace(unittest.TestCase):
+    """测试搜索空间和轮次安排"""
+
+    def test_grid_trials(self):
+        """网格搜索展开全部组合，单个值视为固定参数"""
+        trials = grid_trials({"learning_rate": [0.1, 0.01], "batch_size": [16, 32, 64],
+                              "optimizer": "Adam"})
+        self.assertEqual(len(trials), 6)
+        self.assertEqual(trials[0], {"learning_rate": 0.1, "batch_size": 16, "optimizer": "Adam"})
+        self.assertEqual(len({tuple(t.items()) for t in trials}), 6)
+
+    def test_random_trials(self):
+        """随机搜索按种子复现，区间参数按对数均匀采样且不超出范围"""
+        space = {"learning_rate": (1e-4, 1e-1), "optimizer": ["SGD", "Adam"], "epochs": 5}
+        trials = random_trials(space, 50, seed=1)
+
+        self.assertEqual(trials, random_trials(space, 50, seed=1))
+        self.assertTrue(all(1e-4 <= t["learning_rate"] <= 1e-1 for t in trials))
+        self.assertTrue(all(t["epochs"] == 5 for t in trials))
+        self.assertEqual({t["optimizer"] for t in trials}, {"SGD", "Adam"})
+        # 对数均匀采样时小于0.01的样本约占2/3
+        small = sum(t["learning_rate"] < 1e-2 for t in trials)
+        self.assertGreater(small, 20)
+
+    def test_halving_budgets(self):
+        self.assertEqual(halving_budgets(27, 1, 3), [1, 3, 9, 27])
+        self.assertEqual(halving_budgets(10, 2, 2), [2, 4, 8, 10])
+        self.assertEqual(halving_budgets(3, 5, 3), [3])
+        with self.assertRaises(ValueError):
+            halving_budgets(10, 1, 1)
+
+    def test_parse_values(self):
+        self.assertEqual(parse_values("0.1, 0.01,", float), [0.1, 0.01])
+        self.assertEqual(parse_values("Adam,SGD", str), ["Adam", "SGD"])
+        with self.assertRaises(ValueError):
+            parse_values(" , ", int)
+
+    def test_diverged_losses_rank_last(self):
+        """发散的epoch不参与比较，没有有效验证损失的试验排在最后"""
+        nan, inf = float("nan"), float("inf")
+        self.assertEqual(best_epoch([0.5, 0.3, nan]), 1)
+        self.assertEqual(best_epoch([nan, 0.4, inf]), 1)
+        self.assertIsNone(best_epoch([nan, nan]))
+
+        results = [{"val_loss": loss} for loss in (nan, 0.5, None, 0.2, inf)]
+        ranked = [r["val_loss"] for r in sorted(results, key=_rank_key)]
+        self.assertEqual(ranked[:2], [0.2, 0.5])
+
+
+class TestSweepRunner(unittest.TestCase):
+    """测试并行试验和逐次减半淘汰"""
+
+    def test_successive_halving(self):
+        """每轮淘汰一半，学习率过小的试验被淘汰，保留的试验训练到最大轮数"""
+        train_ds, val_ds = build_datasets()
+        base_params = {"batch_size": 16, "optimizer": "SGD", "loss_function": "CrossEntropyLoss",
+                       "use_gpu": False}
+        trials = grid_trials({"learning_rate": [1e-6, 1e-5, 0.5, 0.3], "epochs": 2})
+        done = []
+
+        runner = SweepRunner(build_model(out_features=2), base_params, train_ds, val_ds,
+                             max_workers=2, threads_per_trial=1, reduction_factor=2)
+        results = runner.run(trials, on_trial_done=done.append)
+
+        # 第一轮4次，第二轮2次
+        self.assertEqual(len(done), 6)
+        statuses = {r["params"]["learning_rate"]: r["status"] for r in results}
+        self.assertEqual(statuses, {1e-6: STATUS_PRUNED, 1e-5: STATUS_PRUNED,
+                                    0.5: STATUS_COMPLETED, 0.3: STATUS_COMPLETED})
+        self.assertEqual([r["epochs"] for r in results], [2, 2, 1, 1])
+        self.assertEqual(len(results[0]["history"]["val_loss"]), 2)
+        losses = [r["val_loss"] for r in results]
+        self.assertEqual(losses, sorted(losses))
+
+    def test_stop_does_not_wait_for_running_trials(self):
+        """停止时不等待运行中的试验训练完全部epoch"""
+        train_ds, val_ds = build_datasets(samples=4000, val_samples=400)
+        base_params = {"batch_size": 4, "optimizer": "SGD", "loss_function": "CrossEntropyLoss",
+                       "use_gpu": False, "learning_rate": 0.01}
+        runner = SweepRunner(build_model(out_features=2), base_params, train_ds, val_ds,
+                             max_workers=1, threads_per_trial=1, min_epochs=1000)
+        start = time.perf_counter()
+        results = runner.run([{"epochs": 1000}], should_stop=lambda: time.perf_counter() - start > 1)
+
+        self.assertLess(time.perf_counter() - start, 30)
+        self.assertEqual(results[0]["status"], STATUS_STOPPED)
+
+    def test_memmap_data_not_copied(self):
+        """内存映射的数据集由试验进程按路径重新映射，主进程的矩阵不会被移到共享内存"""
+        dataset, _ = build_datasets()
+        X, y = dataset.features, dataset.labels
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "data.csv")
+            pd.DataFrame(dict({f"x{i}": X[:, i].numpy() for i in range(4)}, label=y.numpy())).to_csv(
+                csv_path, index=False)
+            train_ds, val_ds = build_memmap_datasets(csv_path, [f"x{i}" for i in range(4)], "label",
+                                                     os.path.join(directory, "data.f32"))
+            base_params = {"batch_size": 16, "optimizer": "SGD", "loss_function": "CrossEntropyLoss",
+                           "use_gpu": False, "epochs": 1}
+            runner = SweepRunner(build_model(out_features=2), base_params, train_ds, val_ds,
+                                 max_workers=2, threads_per_trial=1)
+            results = runner.run(grid_trials({"learning_rate": [0.1, 0.5]}))
+
+            self.assertTrue(all(r["status"] == STATUS_COMPLETED for r in results))
+            self.assertFalse(train_ds.features.is_shared())
+
+    def test_rejects_streaming_data(self):
+        with self.assertRaises(ValueError):
+            SweepRunner(build_model(out_features=2), {}, object(), object())
+
+
+class TestSweepResults(unittest.TestCase):
+    """测试搜索结果入库"""
+
+    def setUp(self):
+        # 连接池是全局的，先关闭已有的连接池，使其指向临时数据库
+        close_connection_pool()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.temp_dir.name, "test.db"))
+
+    def tearDown(self):
+        close_connection_pool()
+        self.temp_dir.cleanup()
+
+    def test_save_and_query(self):
+        """结果按验证损失排序返回，失败的试验排在最后"""
+        results = [
+            {"trial": 0, "params": {"learning_rate": 0.1}, "status": "pruned", "epochs": 1,
+             "val_loss": 0.9, "val_accuracy": 50.0, "history": {"val_loss": [0.9]}},
+            {"trial": 1, "params": {"learning_rate": 0.01}, "status": "failed", "epochs": 0,
+             "val_loss": None, "val_accuracy": None, "history": None},
+            {"trial": 2, "params": {"learning_rate": 0.001}, "status": "completed", "epochs": 3,
+             "val_loss": 0.2, "val_accuracy": 95.0, "history": {"val_loss": [0.5, 0.3, 0.2]}},
+        ]
+        save_sweep_results(self.db, "abc", results)
+
+        rows = self.db.get_sweep_trials("abc")
+        self.assertEqual([r["trial"] for r in rows], [2, 0, 1])
+        self.assertEqual(json.loads(rows[0]["params"]), {"learning_rate": 0.001})
+        self.assertEqual(json.loads(rows[0]["history"])["val_loss"], [0.5, 0.3, 0.2])
+        self.assertIsNone(rows[2]["history"])
+        self.assertEqual(self.db.get_sweep_trials("other"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+训练遥测测试
+测试训练步骤各阶段耗时、吞吐量和峰值内存的记录与导出
+"""
+
+import sys
+import os
+import json
+import tempfile
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from models.telemetry import StepTelemetry, TELEMETRY_CATEGORY, STAGES, peak_rss_mb
+from models.trainer import Trainer
+from utils.performance_monitor import PerformanceMonitor, get_performance_monitor
+from tests.helpers import build_model
+from tests.test_training import build_loaders, default_train_params
+
+
+class TestStepTelemetry(unittest.TestCase):
+    """测试步骤遥测"""
+
+    def test_stages_and_epoch_summary(self):
+        """每步记录各阶段耗时和吞吐量，epoch结束时记录汇总"""
+        monitor = PerformanceMonitor()
+        telemetry = StepTelemetry(monitor=monitor)
+        telemetry.start_epoch()
+        for _ in range(3):
+            for stage in STAGES:
+                telemetry.mark(stage)
+            telemetry.end_step(16)
+        telemetry.end_epoch(0)
+
+        metrics = monitor.get_metrics(category=TELEMETRY_CATEGORY)
+        names = [m.name for m in metrics]
+        for stage in STAGES:
+            self.assertEqual(names.count(f"step_{stage}"), 3)
+        self.assertEqual(names.count("step_time"), 3)
+        for name in ("epoch_samples_per_sec", "data_wait_ratio", "peak_rss"):
+            self.assertEqual(names.count(name), 1)
+        self.assertTrue(all(m.value >= 0 for m in metrics))
+
+    def test_peak_rss(self):
+        """峰值内存不小于0且以MB为单位"""
+        self.assertGreater(peak_rss_mb(), 1)
+        self.assertLess(peak_rss_mb(), 1024 * 1024)
+
+
+class TestTrainerTelemetry(unittest.TestCase):
+    """测试训练循环中的遥测"""
+
+    def _training_metrics(self):
+        return get_performance_monitor().get_metrics(category=TELEMETRY_CATEGORY)
+
+    def test_disabled_by_default(self):
+        """未开启时不写入任何训练指标"""
+        before = len(self._training_metrics())
+        loaders = build_loaders()
+        Trainer(build_model(), default_train_params(epochs=1)).fit(
+            loaders["train_loader"], loaders["val_loader"])
+        self.assertEqual(len(self._training_metrics()), before)
+
+    def test_fit_records_and_exports(self):
+        """开启后每个训练批次记录一次，并随 export_metrics 导出"""
+        monitor = get_performance_monitor()
+        before = len(self._training_metrics())
+        loaders = build_loaders()
+        Trainer(build_model(), default_train_params(epochs=2, telemetry=True)).fit(
+            loaders["train_loader"], loaders["val_loader"])
+        new = self._training_metrics()[before:]
+        steps = 2 * len(loaders["train_loader"])
+        self.assertEqual(sum(m.name == "step_forward" for m in new), steps)
+        self.assertEqual(sum(m.name == "peak_rss" for m in new), 2)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "report.json")
+            self.assertTrue(monitor.export_metrics(path, category=TELEMETRY_CATEGORY))
+            with open(path, encoding="utf-8") as f:
+                exported = json.load(f)
+        self.assertTrue(exported)
+        self.assertTrue(all(m["category"] == TELEMETRY_CATEGORY for m in exported))
+        self.assertIn("samples_per_sec", {m["name"] for m in exported})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+性能追踪测试
+测试可嵌套区间、异步区间、Chrome trace 导出和主要路径的埋点
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import pandas as pd
+
+from utils.tracing import Tracer, get_tracer, traced
+from utils.performance_monitor import profile_section
+from models.data_processor import DataProcessor
+from ui.training_page import TrainingThread
+from tests.helpers import build_model
+from tests.test_training import build_loaders, default_train_params
+
+
+def contains(parent: dict, child: dict) -> bool:
+    """子区间在父区间的时间范围内且属于同一线程"""
+    return (parent["tid"] == child["tid"] and parent["ts"] <= child["ts"]
+            and child["ts"] + child["dur"] <= parent["ts"] + parent["dur"])
+
+
+class TestTracer(unittest.TestCase):
+    """测试追踪器"""
+
+    def setUp(self):
+        self.tracer = Tracer()
+
+    def _by_name(self):
+        return {e["name"]: e for e in self.tracer.events()}
+
+    def test_nested_spans(self):
+        """嵌套区间记录在同一线程，子区间落在父区间内，参数可以补充"""
+        with self.tracer.span("outer", "test", size=3) as outer:
+            with self.tracer.span("inner", "test"):
+                sum(range(1000))
+            outer.set(rows=10)
+        events = self._by_name()
+        self.assertTrue(contains(events["outer"], events["inner"]))
+        self.assertEqual(events["outer"]["args"], {"size": 3, "rows": 10})
+        self.assertEqual(events["outer"]["ph"], "X")
+        self.assertEqual(events["outer"]["tid"], threading.get_native_id())
+
+    def test_threads_and_errors(self):
+        """不同线程的区间带各自的线程ID，异常信息记录在参数中"""
+        def work():
+            with self.tracer.span("worker", "test"):
+                pass
+
+        thread = threading.Thread(target=work, name="tracing-worker")
+        thread.start()
+        thread.join()
+        with self.assertRaises(ValueError):
+            with self.tracer.span("failing", "test"):
+                raise ValueError("bad input")
+        events = self._by_name()
+        self.assertNotEqual(events["worker"]["tid"], events["failing"]["tid"])
+        self.assertIn("bad input", events["failing"]["args"]["error"])
+
+    def test_disabled(self):
+        """关闭后不记录任何事件"""
+        self.tracer.enabled = False
+        with self.tracer.span("ignored") as span:
+            span.set(rows=1)
+        self.tracer.end_async(self.tracer.begin_async("ignored"), "ignored")
+        self.assertEqual(self.tracer.events(), [])
+
+    def test_export_chrome_trace(self):
+        """导出的JSON包含线程名元数据、完整区间和异步区间"""
+        async_id = self.tracer.begin_async("action", "test")
+        with self.tracer.span("step", "test"):
+            pass
+        self.tracer.end_async(async_id, "action", "test")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "trace.json")
+            self.assertTrue(self.tracer.export_chrome_trace(path))
+            with open(path, encoding="utf-8") as f:
+                trace = json.load(f)
+        phases = [e["ph"] for e in trace["traceEvents"]]
+        self.assertEqual(phases, ["M", "b", "X", "e"])
+        self.assertEqual(trace["traceEvents"][0]["args"]["name"], threading.current_thread().name)
+        begin, end = trace["traceEvents"][1], trace["traceEvents"][3]
+        self.assertEqual(begin["id"], end["id"])
+
+
+class TestInstrumentation(unittest.TestCase):
+    """测试主要路径的埋点"""
+
+    def setUp(self):
+        get_tracer().clear()
+
+    def _events(self, name):
+        return [e for e in get_tracer().events() if e["name"] == name]
+
+    def test_traced_and_profile_section(self):
+        """装饰器默认使用限定名，profile_section 同时记录区间"""
+        @traced(category="test")
+        def work():
+            return 42
+
+        with profile_section("section", rows=5):
+            self.assertEqual(work(), 42)
+        section = self._events("section")[0]
+        self.assertEqual(section["args"], {"rows": 5})
+        self.assertTrue(contains(section, self._events(work.__qualname__)[0]))
+
+    def test_training_spans(self):
+        """训练线程的区间包含 Trainer.fit，其中每个epoch有训练和验证区间"""
+        thread = TrainingThread(build_model(), default_train_params(epochs=2), build_loaders())
+        thread.error_occurred.connect(self.fail)
+        thread.run()
+        run = self._events("TrainingThread.run")[0]
+        fit = self._events("Trainer.fit")[0]
+        self.assertTrue(contains(run, fit))
+        self.assertEqual(run["args"]["epochs"], 2)
+        for name in ("train", "validate"):
+            spans = self._events(name)
+            self.assertEqual([s["args"]["epoch"] for s in spans], [0, 1])
+            self.assertTrue(all(contains(fit, s) for s in spans))
+
+    def test_data_processor_spans(self):
+        """数据处理的各个阶段都有区间"""
+        df = pd.DataFrame({"a": [1.0, 2.0, None, 4.0], "b": [4.0, 3.0, 2.0, 1.0]})
+        DataProcessor().process_data(df, "标准化", "均值填充", "无")
+        parent = self._events("DataProcessor.process_data")[0]
+        for name in ("missing_values", "normalize", "feature_engineering"):
+            self.assertTrue(contains(parent, self._events(name)[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+训练流程测试
+测试训练线程及其辅助组件
+"""
+
+import sys
+import os
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import torch
+from torch.utils.data import TensorDataset, DataLoader
+
+from models.metrics import MetricAccumulator
+from models.neural_network import NNModel
+from models.trainer import (Trainer, get_scheduler, SCHEDULER_STEP, SCHEDULER_COSINE,
+                            SCHEDULER_PLATEAU)
+from ui.training_page import TrainingThread
+from tests.helpers import build_model
+
+
+def default_train_params(**overrides) -> dict:
+    """默认训练参数"""
+    params = {
+        "learning_rate": 0.01,
+        "batch_size": 16,
+        "epochs": 3,
+        "optimizer": "Adam",
+        "loss_function": "CrossEntropyLoss",
+        "use_gpu": False
+    }
+    params.update(overrides)
+    return params
+
+
+def build_loaders(samples: int = 100, in_features: int = 4, batch_size: int = 16) -> dict:
+    """构建随机分类数据加载器"""
+    torch.manual_seed(0)
+    X = torch.randn(samples, in_features)
+    y = (X[:, 0] > 0).float() + (X[:, 1] > 0).float()
+    split = int(samples * 0.8)
+    return {
+        "train_loader": DataLoader(TensorDataset(X[:split], y[:split]), batch_size=batch_size, shuffle=True),
+        "val_loader": DataLoader(TensorDataset(X[split:], y[split:]), batch_size=batch_size)
+    }
+
+
+class TestMetricAccumulator(unittest.TestCase):
+    """测试设备端指标累加器"""
+
+    def _reference(self, batches):
+        running_loss, correct, total = 0.0, 0, 0
+        for loss, outputs, targets in batches:
+            running_loss += loss.item()
+            _, predicted = outputs.max(1)
+            total += targets.size(0)
+            correct += predicted.eq(targets).sum().item()
+        return running_loss / len(batches), 100. * correct / total
+
+    def _batches(self):
+        torch.manual_seed(1)
+        return [
+            (torch.rand(()), torch.randn(10, 3), torch.randint(0, 3, (10,)))
+            for _ in range(7)
+        ]
+
+    def test_matches_per_step_item(self):
+        """结果应与逐批次 .item() 的实现一致"""
+        batches = self._batches()
+        expected_loss, expected_acc = self._reference(batches)
+
+        for sync_interval in (0, 1, 3):
+            accumulator = MetricAccumulator("cpu", sync_interval)
+            for batch in batches:
+                accumulator.update(*batch)
+            result = accumulator.compute()
+            self.assertAlmostEqual(result["loss"], expected_loss, places=6)
+            self.assertAlmostEqual(result["accuracy"], expected_acc, places=6)
+
+    def test_reset_and_empty(self):
+        """重置后结果清零，空累加器不应报错"""
+        accumulator = MetricAccumulator("cpu")
+        for batch in self._batches():
+            accumulator.update(*batch)
+        accumulator.reset()
+        self.assertEqual(accumulator.compute(), {"loss": 0.0, "accuracy": 0.0})
+
+
+class TestTrainingThread(unittest.TestCase):
+    """测试训练线程"""
+
+    def test_history_shape(self):
+        """每个epoch都应记录一次损失和准确率"""
+        thread = TrainingThread(build_model(), default_train_params(), build_loaders())
+        results = []
+        thread.training_finished.connect(lambda history, model: results.append(history))
+        thread.error_occurred.connect(self.fail)
+        thread.run()
+
+        self.assertEqual(len(results), 1)
+        history = results[0]
+        for key in ("loss", "val_loss", "accuracy", "val_accuracy"):
+            self.assertEqual(len(history[key]), 3)
+            self.assertTrue(all(isinstance(v, float) for v in history[key]))
+
+    def test_mixed_precision_history(self):
+        """混合精度训练的历史记录仍为float32计算的浮点数"""
+        thread = TrainingThread(build_model(), default_train_params(mixed_precision=True), build_loaders())
+        results = []
+        thread.training_finished.connect(lambda history, model: results.append((history, model)))
+        thread.error_occurred.connect(self.fail)
+        thread.run()
+
+        history, model = results[0]
+        for key in ("loss", "val_loss", "accuracy", "val_accuracy"):
+            self.assertEqual(len(history[key]), 3)
+            self.assertTrue(all(isinstance(v, float) and v == v for v in history[key]))
+        # 参数本身保持float32
+        self.assertTrue(all(p.dtype == torch.float32 for p in model.parameters()))
+
+    def _train_once(self, train_batches, **params) -> NNModel:
+        """用给定批次训练一个epoch，返回训练后的模型"""
+        torch.manual_seed(0)
+        model = build_model()
+        thread = TrainingThread(
+            model,
+            default_train_params(optimizer="SGD", learning_rate=0.1, epochs=1, **params),
+            {"train_loader": train_batches, "val_loader": train_batches[:1]}
+        )
+        thread.error_occurred.connect(self.fail)
+        thread.run()
+        return model
+
+    def test_gradient_accumulation_matches_large_batch(self):
+        """累积N个微批次的梯度与直接使用N倍批次大小的结果一致，包括末尾不足一组的情况"""
+        torch.manual_seed(0)
+        X = torch.randn(80, 4)
+        y = (X[:, 0] > 0).long()
+
+        def batches(size):
+            return [(X[i:i + size], y[i:i + size]) for i in range(0, len(X), size)]
+
+        for micro_size, steps, large_batches in (
+            (8, 2, batches(16)),
+            (16, 3, [(X[:48], y[:48]), (X[48:], y[48:])]),
+        ):
+            accumulated = self._train_once(batches(micro_size), accumulation_steps=steps)
+            reference = self._train_once(large_batches)
+            for a, b in zip(accumulated.parameters(), reference.parameters()):
+                torch.testing.assert_close(a, b, rtol=1e-5, atol=1e-6)
+
+    def test_compiled_training_updates_model(self):
+        """使用TorchScript执行方式训练时，更新的是原模型的参数"""
+        model = build_model()
+        initial = model.pytorch_layers[0].weight.detach().clone()
+        thread = TrainingThread(model, default_train_params(compile_mode="TorchScript"), build_loaders())
+        results = []
+        thread.training_finished.connect(lambda history, model: results.append(model))
+        thread.error_occurred.connect(self.fail)
+        thread.run()
+
+        self.assertIs(results[0], model)
+        self.assertFalse(torch.equal(initial, model.pytorch_layers[0].weight.detach()))
+
+
+
+class TestTrainerSchedule(unittest.TestCase):
+    """测试早停、学习率调度和最佳参数恢复"""
+
+    def _fit(self, model, **params):
+        trainer = Trainer(model, default_train_params(**params))
+        loaders = build_loaders()
+        history = trainer.fit(loaders["train_loader"], loaders["val_loader"])
+        return trainer, history, loaders
+
+    def test_early_stopping(self):
+        """学习率为0时验证损失不变，耐心耗尽后提前结束"""
+        trainer, history, _ = self._fit(build_model(), optimizer="SGD", learning_rate=0.0,
+                                        epochs=10, early_stopping_patience=2)
+        self.assertEqual(len(history["val_loss"]), 3)
+        self.assertTrue(trainer.stopped_early)
+        self.assertEqual(trainer.best_epoch, 0)
+
+    def test_step_and_cosine_schedulers(self):
+        """每个epoch记录实际使用的学习率"""
+        trainer, history, _ = self._fit(build_model(), optimizer="SGD", learning_rate=0.1, epochs=5,
+                                        lr_scheduler=SCHEDULER_STEP, lr_step_size=2, lr_gamma=0.5)
+        self.assertEqual(set(history), {"loss", "val_loss", "accuracy", "val_accuracy"})
+        self.assertEqual(len(trainer.lr_history), 5)
+        for actual, expected in zip(trainer.lr_history, [0.1, 0.1, 0.05, 0.05, 0.025]):
+            self.assertAlmostEqual(actual, expected)
+
+        trainer, _, _ = self._fit(build_model(), optimizer="SGD", learning_rate=0.1, epochs=4,
+                                  lr_scheduler=SCHEDULER_COSINE)
+        self.assertAlmostEqual(trainer.lr_history[0], 0.1)
+        self.assertEqual(trainer.lr_history, sorted(trainer.lr_history, reverse=True))
+
+    def test_plateau_scheduler(self):
+        """验证损失停滞超过耐心轮数后学习率乘以衰减系数"""
+        model = build_model()
+        optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+        scheduler = get_scheduler(optimizer, {"lr_scheduler": SCHEDULER_PLATEAU, "lr_patience": 1,
+                                              "lr_gamma": 0.5, "epochs": 5})
+        for _ in range(3):
+            scheduler.step(1.0)
+        self.assertAlmostEqual(optimizer.param_groups[0]["lr"], 0.05)
+        with self.assertRaises(ValueError):
+            get_scheduler(optimizer, {"lr_scheduler": "unknown"})
+
+    def test_restore_best_weights(self):
+        """学习率过大导致验证损失震荡时，训练结束后恢复验证损失最低的参数"""
+        torch.manual_seed(0)
+        model = build_model()
+        trainer, history, loaders = self._fit(model, optimizer="SGD", learning_rate=5.0, epochs=6,
+                                              restore_best_weights=True)
+        best = min(history["val_loss"])
+        self.assertGreater(history["val_loss"][-1], best)
+
+        criterion = torch.nn.CrossEntropyLoss()
+        model.eval()
+        with torch.no_grad():
+            losses = [criterion(model(x), y.long()).item() for x, y in loaders["val_loader"]]
+        self.assertAlmostEqual(sum(losses) / len(losses), best, places=5)
+        self.assertEqual(trainer.best_epoch, history["val_loss"].index(best))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,6 +7,7 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from utils.visualizer import DataVisualizer
 from models.data_processor import DataProcessor
+from models.dataset_cache import get_dataset_cache
 
 class DataAnalysisPage(QWidget):
     def __init__(self):
@@ -14,6 +15,7 @@ class DataAnalysisPage(QWidget):
         self.data_processor = DataProcessor()
         self.visualizer = DataVisualizer()
         self.df = None
+        self.user_id = None  # 由主窗口设置
         self.setup_ui()
         
     def setup_ui(self):
@@ -117,10 +119,7 @@ class DataAnalysisPage(QWidget):
         )
         if file_path:
             try:
-                if file_path.endswith('.csv'):
-                    self.df = pd.read_csv(file_path)
-                else:
-                    self.df = pd.read_excel(file_path)
+                self.df = get_dataset_cache().load(file_path, user_id=self.user_id)
                 self.update_data_preview()
                 self.update_column_combos()
                 QMessageBox.information(self, "成功", "数据导入成功！")
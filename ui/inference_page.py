@@ -1,20 +1,102 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                             QLabel, QGroupBox, QFormLayout, QLineEdit, QMessageBox,
-                            QFileDialog, QTableWidget, QTableWidgetItem, QComboBox, QScrollArea, QDialog)
-from PyQt5.QtCore import Qt
+                            QFileDialog, QTableWidget, QTableWidgetItem, QComboBox, QScrollArea, QDialog,
+                            QCheckBox, QProgressBar, QSpinBox)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+import os
 import torch
 import pandas as pd
 import numpy as np
 from models.neural_network import NNModel
+from models.dataset import read_table, build_memmap_features
+from models.dataset_cache import get_dataset_cache
+from models.inference import InferenceEngine
+from models.compiled import COMPILE_MODES
+from models.quantization import is_quantized_path
+from models.onnx_backend import (BACKENDS, BACKEND_ONNX, OnnxRuntimeModel, export_onnx,
+                                 is_onnx_path, onnx_path)
+from config.config_manager import get_config
+from models.model_cache import get_model_cache
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from ui.training_page import ModelSelectDialog
+from ui.training_page import ModelSelectDialog, STREAM_PREVIEW_ROWS
+from ui.profile_dialog import ProfileDialog
+from utils.tracing import get_tracer, trace_span, traced
+
+# 分批推理时每批的样本数
+INFERENCE_BATCH_SIZE = 4096
+
+# 结果表格最多显示的行数
+RESULT_PREVIEW_ROWS = STREAM_PREVIEW_ROWS
+
+# 回归结果散点图最多绘制的点数
+MAX_PLOT_POINTS = 5000
+
+
+def plot_indices(num_samples: int, max_points: int = MAX_PLOT_POINTS) -> np.ndarray:
+    """等间隔抽取最多 ``max_points`` 个样本的下标，绘图耗时不随预测数量增长"""
+    step = max(1, -(-num_samples // max_points))
+    return np.arange(0, num_samples, step)
+
+
+class InferenceThread(QThread):
+    """推理线程"""
+    progress_updated = pyqtSignal(int, int, object)  # 进度, 本批起始行, 本批预测结果
+    inference_finished = pyqtSignal(object)  # 完成信号，携带全部预测结果
+    profile_ready = pyqtSignal(dict)  # 算子分析结果，在完成信号之前发送
+    error_occurred = pyqtSignal(str)  # 错误信号
+    
+    def __init__(self, engine: InferenceEngine, load_inputs, output_path: str = None):
+        super().__init__()
+        self.engine = engine
+        self.load_inputs = load_inputs  # 在线程中准备输入张量，避免阻塞界面
+        self.output_path = output_path
+        self.is_running = True
+    
+    def run(self):
+        try:
+            with trace_span("InferenceThread.run", "inference") as span:
+                with trace_span("load_inputs", "inference"):
+                    inputs = self.load_inputs()
+                span.set(rows=len(inputs))
+                
+                def on_progress(done, total, predictions):
+                    progress = int(done / total * 100)
+                    self.progress_updated.emit(progress, done - len(predictions), predictions)
+                
+                with trace_span("InferenceEngine.run", "inference"):
+                    predictions = self.engine.run(
+                        inputs,
+                        output_path=self.output_path,
+                        progress_callback=on_progress,
+                        should_stop=lambda: not self.is_running
+                    )
+            if self.engine.profile_summary:
+                self.profile_ready.emit(self.engine.profile_summary)
+            self.inference_finished.emit(predictions)
+            
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+    
+    def stop(self):
+        """停止推理"""
+        self.is_running = False
 
 class InferencePage(QWidget):
     def __init__(self):
         super().__init__()
         self.model = None
         self.input_data = None
+        self.input_path = None  # 内存映射模式下的输入文件路径
+        self.inference_thread = None
+        self.engine = None  # 复用的推理引擎，保留已编译的前向计算
+        self.engine_model = None  # 构建推理引擎时的模型，换了模型后重新构建
+        self.engine_key = None  # 构建推理引擎时的设置，改变后重新构建
+        self.trace_id = None  # 从点击预测到预测结束的追踪区间
+        self.profile_dialog = None  # 最近一次的算子分析结果
+        self.weights_path = None  # 已加载的权重文件
+        self.output_path = None  # 预测结果输出文件
+        self.prediction_column = None  # 结果表格中预测结果所在列
         self.setup_ui()
     
     def setup_ui(self):
@@ -54,16 +136,57 @@ class InferencePage(QWidget):
         self.task_combo.currentTextChanged.connect(self.on_task_changed)
         task_layout.addRow("任务类型:", self.task_combo)
         
+        # 执行方式
+        self.compile_combo = QComboBox()
+        self.compile_combo.addItems(COMPILE_MODES)
+        self.compile_combo.setToolTip("TorchScript/torch.compile 编译模型，不可用时自动回退为不编译")
+        task_layout.addRow("执行方式:", self.compile_combo)
+        
+        # 推理后端及 ONNX Runtime 线程数
+        model_config = get_config().model
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItems(BACKENDS)
+        self.backend_combo.setToolTip("ONNX Runtime 后端会把模型导出为权重文件旁边的 .onnx 文件后执行")
+        task_layout.addRow("推理后端:", self.backend_combo)
+        
+        self.intra_threads_spin = QSpinBox()
+        self.intra_threads_spin.setRange(0, 256)
+        self.intra_threads_spin.setValue(model_config.onnx_intra_op_threads)
+        self.intra_threads_spin.setSpecialValueText("自动")
+        task_layout.addRow("算子内线程:", self.intra_threads_spin)
+        
+        self.inter_threads_spin = QSpinBox()
+        self.inter_threads_spin.setRange(0, 256)
+        self.inter_threads_spin.setValue(model_config.onnx_inter_op_threads)
+        self.inter_threads_spin.setSpecialValueText("自动")
+        task_layout.addRow("算子间线程:", self.inter_threads_spin)
+        
+        # 算子分析：用 torch.profiler 分析前若干个批次
+        self.profile_spin = QSpinBox()
+        self.profile_spin.setRange(0, 100)
+        self.profile_spin.setValue(0)
+        self.profile_spin.setSpecialValueText("不启用")
+        self.profile_spin.setToolTip(f"每批 {INFERENCE_BATCH_SIZE} 行，预测结束后显示耗时和内存最多的算子；\n"
+                                     "统计表和trace文件保存在 logs/profiles 目录")
+        task_layout.addRow("算子分析批次数:", self.profile_spin)
+        
         # 数据输入方式
         self.input_file_btn = QPushButton("导入数据文件")
         self.input_file_btn.clicked.connect(self.load_input_data)
         
+        # 大文件内存映射选项
+        self.memmap_check = QCheckBox("内存映射（大文件）")
+        self.memmap_check.setToolTip(
+            f"只读取前 {STREAM_PREVIEW_ROWS} 行用于预览，预测时特征矩阵由操作系统按需换入"
+        )
+        
         # 手动输入区域
         self.manual_input = QLineEdit()
         self.manual_input.setPlaceholderText("输入数据（用逗号分隔）")
         
         input_layout.addLayout(task_layout)
         input_layout.addWidget(self.input_file_btn)
+        input_layout.addWidget(self.memmap_check)
         input_layout.addWidget(QLabel("或手动输入:"))
         input_layout.addWidget(self.manual_input)
         input_group.setLayout(input_layout)
@@ -92,7 +215,20 @@ class InferencePage(QWidget):
         self.predict_btn.clicked.connect(self.predict)
         self.predict_btn.setEnabled(False)
         
+        self.stop_predict_btn = QPushButton("停止预测")
+        self.stop_predict_btn.clicked.connect(self.stop_prediction)
+        self.stop_predict_btn.setEnabled(False)
+        
+        # 预测结果增量写入文件
+        self.save_output_check = QCheckBox("预测结果写入文件")
+        
+        self.predict_progress = QProgressBar()
+        self.predict_progress.setRange(0, 100)
+        
         predict_layout.addWidget(self.predict_btn)
+        predict_layout.addWidget(self.stop_predict_btn)
+        predict_layout.addWidget(self.save_output_check)
+        predict_layout.addWidget(self.predict_progress)
         predict_group.setLayout(predict_layout)
         
         left_panel.addWidget(model_group)
@@ -157,23 +293,25 @@ class InferencePage(QWidget):
                 if not model_id:
                     return
 
-                # 加载模型结构
-                self.model = NNModel.load(model_id=model_id)
-                QMessageBox.information(self, "成功", f"模型结构 '{self.model.layers[0].type}' 加载成功！\n请现在选择该结构的权重文件。")
+                # 加载模型结构，重复选择同一模型时直接使用缓存
+                structure = get_model_cache().get(model_id)
+                QMessageBox.information(self, "成功", f"模型结构 '{structure.layers[0].type}' 加载成功！\n请现在选择该结构的权重文件。")
 
                 # 步骤2：让用户选择与该结构匹配的权重文件
                 model_path, ok = QFileDialog.getOpenFileName(
-                    self, "选择模型权重文件", "saved_models/", "Model Files (*.pth *.pt)"
+                    self, "选择模型权重文件", "saved_models/", "Model Files (*.pth *.pt *.onnx)"
                 )
                 if ok and model_path:
-                    # 加载权重
-                    state_dict = torch.load(model_path)
-                    self.model.load_state_dict(state_dict)
-                    
-                    # 设置为评估模式
-                    self.model.eval()
+                    # 加载权重，缓存中的模型已处于评估模式
+                    self.model = get_model_cache().get(model_id, model_path)
+                    self.weights_path = model_path
                     
-                    self.model_info_label.setText(f"已加载模型: ID {model_id}\n权重: {model_path.split('/')[-1]}")
+                    weights_name = model_path.split('/')[-1]
+                    if is_quantized_path(model_path):
+                        weights_name += " (int8量化)"
+                    elif is_onnx_path(model_path):
+                        weights_name += " (ONNX)"
+                    self.model_info_label.setText(f"已加载模型: ID {model_id}\n权重: {weights_name}")
                     self.predict_btn.setEnabled(True)
                     QMessageBox.information(self, "成功", "模型权重加载成功，可以开始预测！")
         
@@ -187,10 +325,13 @@ class InferencePage(QWidget):
                 self, "选择数据文件", "", "CSV Files (*.csv);;Excel Files (*.xlsx *.xls)"
             )
             if file_path:
-                if file_path.endswith('.csv'):
-                    self.input_data = pd.read_csv(file_path)
+                if self.memmap_check.isChecked():
+                    # 只读取预览行，预测时再把所选列写入内存映射矩阵
+                    self.input_data = read_table(file_path, nrows=STREAM_PREVIEW_ROWS)
+                    self.input_path = file_path
                 else:
-                    self.input_data = pd.read_excel(file_path)
+                    self.input_data = read_table(file_path)
+                    self.input_path = None
 
                 self.update_input_preview()
                 self.update_column_list()
@@ -246,9 +387,10 @@ class InferencePage(QWidget):
             for i, column_name in enumerate(self.input_data.columns):
                 self.result_table.setHorizontalHeaderItem(i, QTableWidgetItem(column_name))
 
-            # 设置行数据
-            self.result_table.setRowCount(len(self.input_data))
-            for i in range(len(self.input_data)):
+            # 设置行数据，大文件只预览前若干行
+            preview_rows = min(len(self.input_data), RESULT_PREVIEW_ROWS)
+            self.result_table.setRowCount(preview_rows)
+            for i in range(preview_rows):
                 for j in range(len(self.input_data.columns)):
                     item = QTableWidgetItem(str(self.input_data.iloc[i, j]))
                     self.result_table.setItem(i, j, item)
@@ -260,76 +402,184 @@ class InferencePage(QWidget):
         else:
             self.manual_input.setPlaceholderText("输入数值（用逗号分隔）")
     
+    @traced("InferencePage.predict", "inference")
     def predict(self):
-        """执行预测"""
+        """在后台线程中分批执行预测"""
         if self.model is None:
             QMessageBox.warning(self, "警告", "请先加载模型！")
             return
         
         try:
-            # 准备输入数据
-            if self.input_data is not None:
-                input_tensor = torch.FloatTensor(self.input_data.values)
+            # 准备输入数据，实际读取在推理线程中完成
+            if self.input_path is not None:
+                input_path = self.input_path
+                columns = list(self.input_data.columns)
+                
+                def load_inputs():
+                    matrix_path = get_dataset_cache().matrix_path(input_path, columns)
+                    return build_memmap_features(input_path, columns, matrix_path)
+                num_rows = None
+            elif self.input_data is not None:
+                input_data = self.input_data
+                
+                def load_inputs():
+                    return torch.from_numpy(input_data.to_numpy(dtype=np.float32, copy=True))
+                num_rows = len(input_data)
             else:
                 # 解析手动输入的数据
                 try:
-                    input_data = [float(x.strip()) for x in self.manual_input.text().split(",")]
-                    input_tensor = torch.FloatTensor([input_data])
+                    manual_values = [float(x.strip()) for x in self.manual_input.text().split(",")]
                 except ValueError:
                     QMessageBox.warning(self, "警告", "请输入有效的数值，并用逗号分隔！")
                     return
+                
+                def load_inputs():
+                    return torch.FloatTensor([manual_values])
+                num_rows = 1
+            
+            # 选择预测结果的输出文件
+            output_path = None
+            if self.save_output_check.isChecked():
+                # 等待用户选择文件的时间单独记录，不与计算耗时混在一起
+                with trace_span("QFileDialog.getSaveFileName", "ui"):
+                    output_path, _ = QFileDialog.getSaveFileName(
+                        self, "保存预测结果", "predictions.csv", "CSV Files (*.csv)"
+                    )
+                if not output_path:
+                    return
             
-            # 执行预测
-            with torch.no_grad():
-                outputs = self.model(input_tensor)
+            self.prepare_prediction_column(num_rows)
             
-            # 处理预测结果
-            task_type = self.task_combo.currentText()
-            if task_type == "分类":
-                predictions = outputs.argmax(dim=1)
-            else:
-                predictions = outputs.squeeze()
+            with trace_span("InferencePage.get_engine", "inference"):
+                engine = self.get_engine()
+            # 分析设置不影响编译和导出，直接修改复用的引擎
+            engine.profile_steps = self.profile_spin.value()
+            self.inference_thread = InferenceThread(engine, load_inputs, output_path)
+            self.inference_thread.progress_updated.connect(self.update_predict_progress)
+            self.inference_thread.inference_finished.connect(self.prediction_finished)
+            self.inference_thread.profile_ready.connect(self.show_profile)
+            self.inference_thread.error_occurred.connect(self.handle_predict_error)
             
-            # 显示结果
-            self.show_predictions(predictions)
+            self.output_path = output_path
+            self.update_predict_state(True)
+            self.trace_id = get_tracer().begin_async("prediction", "inference", rows=num_rows)
+            self.inference_thread.start()
             
         except Exception as e:
             QMessageBox.critical(self, "错误", f"预测失败: {str(e)}")
     
-    def show_predictions(self, predictions):
-        """显示预测结果"""
-        # 更新结果表格
-        if isinstance(predictions, torch.Tensor):
-            predictions = predictions.numpy()
-
-        # 获取预测结果的行数
-        rows = len(predictions) if isinstance(predictions, np.ndarray) else 1
-
-        # 设置表格的行数
-        self.result_table.setRowCount(rows)
-
+    def get_engine(self) -> InferenceEngine:
+        """获取推理引擎；模型和各项设置都未改变时复用，避免重复编译和导出"""
+        task_type = self.task_combo.currentText()
+        compile_mode = self.compile_combo.currentText()
+        backend = self.backend_combo.currentText()
+        threads = (self.intra_threads_spin.value(), self.inter_threads_spin.value())
+        key = (task_type, compile_mode, backend, threads)
+        # 直接比较模型对象：id 在对象被回收后可能被新加载的模型复用
+        if self.engine is None or self.engine_model is not self.model or self.engine_key != key:
+            model = self.get_backend_model(backend, *threads)
+            self.engine = InferenceEngine(model, INFERENCE_BATCH_SIZE, task_type, compile_mode)
+            self.engine_model = self.model
+            self.engine_key = key
+        return self.engine
+    
+    def get_backend_model(self, backend: str, intra_op_threads: int, inter_op_threads: int):
+        """按所选推理后端返回实际执行前向计算的模型"""
+        if isinstance(self.model, OnnxRuntimeModel):
+            # 直接加载的 .onnx 文件只能由 ONNX Runtime 执行，按当前线程设置重新创建会话
+            return OnnxRuntimeModel(self.model.path, intra_op_threads, inter_op_threads)
+        if backend != BACKEND_ONNX:
+            return self.model
+        if not isinstance(self.model, NNModel):
+            raise ValueError("量化模型不能导出为ONNX，请加载原始权重文件")
+        
+        # 权重文件更新后重新导出
+        path = onnx_path(self.weights_path)
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(self.weights_path):
+            example = None
+            if self.input_data is not None:
+                example = torch.zeros(1, len(self.input_data.columns))
+            export_onnx(self.model, path, example)
+        return OnnxRuntimeModel(path, intra_op_threads, inter_op_threads)
+    
+    def stop_prediction(self):
+        """停止预测"""
+        if self.inference_thread and self.inference_thread.isRunning():
+            self.inference_thread.stop()
+            self.inference_thread.wait()
+    
+    def update_predict_state(self, is_predicting: bool):
+        """更新预测控制按钮状态"""
+        self.predict_btn.setEnabled(not is_predicting)
+        self.stop_predict_btn.setEnabled(is_predicting)
+        if not is_predicting and self.trace_id is not None:
+            get_tracer().end_async(self.trace_id, "prediction", "inference")
+            self.trace_id = None
+        if is_predicting:
+            self.predict_progress.setValue(0)
+    
+    def update_predict_progress(self, progress: int, start: int, predictions):
+        """接收一批预测结果，更新进度和结果表格预览"""
+        self.predict_progress.setValue(progress)
+        self.fill_predictions(start, predictions)
+    
+    def prediction_finished(self, predictions):
+        """预测完成处理"""
+        self.update_predict_state(False)
+        self.predict_progress.setValue(100)
+        self.update_visualization(predictions)
+        if self.output_path:
+            QMessageBox.information(self, "完成", f"预测完成，结果已写入: {self.output_path}")
+    
+    def show_profile(self, summary: dict):
+        """显示算子分析结果"""
+        self.profile_dialog = ProfileDialog(summary, self)
+        self.profile_dialog.show()
+    
+    def handle_predict_error(self, error_msg: str):
+        """处理预测错误"""
+        self.update_predict_state(False)
+        QMessageBox.critical(self, "错误", f"预测失败: {error_msg}")
+    
+    def prepare_prediction_column(self, num_rows: int = None):
+        """在结果表格末尾添加预测结果列"""
+        if num_rows is not None:
+            self.result_table.setRowCount(min(num_rows, RESULT_PREVIEW_ROWS))
+        
         # 获取当前表格的列数
         current_column_count = self.result_table.columnCount()
-
+        
         # 如果表格中没有列或列数少于需要的列数，添加列
         if current_column_count < 2:
             self.result_table.setColumnCount(2)  # 至少需要两列，一列用于输入，一列用于预测结果
             self.result_table.setHorizontalHeaderLabels(["输入", "预测结果"])
+            self.prediction_column = 1
         else:
-            # 如果表格中已有两列或更多，确保有足够的列来显示预测结果
+            # 如果表格中已有两列或更多，添加一列显示预测结果
             self.result_table.setColumnCount(current_column_count + 1)
-
-        # 更新最后一列的标题为"预测结果"
-        self.result_table.setHorizontalHeaderLabels(
-            [self.result_table.horizontalHeaderItem(i).text() for i in range(current_column_count)] + ["预测结果"])
-
-        for i in range(rows):
-            pred = predictions[i]
-            item = QTableWidgetItem(str(pred))
-            # 将预测结果放入最后一列
-            self.result_table.setItem(i, current_column_count, item)
-
-        # 更新可视化
+            # 更新最后一列的标题为"预测结果"
+            self.result_table.setHorizontalHeaderLabels(
+                [self.result_table.horizontalHeaderItem(i).text() for i in range(current_column_count)] + ["预测结果"])
+            self.prediction_column = current_column_count
+    
+    def fill_predictions(self, start: int, predictions):
+        """把一批预测结果写入结果表格，只保留前若干行预览"""
+        if isinstance(predictions, torch.Tensor):
+            predictions = predictions.numpy()
+        
+        end = min(start + len(predictions), RESULT_PREVIEW_ROWS)
+        if end > self.result_table.rowCount():
+            self.result_table.setRowCount(end)
+        for i in range(start, end):
+            item = QTableWidgetItem(str(predictions[i - start]))
+            self.result_table.setItem(i, self.prediction_column, item)
+    
+    def show_predictions(self, predictions):
+        """显示预测结果"""
+        if isinstance(predictions, torch.Tensor):
+            predictions = predictions.numpy()
+        self.prepare_prediction_column(len(predictions))
+        self.fill_predictions(0, predictions)
         self.update_visualization(predictions)
     
     def update_visualization(self, predictions):
@@ -353,8 +603,12 @@ class InferencePage(QWidget):
         else:
             # 绘制回归结果的散点图
             if isinstance(predictions, np.ndarray):
-                ax.scatter(range(len(predictions)), predictions)
-                ax.set_title("Regression Prediction Results")
+                indices = plot_indices(len(predictions))
+                ax.scatter(indices, predictions[indices])
+                if len(indices) < len(predictions):
+                    ax.set_title(f"Regression Prediction Results ({len(indices)} of {len(predictions)} samples)")
+                else:
+                    ax.set_title("Regression Prediction Results")
                 ax.set_xlabel("Sample Index")
                 ax.set_ylabel("Predicted Value")
         
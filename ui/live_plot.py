@@ -0,0 +1,175 @@
+"""
+训练曲线实时绘制
+训练线程每个epoch只发送新增的记录，这里追加到已有曲线的数据中；
+定时器按固定频率重绘，与epoch的快慢无关。坐标范围不变时只用blit重画曲线，
+超出范围时才重绘整张图，并一次留出余量，减少完整重绘的次数。
+"""
+import math
+from typing import Dict, List, Optional
+from PyQt5.QtCore import QObject, QTimer
+
+# 两次重绘的最小间隔(毫秒)，即最多每秒重绘5次
+REFRESH_INTERVAL_MS = 200
+
+# (历史记录键, 子图序号, 图例)
+SERIES = [
+    ("loss", 0, "Training Loss"),
+    ("val_loss", 0, "Validation Loss"),
+    ("accuracy", 1, "Training Accuracy"),
+    ("val_accuracy", 1, "Validation Accuracy")
+]
+
+# 坐标范围不够时，按跨度的这个比例向外多扩展一些
+MARGIN = 0.5
+
+
+class LivePlot(QObject):
+    """损失和准确率曲线
+
+    ``append`` 只追加数据并标记需要重绘，真正的绘制由定时器完成；
+    训练结束时调用 ``flush`` 立即画出全部数据并把坐标范围收紧到数据范围。
+    """
+
+    def __init__(self, figure, canvas, interval_ms: int = REFRESH_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.figure = figure
+        self.canvas = canvas
+        self.history: Dict[str, List[float]] = {}
+        self.lines = {}
+        self.axes = []
+        self.full_draws = 0  # 完整重绘次数
+        self.blits = 0  # 只重画曲线的次数
+        self._bounds = []  # 每个子图中有限数据的 [最小值, 最大值]
+        self._dirty = False
+        self._background = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.refresh)
+        # 窗口缩放等原因重绘整张图后，重新保存背景并画上曲线
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.reset()
+
+    def reset(self, epochs: Optional[int] = None):
+        """清空曲线，``epochs`` 为计划训练的轮数，用作横轴范围"""
+        self._timer.stop()
+        self._dirty = False
+        self.history = {key: [] for key, _, _ in SERIES}
+        self._bounds = [None, None]
+        self.figure.clear()
+
+        # 损失曲线
+        ax1 = self.figure.add_subplot(211)
+        ax1.set_title("Loss Curve")
+        ax1.set_xlabel("Epoch")
+        ax1.set_ylabel("Loss")
+
+        # 准确率曲线
+        ax2 = self.figure.add_subplot(212)
+        ax2.set_title("Accuracy Curve")
+        ax2.set_xlabel("Epoch")
+        ax2.set_ylabel("Accuracy (%)")
+
+        self.axes = [ax1, ax2]
+        self.lines = {}
+        for key, index, label in SERIES:
+            # animated的曲线不参与完整重绘，由blit单独绘制
+            self.lines[key], = self.axes[index].plot([], [], label=label, animated=True)
+        for ax in self.axes:
+            ax.set_xlim(0, max(1, (epochs or 1) - 1))
+            ax.legend()
+
+        self.figure.tight_layout()
+        self._draw_full()
+
+    def append(self, delta: Dict[str, List[float]]):
+        """追加新增的记录，下一次定时重绘时显示"""
+        for key, index, _ in SERIES:
+            values = [v for v in delta.get(key, []) if math.isfinite(v)]
+            self.history[key].extend(delta.get(key, []))
+            if values:
+                low, high = min(values), max(values)
+                if self._bounds[index] is not None:
+                    low, high = min(low, self._bounds[index][0]), max(high, self._bounds[index][1])
+                self._bounds[index] = [low, high]
+        if any(delta.values()):
+            self._dirty = True
+            if not self._timer.isActive():
+                self._timer.start()
+
+    def refresh(self):
+        """定时器回调：有新数据时重绘"""
+        if not self._dirty:
+            # 没有新数据时停止定时器，空闲时不占用界面线程
+            self._timer.stop()
+            return
+        self._dirty = False
+        self._update_lines()
+        if self._expand_limits() or self._background is None:
+            self._draw_full()
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_lines()
+            self.canvas.blit(self.figure.bbox)
+            self.blits += 1
+
+    def flush(self):
+        """立即画出全部数据，坐标范围收紧到数据范围"""
+        self._timer.stop()
+        self._dirty = False
+        self._update_lines()
+        epochs = max(len(values) for values in self.history.values())
+        for ax, bounds in zip(self.axes, self._bounds):
+            ax.set_xlim(0, max(1, epochs - 1))
+            if bounds is not None:
+                ax.set_ylim(*self._padded(bounds[0], bounds[1], 0.05))
+        self._draw_full()
+
+    def _update_lines(self):
+        for key, line in self.lines.items():
+            values = self.history[key]
+            line.set_data(range(len(values)), values)
+
+    def _expand_limits(self) -> bool:
+        """数据超出坐标范围时扩大范围，返回是否有改变"""
+        changed = False
+        epochs = max(len(values) for values in self.history.values())
+        for ax, bounds in zip(self.axes, self._bounds):
+            x_high = ax.get_xlim()[1]
+            if epochs - 1 > x_high:
+                # 横轴加倍，训练轮数再多完整重绘的次数也只按对数增长
+                ax.set_xlim(0, max(2 * x_high, epochs - 1))
+                changed = True
+            if bounds is None:
+                continue
+            if ax.get_autoscaley_on():
+                # 第一次有数据，纵轴范围由数据决定
+                ax.set_ylim(*self._padded(bounds[0], bounds[1], MARGIN))
+                changed = True
+                continue
+            y_low, y_high = ax.get_ylim()
+            if bounds[0] < y_low or bounds[1] > y_high:
+                # 只扩展超出的一侧，余量按扩展后的跨度计算，单调变化的曲线也很少触发完整重绘
+                low, high = min(bounds[0], y_low), max(bounds[1], y_high)
+                span = high - low
+                ax.set_ylim(low - MARGIN * span if bounds[0] < y_low else y_low,
+                            high + MARGIN * span if bounds[1] > y_high else y_high)
+                changed = True
+        return changed
+
+    @staticmethod
+    def _padded(low: float, high: float, margin: float):
+        """在数据范围两侧各留出跨度的 ``margin`` 倍"""
+        span = high - low or abs(high) or 1.0
+        return low - margin * span, high + margin * span
+
+    def _draw_full(self):
+        self.canvas.draw()
+        self.full_draws += 1
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self.lines.values():
+            line.axes.draw_artist(line)
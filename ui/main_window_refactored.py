@@ -19,6 +19,7 @@ from ui.styles import ThemeManager
 from config import ConfigManager, get_config_manager
 from utils.logger import logger, ErrorHandler
 from utils.performance_monitor import get_performance_monitor, performance_timer
+from utils.tracing import get_tracer
 
 
 class UserToolbar(QWidget):
@@ -362,6 +363,8 @@ class MainWindow(QMainWindow):
                 import os
                 os.makedirs("logs", exist_ok=True)
                 self.performance_monitor.export_metrics("logs/performance_report.json")
+                # 可在 chrome://tracing 或 ui.perfetto.dev 中打开
+                get_tracer().export_chrome_trace("logs/trace.json")
             except Exception as e:
                 logger.warning(f"导出性能报告失败: {str(e)}")
             
@@ -0,0 +1,76 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QGroupBox, QLabel, QPushButton,
+                             QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt5.QtCore import Qt
+
+# (汇总中的键, 表头)
+COLUMNS = [
+    ("name", "算子"),
+    ("calls", "调用次数"),
+    ("self_cpu_ms", "自身CPU耗时(ms)"),
+    ("cpu_total_ms", "总CPU耗时(ms)"),
+    ("self_cpu_memory_mb", "自身内存(MB)")
+]
+
+
+class ProfileDialog(QDialog):
+    """算子分析结果对话框
+
+    显示CPU耗时和内存最多的算子，以及完整统计表和trace文件的保存位置。
+    不是模态对话框，可以一边查看一边继续操作。
+    """
+
+    def __init__(self, summary: dict, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("算子分析结果")
+        self.setModal(False)
+        self.resize(760, 600)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(f"分析了 {summary['steps']} 步，按自身耗时统计 (不含调用的子算子)"))
+
+        cpu_group = QGroupBox("CPU耗时最多的算子")
+        cpu_layout = QVBoxLayout()
+        self.cpu_table = self.build_table(summary["by_cpu_time"])
+        cpu_layout.addWidget(self.cpu_table)
+        cpu_group.setLayout(cpu_layout)
+        layout.addWidget(cpu_group)
+
+        memory_group = QGroupBox("分配内存最多的算子")
+        memory_layout = QVBoxLayout()
+        self.memory_table = self.build_table(summary["by_memory"])
+        memory_layout.addWidget(self.memory_table)
+        memory_group.setLayout(memory_layout)
+        layout.addWidget(memory_group)
+
+        # 保存位置，可以选中复制
+        paths_label = QLabel(f"统计表: {summary['table_path']}\n"
+                             f"Trace文件: {summary['trace_path']} "
+                             f"(可在 chrome://tracing 或 ui.perfetto.dev 中打开)")
+        paths_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(paths_label)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.close)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+
+    @staticmethod
+    def build_table(operators: list) -> QTableWidget:
+        """每个算子一行"""
+        table = QTableWidget(len(operators), len(COLUMNS))
+        table.setHorizontalHeaderLabels([title for _, title in COLUMNS])
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        for row, operator in enumerate(operators):
+            for column, (key, _) in enumerate(COLUMNS):
+                value = operator[key]
+                text = f"{value:.3f}" if isinstance(value, float) else str(value)
+                item = QTableWidgetItem(text)
+                if column > 0:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row, column, item)
+        return table
@@ -0,0 +1,303 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QGroupBox,
+                             QPushButton, QLabel, QLineEdit, QComboBox, QSpinBox,
+                             QProgressBar, QTableWidget, QTableWidgetItem, QHeaderView,
+                             QMessageBox)
+from PyQt5.QtCore import QThread, pyqtSignal
+import os
+from models.sweep import (SweepRunner, grid_trials, random_trials, new_sweep_id, parse_values,
+                          save_sweep_results, SEARCH_MODES, SEARCH_RANDOM)
+from models.trainer import OPTIMIZERS
+from utils.logger import logger
+
+STATUS_TEXT = {
+    "completed": "完成",
+    "pruned": "已淘汰",
+    "failed": "失败",
+    "stopped": "已停止"
+}
+
+
+class SweepThread(QThread):
+    """超参数搜索线程"""
+    trial_finished = pyqtSignal(dict)  # 每完成一次训练发送一次
+    sweep_finished = pyqtSignal(list)  # 全部结果，按验证损失排序
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, runner: SweepRunner, trials: list):
+        super().__init__()
+        self.runner = runner
+        self.trials = trials
+        self.is_running = True
+
+    def run(self):
+        try:
+            results = self.runner.run(self.trials, on_trial_done=self.trial_finished.emit,
+                                      should_stop=lambda: not self.is_running)
+            self.sweep_finished.emit(results)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+    def stop(self):
+        """停止搜索，正在训练的试验在当前epoch结束后退出"""
+        self.is_running = False
+
+
+class SweepDialog(QDialog):
+    """超参数搜索对话框
+
+    搜索学习率、批次大小、优化器和训练轮数，其余训练参数沿用训练页面的设置。
+    搜索完成后可以把最佳参数应用回训练页面。
+    """
+
+    def __init__(self, model, base_params: dict, train_dataset, val_dataset,
+                 user_id=None, model_id=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("超参数搜索")
+        self.resize(760, 560)
+        self.model = model
+        self.base_params = base_params
+        self.train_dataset = train_dataset
+        self.val_dataset = val_dataset
+        self.user_id = user_id
+        self.model_id = model_id
+        self.sweep_thread = None
+        self.results = []
+        self.best_params = None
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout()
+
+        # 搜索空间
+        space_group = QGroupBox("搜索空间")
+        space_layout = QFormLayout()
+
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(SEARCH_MODES)
+        self.mode_combo.currentTextChanged.connect(self.update_mode)
+        space_layout.addRow("搜索方式:", self.mode_combo)
+
+        lr = self.base_params["learning_rate"]
+        self.lr_edit = QLineEdit(f"{lr * 10:g}, {lr:g}, {lr / 10:g}")
+        self.lr_edit.setToolTip("网格搜索使用列出的值；随机搜索在最小值和最大值之间按对数均匀采样")
+        space_layout.addRow("学习率:", self.lr_edit)
+
+        batch_size = self.base_params["batch_size"]
+        self.batch_size_edit = QLineEdit(f"{max(1, batch_size // 2)}, {batch_size}, {batch_size * 2}")
+        space_layout.addRow("批次大小:", self.batch_size_edit)
+
+        self.optimizer_edit = QLineEdit(", ".join(OPTIMIZERS))
+        space_layout.addRow("优化器:", self.optimizer_edit)
+
+        self.epochs_edit = QLineEdit(str(self.base_params["epochs"]))
+        space_layout.addRow("训练轮数:", self.epochs_edit)
+
+        self.num_trials_spin = QSpinBox()
+        self.num_trials_spin.setRange(1, 1000)
+        self.num_trials_spin.setValue(20)
+        space_layout.addRow("随机搜索次数:", self.num_trials_spin)
+
+        space_group.setLayout(space_layout)
+
+        # 并行和淘汰设置
+        run_group = QGroupBox("执行设置")
+        run_layout = QFormLayout()
+
+        cpu_count = os.cpu_count() or 1
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, cpu_count)
+        self.workers_spin.setValue(min(4, cpu_count))
+        run_layout.addRow("并行试验数:", self.workers_spin)
+
+        self.threads_spin = QSpinBox()
+        self.threads_spin.setRange(0, cpu_count)
+        self.threads_spin.setValue(0)
+        self.threads_spin.setSpecialValueText("自动")
+        self.threads_spin.setToolTip("每个试验进程的计算线程数，自动时把CPU核心平均分给各试验")
+        run_layout.addRow("每个试验线程数:", self.threads_spin)
+
+        self.min_epochs_spin = QSpinBox()
+        self.min_epochs_spin.setRange(1, 1000)
+        self.min_epochs_spin.setValue(1)
+        self.min_epochs_spin.setToolTip("逐次减半第一轮的训练轮数")
+        run_layout.addRow("首轮训练轮数:", self.min_epochs_spin)
+
+        self.reduction_spin = QSpinBox()
+        self.reduction_spin.setRange(2, 10)
+        self.reduction_spin.setValue(3)
+        self.reduction_spin.setToolTip("每轮只保留验证损失最低的 1/N 继续训练，训练轮数乘以N")
+        run_layout.addRow("淘汰倍数:", self.reduction_spin)
+
+        run_group.setLayout(run_layout)
+
+        settings_layout = QHBoxLayout()
+        settings_layout.addWidget(space_group)
+        settings_layout.addWidget(run_group)
+        layout.addLayout(settings_layout)
+
+        # 控制按钮
+        button_layout = QHBoxLayout()
+        self.start_btn = QPushButton("开始搜索")
+        self.start_btn.clicked.connect(self.start_sweep)
+        self.stop_btn = QPushButton("停止")
+        self.stop_btn.clicked.connect(self.stop_sweep)
+        self.stop_btn.setEnabled(False)
+        self.apply_btn = QPushButton("应用最佳参数")
+        self.apply_btn.clicked.connect(self.accept)
+        self.apply_btn.setEnabled(False)
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.reject)
+        for button in (self.start_btn, self.stop_btn, self.apply_btn, close_btn):
+            button_layout.addWidget(button)
+        layout.addLayout(button_layout)
+
+        self.progress_bar = QProgressBar()
+        self.status_label = QLabel("未开始")
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.status_label)
+
+        # 结果表格
+        self.result_table = QTableWidget(0, 7)
+        self.result_table.setHorizontalHeaderLabels(
+            ["试验", "学习率", "批次大小", "优化器", "训练轮数", "验证损失", "验证准确率"]
+        )
+        self.result_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.result_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.result_table)
+
+        self.setLayout(layout)
+        self.update_mode(self.mode_combo.currentText())
+
+    def update_mode(self, mode: str):
+        """随机搜索时才需要设置搜索次数"""
+        self.num_trials_spin.setEnabled(mode == SEARCH_RANDOM)
+
+    def build_trials(self) -> list:
+        """根据输入的搜索空间生成试验列表"""
+        learning_rates = parse_values(self.lr_edit.text(), float)
+        optimizers = parse_values(self.optimizer_edit.text(), str)
+        unknown = [name for name in optimizers if name not in OPTIMIZERS]
+        if unknown:
+            raise ValueError(f"不支持的优化器: {', '.join(unknown)}")
+        space = {
+            "learning_rate": learning_rates,
+            "batch_size": parse_values(self.batch_size_edit.text(), int),
+            "optimizer": optimizers,
+            "epochs": parse_values(self.epochs_edit.text(), int)
+        }
+        if self.mode_combo.currentText() == SEARCH_RANDOM:
+            if min(learning_rates) < max(learning_rates):
+                space["learning_rate"] = (min(learning_rates), max(learning_rates))
+            return random_trials(space, self.num_trials_spin.value())
+        return grid_trials(space)
+
+    def start_sweep(self):
+        """开始搜索"""
+        try:
+            trials = self.build_trials()
+            runner = SweepRunner(
+                self.model, self.base_params, self.train_dataset, self.val_dataset,
+                max_workers=self.workers_spin.value(),
+                threads_per_trial=self.threads_spin.value() or None,
+                min_epochs=self.min_epochs_spin.value(),
+                reduction_factor=self.reduction_spin.value()
+            )
+        except Exception as e:
+            QMessageBox.warning(self, "警告", f"搜索设置有误: {str(e)}")
+            return
+
+        self.results = []
+        self.trial_runs = 0
+        self.best_params = None
+        self.result_table.setRowCount(0)
+        self.progress_bar.setRange(0, 0)  # 逐次减半的总训练次数事先未知
+        self.status_label.setText(f"正在搜索 {len(trials)} 组参数...")
+
+        self.sweep_thread = SweepThread(runner, trials)
+        self.sweep_thread.trial_finished.connect(self.trial_finished)
+        self.sweep_thread.sweep_finished.connect(self.sweep_finished)
+        self.sweep_thread.error_occurred.connect(self.handle_error)
+        self.update_ui_state(True)
+        self.sweep_thread.start()
+
+    def stop_sweep(self):
+        """停止搜索"""
+        if self.sweep_thread and self.sweep_thread.isRunning():
+            self.sweep_thread.stop()
+            self.status_label.setText("正在停止...")
+
+    def trial_finished(self, result: dict):
+        """显示单次训练的结果"""
+        self.trial_runs += 1
+        val_loss = result["val_loss"]
+        loss_text = f"{val_loss:.4f}" if val_loss is not None else "失败"
+        self.status_label.setText(
+            f"已完成 {self.trial_runs} 次训练，试验 {result['trial']} "
+            f"训练 {result['epochs']} 轮，验证损失 {loss_text}"
+        )
+
+    def sweep_finished(self, results: list):
+        """搜索完成：显示排序后的结果并保存到数据库"""
+        self.update_ui_state(False)
+        self.results = results
+        self.show_results(results)
+
+        completed = [r for r in results if r["val_loss"] is not None]
+        if completed:
+            self.best_params = completed[0]["params"]
+            self.apply_btn.setEnabled(True)
+        self.status_label.setText(f"搜索结束，共 {len(results)} 组参数，完成训练 {len(completed)} 组")
+
+        try:
+            from database.db_manager import DatabaseManager
+            sweep_id = new_sweep_id()
+            save_sweep_results(DatabaseManager(), sweep_id, results,
+                               user_id=self.user_id, model_id=self.model_id)
+            logger.info(f"超参数搜索结果已保存: {sweep_id}")
+        except Exception as e:
+            QMessageBox.warning(self, "警告", f"保存搜索结果失败: {str(e)}")
+
+    def show_results(self, results: list):
+        """在表格中显示结果，最好的参数在第一行"""
+        self.result_table.setRowCount(len(results))
+        for row, result in enumerate(results):
+            params = result["params"]
+            val_loss = result["val_loss"]
+            val_accuracy = result["val_accuracy"]
+            cells = [
+                f"{result['trial']} ({STATUS_TEXT.get(result['status'], result['status'])})",
+                f"{params['learning_rate']:.6g}",
+                str(params["batch_size"]),
+                params["optimizer"],
+                f"{result['epochs']}/{params['epochs']}",
+                f"{val_loss:.4f}" if val_loss is not None else "-",
+                f"{val_accuracy:.2f}%" if val_accuracy is not None else "-"
+            ]
+            for column, text in enumerate(cells):
+                self.result_table.setItem(row, column, QTableWidgetItem(text))
+
+    def handle_error(self, error_msg: str):
+        """处理搜索错误"""
+        self.update_ui_state(False)
+        QMessageBox.critical(self, "错误", f"超参数搜索出错: {error_msg}")
+
+    def update_ui_state(self, is_running: bool):
+        """更新UI状态"""
+        self.start_btn.setEnabled(not is_running)
+        self.stop_btn.setEnabled(is_running)
+        if not is_running:
+            self.progress_bar.setRange(0, 1)
+            self.progress_bar.setValue(1)
+
+    def reject(self):
+        """关闭对话框前停止搜索；不在界面线程中等待，搜索线程结束后再关闭"""
+        if self.sweep_thread and self.sweep_thread.isRunning():
+            self.stop_sweep()
+            self.stop_btn.setEnabled(False)
+            self.sweep_thread.finished.connect(self.close_after_stop)
+            return
+        super().reject()
+
+    def close_after_stop(self):
+        """搜索线程结束后关闭对话框"""
+        super().reject()
@@ -8,16 +8,43 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import torch
 import torch.nn as nn
-import torch.optim as optim
 from models.neural_network import NNModel
+from models.compiled import COMPILE_MODES
+from models.trainer import Trainer, SCHEDULERS, SCHEDULER_STEP, SCHEDULER_PLATEAU
+from models.distributed import train_data_parallel
+from models.checkpoint import latest_checkpoint, new_run_directory, prune_runs
+from ui.sweep_dialog import SweepDialog
+from ui.live_plot import LivePlot
+from ui.profile_dialog import ProfileDialog
+from models.dataset import (build_tabular_datasets, build_streaming_datasets,
+                            build_memmap_datasets, read_table, TensorBatchLoader)
+from models.dataset_cache import get_dataset_cache
+from models.model_cache import get_model_cache
+from models.quantization import calibration_tensor, save_quantized
+from models.onnx_backend import export_onnx, onnx_path
+from config.config_manager import get_config
+from utils.logger import logger
+from utils.tracing import get_tracer, trace_span
 from utils.visualizer import DataVisualizer
+import hashlib
+import json
+import os
 import pandas as pd
 from datetime import datetime
 
+# 流式读取/内存映射时用于列选择的预览行数
+STREAM_PREVIEW_ROWS = 1000
+
+# 训练数据读取方式
+DATA_MODE_MEMORY = "全部加载"
+DATA_MODE_STREAM = "流式读取"
+DATA_MODE_MEMMAP = "内存映射"
+
 class TrainingThread(QThread):
     """训练线程"""
-    progress_updated = pyqtSignal(int, dict)  # 进度信号
+    progress_updated = pyqtSignal(int, dict)  # 进度信号，附带上次发送之后新增的历史记录
     training_finished = pyqtSignal(dict, nn.Module)  # 完成信号
+    profile_ready = pyqtSignal(dict)  # 算子分析结果，在完成信号之前发送
     error_occurred = pyqtSignal(str)  # 错误信号
     
     def __init__(self, model, train_params, data):
@@ -25,107 +52,53 @@ class TrainingThread(QThread):
         self.model = model
         self.train_params = train_params
         self.data = data
+        self.trainer = None
         self.is_running = True
+        self.sent_epochs = 0  # 已通过进度信号发送的epoch数
     
     def run(self):
         try:
-            # 设置设备
-            device = torch.device("cuda" if self.train_params["use_gpu"] and 
-                                torch.cuda.is_available() else "cpu")
-            self.model = self.model.to(device)
-            
-            # 获取优化器
-            optimizer = self.get_optimizer(self.train_params["optimizer"])
-            
-            # 获取损失函数
-            criterion = self.get_criterion(self.train_params["loss_function"])
-            
-            # 训练循环
-            epochs = self.train_params["epochs"]
-            history = {"loss": [], "val_loss": [], "accuracy": [], "val_accuracy": []}
-            
-            for epoch in range(epochs):
-                if not self.is_running:
-                    break
-                
-                # 训练模式
-                self.model.train()
-                running_loss = 0.0
-                correct = 0
-                total = 0
-                
-                # 训练一个epoch
-                for i, (inputs, targets) in enumerate(self.data["train_loader"]):
-                    inputs, targets = inputs.to(device), targets.to(device)
-                    if self.train_params["loss_function"] == "CrossEntropyLoss":
-                        targets = targets.to(torch.long)
-                    optimizer.zero_grad()
-                    outputs = self.model(inputs).to(torch.float32)
-                    loss = criterion(outputs, targets)
-                    loss.backward()
-                    optimizer.step()
-                    
-                    running_loss += loss.item()
-                    _, predicted = outputs.max(1)
-                    total += targets.size(0)
-                    correct += predicted.eq(targets).sum().item()
-                
-                # 验证模式
-                self.model.eval()
-                val_loss = 0.0
-                val_correct = 0
-                val_total = 0
-                
-                with torch.no_grad():
-                    for inputs, targets in self.data["val_loader"]:
-                        inputs, targets = inputs.to(device), targets.to(device)
-                        if self.train_params["loss_function"] == "CrossEntropyLoss":
-                            targets = targets.to(torch.long)
-                        outputs = self.model(inputs).to(torch.float32)
-                        loss = criterion(outputs, targets)
-                        
-                        val_loss += loss.item()
-                        _, predicted = outputs.max(1)
-                        val_total += targets.size(0)
-                        val_correct += predicted.eq(targets).sum().item()
-                
-                # 更新历史记录
-                history["loss"].append(running_loss / len(self.data["train_loader"]))
-                history["val_loss"].append(val_loss / len(self.data["val_loader"]))
-                history["accuracy"].append(100. * correct / total)
-                history["val_accuracy"].append(100. * val_correct / val_total)
-                
-                # 发送进度信号
-                progress = int((epoch + 1) / epochs * 100)
-                self.progress_updated.emit(progress, history)
+            num_workers = self.train_params.get("num_workers", 1)
+            with trace_span("TrainingThread.run", "training", epochs=self.train_params["epochs"],
+                            batch_size=self.train_params["batch_size"], num_workers=num_workers):
+                if num_workers > 1:
+                    # 多进程数据并行：每个进程训练一个分片，0号进程发回汇总后的历史记录
+                    history = train_data_parallel(
+                        self.model, self.train_params,
+                        self.data["train_loader"].dataset, self.data["val_loader"].dataset,
+                        num_workers, on_epoch_end=self.report_progress,
+                        should_stop=lambda: not self.is_running
+                    )
+                else:
+                    self.trainer = Trainer(self.model, self.train_params)
+                    self.trainer.is_running = self.is_running
+                    history = self.trainer.fit(self.data["train_loader"], self.data["val_loader"],
+                                               on_epoch_end=self.report_progress)
+                    self.model = self.trainer.model
+                    if self.trainer.profile_summary:
+                        self.profile_ready.emit(self.trainer.profile_summary)
             
             self.training_finished.emit(history, self.model)
             
         except Exception as e:
             self.error_occurred.emit(str(e))
     
-    def get_optimizer(self, optimizer_name: str):
-        """获取优化器"""
-        optimizers = {
-            "SGD": optim.SGD,
-            "Adam": optim.Adam,
-            "RMSprop": optim.RMSprop
-        }
-        return optimizers[optimizer_name](self.model.parameters(), 
-                                        lr=self.train_params["learning_rate"])
-    
-    def get_criterion(self, loss_name: str):
-        """获取损失函数"""
-        criteria = {
-            "CrossEntropyLoss": nn.CrossEntropyLoss,
-            "MSELoss": nn.MSELoss,
-            "BCELoss": nn.BCELoss
-        }
-        return criteria[loss_name]()
+    def report_progress(self, epoch: int, history: dict):
+        """发送进度信号
+
+        只发送上次之后新增的记录，信号的数据量不随训练轮数增长；
+        从检查点继续时第一次发送会带上之前的记录。
+        """
+        progress = int((epoch + 1) / self.train_params["epochs"] * 100)
+        delta = {key: values[self.sent_epochs:] for key, values in history.items()}
+        self.sent_epochs = len(history["loss"])
+        self.progress_updated.emit(progress, delta)
     
     def stop(self):
         """停止训练"""
         self.is_running = False
+        if self.trainer is not None:
+            self.trainer.stop()
 
 class ModelSelectDialog(QDialog):
     """模型选择对话框"""
@@ -184,10 +157,16 @@ class TrainingPage(QWidget):
     def __init__(self):
         super().__init__()
         self.model = None
+        self.model_id = None  # 从数据库加载的模型ID，超参数搜索结果记录时使用
         self.training_thread = None
+        self.trace_id = None  # 从点击开始训练到训练结束的追踪区间
+        self.profile_dialog = None  # 最近一次的算子分析结果
         self.visualizer = DataVisualizer()
         self.data = None
         self.df = None
+        self.data_path = None  # 流式读取/内存映射时的数据文件路径
+        self.data_mode = DATA_MODE_MEMORY
+        self.feature_columns = None  # 已选择的特征列，量化校准时使用
         self.feature_checkboxes = {}  # 存储特征复选框
         self.label_radios = {}  # 存储标签单选按钮
         self.user_id = None  # 初始化用户ID
@@ -230,7 +209,19 @@ class TrainingPage(QWidget):
         
         self.data_info_label = QLabel("未加载数据")
         
+        # 大文件读取方式
+        data_mode_layout = QFormLayout()
+        self.data_mode_combo = QComboBox()
+        self.data_mode_combo.addItems([DATA_MODE_MEMORY, DATA_MODE_STREAM, DATA_MODE_MEMMAP])
+        self.data_mode_combo.setToolTip(
+            f"流式读取：训练时按块读取CSV文件\n"
+            f"内存映射：特征矩阵写入磁盘，由操作系统按需换入\n"
+            f"两种方式都只读取前 {STREAM_PREVIEW_ROWS} 行用于选择列"
+        )
+        data_mode_layout.addRow("读取方式:", self.data_mode_combo)
+        
         data_layout.addWidget(self.load_data_btn)
+        data_layout.addLayout(data_mode_layout)
         data_layout.addWidget(self.data_info_label)
         data_group.setLayout(data_layout)
         
@@ -282,6 +273,8 @@ class TrainingPage(QWidget):
         
         # 学习率
         self.lr_spin = QDoubleSpinBox()
+        # 默认只保留两位小数，0.001 会被显示并取值为 0
+        self.lr_spin.setDecimals(5)
         self.lr_spin.setRange(0.00001, 1.0)
         self.lr_spin.setSingleStep(0.0001)
         self.lr_spin.setValue(0.001)
@@ -293,12 +286,56 @@ class TrainingPage(QWidget):
         self.batch_size_spin.setValue(32)
         hyperparams_layout.addRow("批次大小:", self.batch_size_spin)
         
+        # 梯度累积：每累积N个批次的梯度更新一次参数，等效批次大小为 批次大小×N
+        self.accumulation_spin = QSpinBox()
+        self.accumulation_spin.setRange(1, 256)
+        self.accumulation_spin.setValue(1)
+        self.accumulation_spin.setToolTip("内存不变的情况下使用更大的等效批次，同时减少参数更新次数")
+        hyperparams_layout.addRow("梯度累积步数:", self.accumulation_spin)
+        
+        self.effective_batch_label = QLabel()
+        self.batch_size_spin.valueChanged.connect(self.update_effective_batch)
+        self.accumulation_spin.valueChanged.connect(self.update_effective_batch)
+        hyperparams_layout.addRow("等效批次大小:", self.effective_batch_label)
+        self.update_effective_batch()
+        
         # 训练轮数
         self.epochs_spin = QSpinBox()
         self.epochs_spin.setRange(1, 1000)
         self.epochs_spin.setValue(10)
         hyperparams_layout.addRow("训练轮数:", self.epochs_spin)
         
+        # 学习率调度
+        self.scheduler_combo = QComboBox()
+        self.scheduler_combo.addItems(SCHEDULERS)
+        self.scheduler_combo.currentTextChanged.connect(self.update_scheduler_options)
+        hyperparams_layout.addRow("学习率调度:", self.scheduler_combo)
+        
+        self.lr_step_spin = QSpinBox()
+        self.lr_step_spin.setRange(1, 1000)
+        self.lr_step_spin.setValue(10)
+        self.lr_step_spin.setToolTip("StepLR：每隔多少轮衰减一次\nReduceLROnPlateau：验证损失连续多少轮未下降时衰减")
+        hyperparams_layout.addRow("衰减间隔(轮):", self.lr_step_spin)
+        
+        self.lr_gamma_spin = QDoubleSpinBox()
+        self.lr_gamma_spin.setRange(0.01, 0.99)
+        self.lr_gamma_spin.setSingleStep(0.05)
+        self.lr_gamma_spin.setValue(0.1)
+        hyperparams_layout.addRow("衰减系数:", self.lr_gamma_spin)
+        self.update_scheduler_options(self.scheduler_combo.currentText())
+        
+        # 早停：验证损失连续N轮没有改善时提前结束训练
+        self.early_stop_spin = QSpinBox()
+        self.early_stop_spin.setRange(0, 1000)
+        self.early_stop_spin.setValue(0)
+        self.early_stop_spin.setSpecialValueText("不启用")
+        self.early_stop_spin.setToolTip("验证损失连续这么多轮没有下降时提前结束训练")
+        hyperparams_layout.addRow("早停耐心(轮):", self.early_stop_spin)
+        
+        self.restore_best_check = QCheckBox("训练结束后恢复验证损失最低的参数")
+        self.restore_best_check.setChecked(True)
+        hyperparams_layout.addRow(self.restore_best_check)
+        
         hyperparams_group.setLayout(hyperparams_layout)
         
         # 训练设置组
@@ -320,6 +357,61 @@ class TrainingPage(QWidget):
         self.gpu_check.setChecked(torch.cuda.is_available())
         training_layout.addRow(self.gpu_check)
         
+        # 混合精度训练
+        self.amp_check = QCheckBox("混合精度训练")
+        self.amp_check.setToolTip("CPU上使用bfloat16，GPU上使用float16；支持AMX/AVX512-BF16的CPU上训练更快")
+        training_layout.addRow(self.amp_check)
+        
+        # 执行方式：编译后减少逐层调用的开销
+        self.compile_combo = QComboBox()
+        self.compile_combo.addItems(COMPILE_MODES)
+        self.compile_combo.setToolTip("TorchScript/torch.compile 编译模型，不可用时自动回退为不编译")
+        training_layout.addRow("执行方式:", self.compile_combo)
+        
+        # 检查点：后台定期保存模型和优化器状态，崩溃后可以继续训练
+        model_config = get_config().model
+        self.checkpoint_check = QCheckBox("定期保存检查点")
+        self.checkpoint_check.setChecked(model_config.auto_backup)
+        self.checkpoint_check.setToolTip(
+            f"保存在 {model_config.checkpoint_dir} 目录，每次训练最多保留 {model_config.max_backup_count} 个，\n"
+            f"只保留最近 {model_config.checkpoint_runs} 次训练的检查点"
+        )
+        training_layout.addRow(self.checkpoint_check)
+        
+        self.checkpoint_interval_spin = QSpinBox()
+        self.checkpoint_interval_spin.setRange(1, 1000)
+        self.checkpoint_interval_spin.setValue(model_config.checkpoint_interval)
+        training_layout.addRow("检查点间隔(轮):", self.checkpoint_interval_spin)
+        
+        self.resume_check = QCheckBox("从最新检查点继续训练")
+        training_layout.addRow(self.resume_check)
+        
+        # 训练遥测：记录每步的数据读取、拷贝、前向、反向和参数更新耗时
+        self.telemetry_check = QCheckBox("记录训练步骤耗时")
+        self.telemetry_check.setToolTip("写入性能监控的training类别，退出时随性能报告导出；\n"
+                                        "GPU训练时每个阶段都要同步设备，会略微变慢")
+        training_layout.addRow(self.telemetry_check)
+        
+        # 算子分析：用 torch.profiler 分析第一个批次之后的若干步
+        self.profile_spin = QSpinBox()
+        self.profile_spin.setRange(0, 100)
+        self.profile_spin.setValue(0)
+        self.profile_spin.setSpecialValueText("不启用")
+        self.profile_spin.setToolTip("跳过第一个批次并预热一步后开始分析，训练结束后显示耗时和内存最多的算子；\n"
+                                     "统计表和trace文件保存在 logs/profiles 目录；只在单进程训练时生效")
+        training_layout.addRow("算子分析步数:", self.profile_spin)
+        
+        # 数据并行：在本机启动多个训练进程，每个进程训练数据的一个分片
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.workers_spin.setValue(1)
+        self.workers_spin.setToolTip(
+            "大于1时用多个CPU进程做数据并行训练，CPU核心平均分配给各进程\n"
+            "批次大小为每个进程的批次大小；不支持流式读取"
+        )
+        self.workers_spin.valueChanged.connect(self.update_effective_batch)
+        training_layout.addRow("训练进程数:", self.workers_spin)
+        
         training_group.setLayout(training_layout)
         
         # 训练控制组
@@ -336,8 +428,13 @@ class TrainingPage(QWidget):
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 100)
         
+        # 并行训练多组超参数，选出验证损失最低的一组
+        self.sweep_btn = QPushButton("超参数搜索")
+        self.sweep_btn.clicked.connect(self.open_sweep_dialog)
+        
         control_layout.addWidget(self.start_btn)
         control_layout.addWidget(self.stop_btn)
+        control_layout.addWidget(self.sweep_btn)
         control_layout.addWidget(self.progress_bar)
         
         control_group.setLayout(control_layout)
@@ -366,6 +463,7 @@ class TrainingPage(QWidget):
         self.figure = plt.figure(figsize=(6, 4))  # 稍微减小图表尺寸
         self.canvas = FigureCanvas(self.figure)
         self.canvas.setMinimumSize(400, 300)  # 设置最小尺寸
+        self.live_plot = LivePlot(self.figure, self.canvas, parent=self)
         
         right_panel.addWidget(QLabel("训练过程可视化"))
         right_panel.addWidget(self.canvas)
@@ -376,6 +474,19 @@ class TrainingPage(QWidget):
         
         self.setLayout(layout)
     
+    def update_scheduler_options(self, scheduler: str):
+        """只有需要的调度器才启用衰减间隔和衰减系数"""
+        self.lr_step_spin.setEnabled(scheduler in (SCHEDULER_STEP, SCHEDULER_PLATEAU))
+        self.lr_gamma_spin.setEnabled(scheduler in (SCHEDULER_STEP, SCHEDULER_PLATEAU))
+    
+    def update_effective_batch(self):
+        """显示梯度累积和多进程训练后的等效批次大小"""
+        # 超参数组先于训练设置组创建，此时进程数控件还不存在
+        num_workers = self.workers_spin.value() if hasattr(self, "workers_spin") else 1
+        self.effective_batch_label.setText(
+            str(self.batch_size_spin.value() * self.accumulation_spin.value() * num_workers)
+        )
+    
     def load_model(self):
         """加载已保存的模型"""
         try:
@@ -435,9 +546,10 @@ class TrainingPage(QWidget):
                 model_id = dialog.get_selected_model_id()
                 if model_id:
                     try:
-                        # 加载模型时传入用户ID进行验证
-                        model = NNModel.load(model_id=model_id, user_id=self.user_id)
+                        # 加载模型时传入用户ID进行验证；训练会修改参数，因此取缓存的独立副本
+                        model = get_model_cache().get(model_id, user_id=self.user_id, copy=True)
                         self.set_model(model)
+                        self.model_id = model_id
                         QMessageBox.information(self, "成功", "模型加载成功！")
                     except Exception as e:
                         QMessageBox.critical(self, "错误", f"加载模型失败: {str(e)}")
@@ -450,6 +562,7 @@ class TrainingPage(QWidget):
     def set_model(self, model):
         """设置要训练的模型"""
         self.model = model
+        self.model_id = None
         # 更新UI状态
         self.start_btn.setEnabled(True)
         # 更新模型信息显示
@@ -474,10 +587,19 @@ class TrainingPage(QWidget):
             )
             if file_path:
                 # 加载数据
-                if file_path.endswith('.csv'):
-                    self.df = pd.read_csv(file_path)
+                data_mode = self.data_mode_combo.currentText()
+                if data_mode == DATA_MODE_MEMORY:
+                    # 重复加载同一文件时直接读取二进制缓存
+                    self.df = get_dataset_cache().load(file_path, user_id=self.user_id)
+                    self.data_path = None
                 else:
-                    self.df = pd.read_excel(file_path)
+                    if data_mode == DATA_MODE_STREAM and not file_path.endswith('.csv'):
+                        QMessageBox.warning(self, "警告", "流式读取仅支持CSV文件！")
+                        return
+                    # 只读取预览行用于列选择，训练时再读取完整数据
+                    self.df = read_table(file_path, nrows=STREAM_PREVIEW_ROWS)
+                    self.data_path = file_path
+                self.data_mode = data_mode
                 
                 # 清空现有的复选框和单选按钮
                 for checkbox in self.feature_checkboxes.values():
@@ -503,9 +625,10 @@ class TrainingPage(QWidget):
                     button_group.addButton(radio)
                 
                 # 更新数据信息
+                total_text = f"{self.data_mode}（未全部加载）" if self.data_path else len(self.df)
                 self.data_info_label.setText(
                     f"已加载数据:\n"
-                    f"总样本数: {len(self.df)}\n"
+                    f"总样本数: {total_text}\n"
                     f"特征数: {len(self.df.columns)}"
                 )
                 
@@ -536,34 +659,47 @@ class TrainingPage(QWidget):
                 QMessageBox.warning(self, "警告", "请选择一个标签列！")
                 return
             
-            # 准备数据
-            X = self.df[selected_features].values
-            y = self.df[selected_label].values
+            self.feature_columns = selected_features
             
-            # 划分训练集和验证集
-            from sklearn.model_selection import train_test_split
-            X_train, X_val, y_train, y_val = train_test_split(
-                X, y, test_size=0.2, random_state=42
-            )
-            
-            # 创建数据加载器
-            from torch.utils.data import TensorDataset, DataLoader
-            train_dataset = TensorDataset(
-                torch.FloatTensor(X_train),
-                torch.FloatTensor(y_train)
-            )
-            val_dataset = TensorDataset(
-                torch.FloatTensor(X_val),
-                torch.FloatTensor(y_val)
-            )
+            if self.data_mode == DATA_MODE_STREAM:
+                # 流式数据集本身按批次产出数据，可直接作为加载器
+                train_loader, val_loader = build_streaming_datasets(
+                    self.data_path, selected_features, selected_label,
+                    batch_size=self.batch_size_spin.value(), val_ratio=0.2, seed=42
+                )
+                self.data = {"train_loader": train_loader, "val_loader": val_loader}
+                self.data_info_label.setText(
+                    f"已选择数:\n"
+                    f"特征列: {', '.join(selected_features)}\n"
+                    f"标签列: {selected_label}\n"
+                    f"训练集/验证集: 流式读取，按 80%/20% 划分"
+                )
+                QMessageBox.information(self, "成功", "特征选择完成！可以开始训练")
+                return
             
+            if self.data_mode == DATA_MODE_MEMMAP:
+                # 特征矩阵按块写入磁盘后以内存映射方式打开
+                matrix_path = get_dataset_cache().matrix_path(
+                    self.data_path, selected_features + [selected_label]
+                )
+                train_dataset, val_dataset = build_memmap_datasets(
+                    self.data_path, selected_features, selected_label, matrix_path,
+                    val_ratio=0.2, seed=42
+                )
+            else:
+                # 准备数据：特征只转换一次，训练集和验证集共享同一缓冲区
+                train_dataset, val_dataset = build_tabular_datasets(
+                    self.df, selected_features, selected_label, val_ratio=0.2, seed=42
+                )
+
+            # 创建数据加载器：按批次整体切片，避免逐样本collate
             self.data = {
-                "train_loader": DataLoader(
+                "train_loader": TensorBatchLoader(
                     train_dataset,
                     batch_size=self.batch_size_spin.value(),
                     shuffle=True
                 ),
-                "val_loader": DataLoader(
+                "val_loader": TensorBatchLoader(
                     val_dataset,
                     batch_size=self.batch_size_spin.value(),
                     shuffle=False
@@ -575,8 +711,8 @@ class TrainingPage(QWidget):
                 f"已选择数:\n"
                 f"特征列: {', '.join(selected_features)}\n"
                 f"标签列: {selected_label}\n"
-                f"训练集: {len(X_train)} 样本\n"
-                f"验证集: {len(X_val)} 样本"
+                f"训练集: {len(train_dataset)} 样本\n"
+                f"验证集: {len(val_dataset)} 样本"
             )
             
             QMessageBox.information(self, "成功", "特征选择完成！可以开始训练")
@@ -594,80 +730,155 @@ class TrainingPage(QWidget):
             QMessageBox.warning(self, "警告", "请先加载训练数据")
             return
         
+        num_workers = self.workers_spin.value()
+        if num_workers > 1 and self.data_mode == DATA_MODE_STREAM:
+            QMessageBox.warning(self, "警告", "流式读取不支持多进程训练，请选择全部加载或内存映射！")
+            return
+        
         # 获取训练参数
-        train_params = {
-            "learning_rate": self.lr_spin.value(),
-            "batch_size": self.batch_size_spin.value(),
-            "epochs": self.epochs_spin.value(),
-            "optimizer": self.optimizer_combo.currentText(),
-            "loss_function": self.loss_combo.currentText(),
-            "use_gpu": self.gpu_check.isChecked()
-        }
+        train_params = self.get_train_params()
+        
+        if self.resume_check.isChecked():
+            train_params["resume_from"] = latest_checkpoint(self.checkpoint_directory())
+            if train_params["resume_from"] is None:
+                QMessageBox.information(self, "提示", "没有找到当前模型的检查点，将从头开始训练")
+            else:
+                logger.info(f"从检查点继续训练: {train_params['resume_from']}")
+                if train_params["checkpoint_dir"]:
+                    # 继续写入原来的运行目录，与之前的检查点一起轮换
+                    train_params["checkpoint_dir"] = os.path.dirname(train_params["resume_from"])
+        if train_params["checkpoint_dir"] and not train_params.get("resume_from"):
+            # 从头开始的训练写入新的运行目录，之前的运行按次数清理，加上本次共保留 checkpoint_runs 次；
+            # 每次运行内的检查点数由 max_backup_count 单独限制
+            prune_runs(self.checkpoint_directory(), max(get_config().model.checkpoint_runs, 1) - 1)
         
         # 创建训练线程
         self.training_thread = TrainingThread(self.model, train_params, self.data)
         self.training_thread.progress_updated.connect(self.update_progress)
         self.training_thread.training_finished.connect(self.training_finished)
+        self.training_thread.profile_ready.connect(self.show_profile)
         self.training_thread.error_occurred.connect(self.handle_error)
         
         # 更新UI状态
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.live_plot.reset(train_params["epochs"])
         
         # 开始训练
+        self.trace_id = get_tracer().begin_async("training", "training")
         self.training_thread.start()
     
+    def get_train_params(self) -> dict:
+        """根据界面设置生成训练参数"""
+        return {
+            "learning_rate": self.lr_spin.value(),
+            "batch_size": self.batch_size_spin.value(),
+            "epochs": self.epochs_spin.value(),
+            "optimizer": self.optimizer_combo.currentText(),
+            "loss_function": self.loss_combo.currentText(),
+            "use_gpu": self.gpu_check.isChecked(),
+            "compile_mode": self.compile_combo.currentText(),
+            "mixed_precision": self.amp_check.isChecked(),
+            "accumulation_steps": self.accumulation_spin.value(),
+            "num_workers": self.workers_spin.value(),
+            "lr_scheduler": self.scheduler_combo.currentText(),
+            "lr_step_size": self.lr_step_spin.value(),
+            "lr_patience": self.lr_step_spin.value(),
+            "lr_gamma": self.lr_gamma_spin.value(),
+            "early_stopping_patience": self.early_stop_spin.value(),
+            "restore_best_weights": self.restore_best_check.isChecked(),
+            "checkpoint_dir": (new_run_directory(self.checkpoint_directory())
+                               if self.checkpoint_check.isChecked() else None),
+            "checkpoint_interval": self.checkpoint_interval_spin.value(),
+            "telemetry": self.telemetry_check.isChecked(),
+            "profile_steps": self.profile_spin.value()
+        }
+    
+    def checkpoint_directory(self) -> str:
+        """当前模型的检查点目录，按用户和模型结构区分，结构改变后不会误用旧检查点"""
+        architecture = json.dumps(self.model.to_dict(), sort_keys=True) if hasattr(self.model, "to_dict") else ""
+        key = hashlib.sha1(architecture.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(get_config().model.checkpoint_dir, f"{self.user_id or 0}_{key}")
+    
+    def open_sweep_dialog(self):
+        """打开超参数搜索对话框，搜索完成后可应用最佳参数"""
+        if self.model is None:
+            QMessageBox.warning(self, "警告", "请先在模型搭建页面创建模型！")
+            return
+        
+        if self.data is None:
+            QMessageBox.warning(self, "警告", "请先加载训练数据")
+            return
+        
+        if self.data_mode == DATA_MODE_STREAM:
+            QMessageBox.warning(self, "警告", "流式读取不支持超参数搜索，请选择全部加载或内存映射！")
+            return
+        
+        base_params = self.get_train_params()
+        base_params.pop("num_workers")
+        dialog = SweepDialog(self.model, base_params, self.data["train_loader"].dataset,
+                             self.data["val_loader"].dataset, user_id=self.user_id,
+                             model_id=self.model_id, parent=self)
+        if dialog.exec_() == QDialog.Accepted and dialog.best_params:
+            self.apply_train_params(dialog.best_params)
+            QMessageBox.information(self, "成功", "已应用最佳超参数，可以开始训练")
+    
+    def apply_train_params(self, params: dict):
+        """把超参数写回界面"""
+        self.lr_spin.setValue(params["learning_rate"])
+        self.batch_size_spin.setValue(params["batch_size"])
+        self.optimizer_combo.setCurrentText(params["optimizer"])
+        self.epochs_spin.setValue(params["epochs"])
+        # 数据加载器在确认特征选择时创建，这里同步新的批次大小
+        for loader in self.data.values():
+            loader.batch_size = params["batch_size"]
+    
     def stop_training(self):
         """停止训练"""
         if self.training_thread and self.training_thread.isRunning():
             self.training_thread.stop()
             self.training_thread.wait()
             self.update_ui_state(False)
+            self.live_plot.flush()
     
-    def update_progress(self, progress: int, history: dict):
-        """更新训练进度和可视化"""
+    def update_progress(self, progress: int, delta: dict):
+        """更新训练进度，新增的记录由曲线图按固定频率重绘"""
         self.progress_bar.setValue(progress)
-        self.update_plots(history)
+        self.live_plot.append(delta)
     
     def training_finished(self, history: dict, model: nn.Module):
         """训练完成处理"""
         self.update_ui_state(False)
-        QMessageBox.information(self, "完成", "训练已完成！")
+        self.live_plot.flush()
+        message = "训练已完成！"
+        if history["val_loss"]:
+            val_loss = history["val_loss"]
+            best_epoch = val_loss.index(min(val_loss)) + 1
+            message += f"\n共训练 {len(val_loss)} 轮，第 {best_epoch} 轮验证损失最低: {min(val_loss):.4f}"
+            if self.restore_best_check.isChecked():
+                message += "\n模型已恢复为该轮的参数"
+        QMessageBox.information(self, "完成", message)
         self.model = model
+    
+    def show_profile(self, summary: dict):
+        """显示算子分析结果"""
+        self.profile_dialog = ProfileDialog(summary, self)
+        self.profile_dialog.show()
+    
     def handle_error(self, error_msg: str):
         """处理训练错误"""
         self.update_ui_state(False)
+        self.live_plot.flush()
         QMessageBox.critical(self, "错误", f"训练出错: {error_msg}")
     
     def update_ui_state(self, is_training: bool):
         """更新UI状态"""
         self.start_btn.setEnabled(not is_training)
         self.stop_btn.setEnabled(is_training)
-    
-    def update_plots(self, history: dict):
-        """更新训练曲线图"""
-        self.figure.clear()
-        
-        # 损失曲线
-        ax1 = self.figure.add_subplot(211)
-        ax1.plot(history["loss"], label="Training Loss")
-        ax1.plot(history["val_loss"], label="Validation Loss")
-        ax1.set_title("Loss Curve")
-        ax1.set_xlabel("Epoch")
-        ax1.set_ylabel("Loss")
-        ax1.legend()
-        
-        # 准确率曲线
-        ax2 = self.figure.add_subplot(212)
-        ax2.plot(history["accuracy"], label="Training Accuracy")
-        ax2.plot(history["val_accuracy"], label="Validation Accuracy")
-        ax2.set_title("Accuracy Curve")
-        ax2.set_xlabel("Epoch")
-        ax2.set_ylabel("Accuracy (%)")
-        ax2.legend()
-        
-        self.figure.tight_layout()
-        self.canvas.draw() 
+        if not is_training and self.trace_id is not None:
+            get_tracer().end_async(self.trace_id, "training", "training")
+            self.trace_id = None
     
     def save_model(self):
         """保存当前训练的模型到数据库"""
@@ -690,8 +901,22 @@ class TrainingPage(QWidget):
                 # 检查模型类型并保存
                 if hasattr(self.model, 'save') and hasattr(self.model, 'layers'):
                     # 这是我们的NNModel，直接保存
-                    self.model.save(name=model_name, user_id=self.user_id)
-                    QMessageBox.information(self, "成功", f"模型 '{model_name}' 保存成功！")
+                    weights_path = self.model.save(name=model_name, user_id=self.user_id)
+                    message = f"模型 '{model_name}' 保存成功！"
+                    
+                    # 默认保存格式为onnx时在权重文件旁边导出ONNX模型
+                    model_config = get_config().model
+                    if model_config.default_save_format == "onnx":
+                        exported = self.export_onnx_model(weights_path)
+                        if exported:
+                            message += f"\nONNX模型: {exported}"
+                    
+                    # 开启模型压缩时在权重文件旁边另存一份int8量化模型
+                    if model_config.compression_enabled:
+                        quantized = self.save_quantized_model(weights_path)
+                        if quantized:
+                            message += f"\n量化模型: {quantized}"
+                    QMessageBox.information(self, "成功", message)
                     
                 elif hasattr(self.model, 'state_dict'):
                     # 这是一个PyTorch模型，我们需要创建一个简单的包装来保存
@@ -739,4 +964,25 @@ class TrainingPage(QWidget):
                 QMessageBox.warning(self, "警告", "请输入有效的模型名称！")
         
         except Exception as e:
-            QMessageBox.critical(self, "错误", f"保存模型失败: {str(e)}") 
\ No newline at end of file
+            QMessageBox.critical(self, "错误", f"保存模型失败: {str(e)}")
+    
+    def export_onnx_model(self, weights_path: str):
+        """导出ONNX模型，失败时只记录警告，返回ONNX模型路径"""
+        try:
+            example = torch.zeros(1, len(self.feature_columns)) if self.feature_columns else None
+            return export_onnx(self.model, onnx_path(weights_path), example)
+        except Exception as e:
+            logger.warning(f"导出ONNX模型失败: {str(e)}")
+            return None
+    
+    def save_quantized_model(self, weights_path: str):
+        """用训练数据校准并保存量化模型，失败时只记录警告，返回量化模型路径"""
+        if self.df is None or not self.feature_columns:
+            logger.warning("没有可用于校准的训练数据，跳过模型量化")
+            return None
+        try:
+            calibration = calibration_tensor(self.df, self.feature_columns)
+            return save_quantized(self.model, weights_path, calibration)
+        except Exception as e:
+            logger.warning(f"模型量化失败: {str(e)}")
+            return None 
\ No newline at end of file
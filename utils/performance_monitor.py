@@ -3,12 +3,14 @@
 监测应用程序的性能指标和资源使用情况
 """
 import time
+import numpy as np
 import psutil
 import threading
 from functools import wraps
-from typing import Dict, List, Optional, Callable
+from typing import Dict, List, Optional, Callable, Tuple
 from dataclasses import dataclass
 from utils.logger import logger
+from utils.tracing import get_tracer
 
 
 @dataclass
@@ -21,27 +23,121 @@ class PerformanceMetric:
     category: str = "general"
 
 
+class MetricSeries:
+    """单个指标的环形缓冲区
+
+    时间戳和数值保存在预先分配的NumPy数组中，写满后覆盖最旧的样本：
+    追加是O(1)且不创建对象，内存占用固定为 ``capacity`` 个样本。
+    """
+
+    __slots__ = ("name", "unit", "category", "capacity", "count", "timestamps", "values", "_lock")
+
+    def __init__(self, name: str, unit: str, category: str, capacity: int):
+        self.name = name
+        self.unit = unit
+        self.category = category
+        self.capacity = max(1, capacity)
+        self.count = 0  # 累计写入的样本数，包括已被覆盖的
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self.values = np.zeros(self.capacity, dtype=np.float64)
+        # 每个指标单独加锁，不同指标的写入互不等待
+        self._lock = threading.Lock()
+
+    def append(self, value: float, timestamp: float):
+        """追加一个样本"""
+        with self._lock:
+            index = self.count % self.capacity
+            self.timestamps[index] = timestamp
+            self.values[index] = value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray]:
+        """按时间顺序复制保存的 (时间戳, 数值)"""
+        with self._lock:
+            size = min(self.count, self.capacity)
+            start = self.count % self.capacity if self.count > self.capacity else 0
+            order = (np.arange(size) + start) % self.capacity
+            return self.timestamps[order], self.values[order]
+
+    def window(self, time_window: Optional[float] = None, last_n: Optional[int] = None) -> np.ndarray:
+        """时间窗口内或最近 ``last_n`` 个样本的数值"""
+        timestamps, values = self.snapshot()
+        if time_window is not None:
+            values = values[timestamps >= time.time() - time_window]
+        if last_n is not None:
+            values = values[-last_n:]
+        return values
+
+
+def summarize_values(values: np.ndarray, percentiles: Tuple[float, ...] = (50, 95, 99)) -> Dict[str, float]:
+    """一组样本的数量、平均值、分位数和最大值"""
+    result = {'count': int(values.size), 'mean': float(values.mean()), 'max': float(values.max())}
+    for p, value in zip(percentiles, np.percentile(values, percentiles)):
+        result[f"p{p:g}"] = float(value)
+    return result
+
+
+# 系统采样项及默认采样间隔（秒），0 表示默认不采样
+DEFAULT_SAMPLE_INTERVALS = {
+    "cpu": 1.0,
+    "cpu_per_core": 0.0,  # 每个核心一个指标，需要时再开启
+    "memory": 1.0,
+    "process": 1.0,
+    "threads": 5.0,
+    "io": 1.0,
+    "disk": 60.0
+}
+
+# 采样间隔的下限（秒）
+MIN_SAMPLE_INTERVAL = 0.05
+
+
 class PerformanceMonitor:
-    """性能监控器"""
+    """性能监控器
+
+    每个指标 (按类别和名称区分) 使用一个环形缓冲区保存最近的样本，
+    统计在NumPy数组上向量化计算。
+    """
     
     def __init__(self):
-        self.metrics: List[PerformanceMetric] = []
+        self._series: Dict[Tuple[str, str], MetricSeries] = {}
         self.is_monitoring = False
         self.monitor_thread: Optional[threading.Thread] = None
+        # 只在新建指标时使用，写入样本时使用各指标自己的锁
         self._lock = threading.Lock()
         
-        # 监控间隔（秒）
-        self.monitor_interval = 5.0
+        # 各采样项的采样间隔（秒），0 表示不采样
+        self.sample_intervals: Dict[str, float] = dict(DEFAULT_SAMPLE_INTERVALS)
+        self._next_sample: Dict[str, float] = {}
+        self._wake = threading.Event()
+        self._process = psutil.Process()
+        self._process.cpu_percent()  # 记录基准，之后的调用返回距上次调用的使用率
+        self._last_cpu_times = None  # 上一次采样的系统CPU时间，用于计算两次采样之间的使用率
+        self._last_core_times = None
+        self._last_io = None  # (采样时刻, 进程IO计数, 磁盘IO计数)
         
-        # 最大保存的指标数量
-        self.max_metrics = 1000
+        # 每个指标最多保存的样本数
+        self.max_metrics = 4096
+    
+    def set_sample_interval(self, name: str, seconds: float):
+        """设置一个采样项的间隔（秒），0 表示停止采样该项"""
+        if name not in DEFAULT_SAMPLE_INTERVALS:
+            raise ValueError(f"未知的采样项: {name}")
+        self.sample_intervals[name] = max(0.0, seconds)
+        self._next_sample.pop(name, None)
+        # 唤醒监控线程，按新的间隔重新安排
+        self._wake.set()
     
     def start_monitoring(self):
-        """开始监控"""
+        """开始监控，所有采样项都关闭时不启动监控线程"""
         if self.is_monitoring:
             return
+        if not any(interval > 0 for interval in self.sample_intervals.values()):
+            logger.info("所有采样项均已关闭，不启动性能监控")
+            return
         
         self.is_monitoring = True
+        self._wake.clear()
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
         logger.info("性能监控已启动")
@@ -49,127 +145,243 @@ class PerformanceMonitor:
     def stop_monitoring(self):
         """停止监控"""
         self.is_monitoring = False
+        self._wake.set()
         if self.monitor_thread:
             self.monitor_thread.join(timeout=2.0)
         logger.info("性能监控已停止")
     
     def _monitor_loop(self):
-        """监控循环"""
+        """监控循环：每次只执行到期的采样项，然后等待到下一个采样项到期"""
         while self.is_monitoring:
             try:
-                self._collect_system_metrics()
-                time.sleep(self.monitor_interval)
+                delay = self._collect_system_metrics()
             except Exception as e:
                 logger.error(f"性能监控出错: {str(e)}")
+                delay = 1.0
+            self._wake.wait(delay)
+            self._wake.clear()
     
-    def _collect_system_metrics(self):
-        """收集系统性能指标"""
-        current_time = time.time()
-        
+    def _collect_system_metrics(self, now: Optional[float] = None) -> float:
+        """执行到期的采样项，返回距离下一个采样项到期的秒数
+
+        所有采样都不阻塞：CPU使用率和IO速率由两次采样之间的计数差值计算，
+        每个采样项的第一次采样只记录基准值。
+        """
+        if now is None:
+            now = time.monotonic()
+        timestamp = time.time()
+        next_due = None
+        for name, interval in self.sample_intervals.items():
+            if interval <= 0:
+                continue
+            due = self._next_sample.get(name, now)
+            if due <= now:
+                try:
+                    getattr(self, f"_sample_{name}")(timestamp)
+                except Exception as e:
+                    logger.error(f"采集 {name} 指标失败: {str(e)}")
+                # 按固定频率排期，采样本身的耗时不会让间隔逐渐变长；落后太多时从现在重新开始
+                due += interval
+                if due <= now:
+                    due = now + interval
+                self._next_sample[name] = due
+            next_due = due if next_due is None else min(next_due, due)
+        return max(MIN_SAMPLE_INTERVAL, next_due - now) if next_due is not None else 1.0
+    
+    @staticmethod
+    def _busy_percent(previous, current) -> float:
+        """两次CPU时间采样之间的使用率，与 psutil.cpu_percent 的算法相同"""
+        def total_and_idle(times):
+            # Linux 上 guest 时间已计入 user/nice，不能重复累加
+            total = sum(times) - getattr(times, "guest", 0) - getattr(times, "guest_nice", 0)
+            return total, times.idle + getattr(times, "iowait", 0)
+
+        total_before, idle_before = total_and_idle(previous)
+        total_after, idle_after = total_and_idle(current)
+        total = total_after - total_before
+        if total <= 0:
+            return 0.0
+        busy = total - (idle_after - idle_before)
+        return max(0.0, min(100.0, busy / total * 100))
+    
+    def _sample_cpu(self, timestamp: float):
+        """系统CPU使用率"""
+        times = psutil.cpu_times()
+        if self._last_cpu_times is not None:
+            self.add_metric("cpu_usage", self._busy_percent(self._last_cpu_times, times), "%", timestamp, "system")
+        self._last_cpu_times = times
+    
+    def _sample_cpu_per_core(self, timestamp: float):
+        """每个CPU核心的使用率"""
+        times = psutil.cpu_times(percpu=True)
+        if self._last_core_times is not None and len(self._last_core_times) == len(times):
+            for core, (previous, current) in enumerate(zip(self._last_core_times, times)):
+                self.add_metric(f"cpu_core_{core}", self._busy_percent(previous, current), "%", timestamp, "system")
+        self._last_core_times = times
+    
+    def _sample_memory(self, timestamp: float):
+        """系统内存使用"""
+        memory = psutil.virtual_memory()
+        self.add_metric("memory_usage", memory.percent, "%", timestamp, "system")
+        self.add_metric("memory_used", memory.used / 1024 / 1024, "MB", timestamp, "system")
+    
+    def _sample_disk(self, timestamp: float):
+        """磁盘空间，变化很慢，默认间隔较长"""
+        disk = psutil.disk_usage('/')
+        self.add_metric("disk_usage", (disk.used / disk.total) * 100, "%", timestamp, "system")
+    
+    def _sample_process(self, timestamp: float):
+        """本进程的内存和CPU使用率，CPU使用率可超过100%（多核）"""
+        with self._process.oneshot():
+            self.add_metric("process_memory", self._process.memory_info().rss / 1024 / 1024, "MB", timestamp, "process")
+            self.add_metric("process_cpu", self._process.cpu_percent(), "%", timestamp, "process")
+    
+    def _sample_threads(self, timestamp: float):
+        """本进程的线程数"""
+        self.add_metric("process_threads", self._process.num_threads(), "count", timestamp, "process")
+    
+    def _sample_io(self, timestamp: float):
+        """本进程和系统磁盘的读写速率；平台不支持时停止该采样项"""
+        now = time.monotonic()
         try:
-            # CPU使用率
-            cpu_percent = psutil.cpu_percent(interval=1)
-            self.add_metric("cpu_usage", cpu_percent, "%", current_time, "system")
-            
-            # 内存使用
-            memory = psutil.virtual_memory()
-            self.add_metric("memory_usage", memory.percent, "%", current_time, "system")
-            self.add_metric("memory_used", memory.used / 1024 / 1024, "MB", current_time, "system")
-            
-            # 磁盘使用
-            disk = psutil.disk_usage('/')
-            disk_percent = (disk.used / disk.total) * 100
-            self.add_metric("disk_usage", disk_percent, "%", current_time, "system")
-            
-            # 进程特定指标
-            process = psutil.Process()
-            self.add_metric("process_memory", process.memory_info().rss / 1024 / 1024, "MB", current_time, "process")
-            self.add_metric("process_cpu", process.cpu_percent(), "%", current_time, "process")
-            
-        except Exception as e:
-            logger.error(f"收集系统指标失败: {str(e)}")
+            process_io = self._process.io_counters()
+        except (AttributeError, psutil.AccessDenied):
+            # macOS 不提供进程IO计数
+            process_io = None
+        disk_io = psutil.disk_io_counters()
+        if process_io is None and disk_io is None:
+            logger.info("当前平台不支持IO计数，停止IO采样")
+            self.sample_intervals["io"] = 0.0
+            return
+        
+        if self._last_io is not None:
+            last_time, last_process, last_disk = self._last_io
+            elapsed = now - last_time
+            if elapsed > 0:
+                pairs = (("process", last_process, process_io, "process"),
+                         ("disk", last_disk, disk_io, "system"))
+                for prefix, previous, current, category in pairs:
+                    if previous is None or current is None:
+                        continue
+                    read_rate = (current.read_bytes - previous.read_bytes) / elapsed / 1024 / 1024
+                    write_rate = (current.write_bytes - previous.write_bytes) / elapsed / 1024 / 1024
+                    self.add_metric(f"{prefix}_read_rate", read_rate, "MB/s", timestamp, category)
+                    self.add_metric(f"{prefix}_write_rate", write_rate, "MB/s", timestamp, category)
+        self._last_io = (now, process_io, disk_io)
     
     def add_metric(self, name: str, value: float, unit: str, timestamp: float = None, category: str = "general"):
         """添加性能指标"""
         if timestamp is None:
             timestamp = time.time()
         
-        metric = PerformanceMetric(name, value, unit, timestamp, category)
-        
+        series = self._series.get((category, name))
+        if series is None:
+            with self._lock:
+                series = self._series.get((category, name))
+                if series is None:
+                    series = MetricSeries(name, unit, category, self.max_metrics)
+                    self._series[(category, name)] = series
+        series.append(value, timestamp)
+    
+    def _find_series(self, name: str = None, category: str = None) -> List[MetricSeries]:
+        """按名称和类别查找指标，参数为空时不限制"""
         with self._lock:
-            self.metrics.append(metric)
-            
-            # 清理旧指标
-            if len(self.metrics) > self.max_metrics:
-                self.metrics = self.metrics[-self.max_metrics:]
+            series = list(self._series.values())
+        return [s for s in series
+                if (name is None or s.name == name) and (category is None or s.category == category)]
+    
+    def _window_values(self, name: str, time_window: Optional[float]) -> np.ndarray:
+        """同名指标在时间窗口内的全部数值"""
+        arrays = [s.window(time_window) for s in self._find_series(name)]
+        return np.concatenate(arrays) if arrays else np.empty(0)
+    
+    @property
+    def metrics(self) -> List[PerformanceMetric]:
+        """全部保存的指标，按时间排序"""
+        return self.get_metrics()
     
     def get_metrics(self, category: str = None, last_n: int = None) -> List[PerformanceMetric]:
-        """获取性能指标"""
-        with self._lock:
-            metrics = self.metrics.copy()
-        
-        if category:
-            metrics = [m for m in metrics if m.category == category]
+        """获取性能指标，按时间排序"""
+        rows = []
+        for series in self._find_series(category=category):
+            timestamps, values = series.snapshot()
+            rows.append((series, timestamps, values))
+        if not rows:
+            return []
         
+        # 合并各指标后按时间稳定排序
+        timestamps = np.concatenate([t for _, t, _ in rows])
+        values = np.concatenate([v for _, _, v in rows])
+        owners = np.concatenate([np.full(len(t), i) for i, (_, t, _) in enumerate(rows)])
+        order = np.argsort(timestamps, kind="stable")
         if last_n:
-            metrics = metrics[-last_n:]
+            order = order[-last_n:]
         
-        return metrics
+        return [
+            PerformanceMetric(rows[owners[i]][0].name, float(values[i]), rows[owners[i]][0].unit,
+                              float(timestamps[i]), rows[owners[i]][0].category)
+            for i in order
+        ]
     
     def get_average_metric(self, name: str, time_window: float = 300) -> Optional[float]:
         """获取指定时间窗口内指标的平均值"""
-        current_time = time.time()
-        start_time = current_time - time_window
-        
-        with self._lock:
-            values = [
-                m.value for m in self.metrics
-                if m.name == name and m.timestamp >= start_time
-            ]
-        
-        if values:
-            return sum(values) / len(values)
+        values = self._window_values(name, time_window)
+        if values.size:
+            return float(values.mean())
         return None
-    
+
+    def get_metric_percentiles(self, name: str, percentiles: Tuple[float, ...] = (50, 95, 99),
+                               time_window: float = 300) -> Optional[Dict[str, float]]:
+        """获取指定时间窗口内指标的分位数
+
+        Returns:
+            形如 {'count': 120, 'p50': 3.2, 'p99': 8.7} 的字典，窗口内没有数据时返回 None
+        """
+        values = self._window_values(name, time_window)
+        if not values.size:
+            return None
+
+        result = {'count': int(values.size)}
+        for p, value in zip(percentiles, np.percentile(values, percentiles)):
+            result[f"p{p:g}"] = float(value)
+        return result
+
+    def get_metric_stats(self, name: str, time_window: Optional[float] = 300) -> Optional[Dict[str, float]]:
+        """获取指定时间窗口内指标的数量、平均值、p50/p95/p99和最大值
+
+        ``time_window`` 为 None 时统计全部保存的样本；窗口内没有数据时返回 None
+        """
+        values = self._window_values(name, time_window)
+        if not values.size:
+            return None
+        return summarize_values(values)
+
     def get_performance_summary(self) -> Dict[str, Dict[str, float]]:
-        """获取性能摘要"""
+        """获取性能摘要，每个指标统计最近100个样本"""
         summary = {}
         
-        # 按类别分组
-        categories = set(m.category for m in self.metrics)
-        
-        for category in categories:
-            category_metrics = self.get_metrics(category=category, last_n=100)
-            
-            if not category_metrics:
+        for series in self._find_series():
+            values = series.window(last_n=100)
+            if not values.size:
                 continue
-            
-            # 按指标名称分组
-            metric_names = set(m.name for m in category_metrics)
-            category_summary = {}
-            
-            for name in metric_names:
-                values = [m.value for m in category_metrics if m.name == name]
-                if values:
-                    category_summary[name] = {
-                        'current': values[-1],
-                        'average': sum(values) / len(values),
-                        'min': min(values),
-                        'max': max(values),
-                        'count': len(values)
-                    }
-            
-            summary[category] = category_summary
+            summary.setdefault(series.category, {})[series.name] = {
+                'current': float(values[-1]),
+                'average': float(values.mean()),
+                'min': float(values.min()),
+                'max': float(values.max()),
+                'count': int(values.size)
+            }
         
         return summary
     
-    def export_metrics(self, file_path: str) -> bool:
-        """导出指标到文件"""
+    def export_metrics(self, file_path: str, category: str = None) -> bool:
+        """导出指标到文件，指定 ``category`` 时只导出该类别"""
         try:
             import json
             
             metrics_data = []
-            for metric in self.metrics:
+            # 训练遥测等指标在其他线程中持续写入，复制一份再导出
+            for metric in self.get_metrics(category=category):
                 metrics_data.append({
                     'name': metric.name,
                     'value': metric.value,
@@ -202,22 +414,22 @@ def get_performance_monitor() -> PerformanceMonitor:
 
 
 def performance_timer(category: str = "timing"):
-    """性能计时装饰器"""
+    """性能计时装饰器，同时在性能追踪中记录一个区间"""
     def decorator(func: Callable):
         @wraps(func)
         def wrapper(*args, **kwargs):
             monitor = get_performance_monitor()
-            start_time = time.time()
+            metric_name = f"{func.__module__}.{func.__name__}"
+            start_ns = time.perf_counter_ns()
             
             try:
-                result = func(*args, **kwargs)
+                with get_tracer().span(metric_name, category):
+                    result = func(*args, **kwargs)
                 return result
             finally:
-                end_time = time.time()
-                execution_time = (end_time - start_time) * 1000  # 转换为毫秒
+                execution_time = (time.perf_counter_ns() - start_ns) / 1e6  # 转换为毫秒
                 
-                metric_name = f"{func.__module__}.{func.__name__}"
-                monitor.add_metric(metric_name, execution_time, "ms", end_time, category)
+                monitor.add_metric(metric_name, execution_time, "ms", time.time(), category)
                 
                 # 如果执行时间过长，记录警告
                 if execution_time > 1000:  # 超过1秒
@@ -246,17 +458,18 @@ def measure_database_performance(func: Callable):
     @wraps(func)
     def wrapper(*args, **kwargs):
         monitor = get_performance_monitor()
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
         try:
-            result = func(*args, **kwargs)
+            with get_tracer().span(f"db_{func.__name__}", "database"):
+                result = func(*args, **kwargs)
             success = True
         except Exception as e:
             success = False
             raise
         finally:
             end_time = time.time()
-            execution_time = (end_time - start_time) * 1000
+            execution_time = (time.perf_counter_ns() - start_ns) / 1e6
             
             # 记录数据库操作性能
             metric_name = f"db_{func.__name__}"
@@ -275,34 +488,36 @@ def measure_database_performance(func: Callable):
 
 
 class PerformanceProfiler:
-    """性能分析器"""
+    """性能分析器，同时在性能追踪中记录一个可嵌套的区间"""
     
-    def __init__(self, name: str):
+    def __init__(self, name: str, **args):
         self.name = name
-        self.start_time: Optional[float] = None
+        self.start_ns: Optional[int] = None
         self.monitor = get_performance_monitor()
+        self.span = get_tracer().span(name, "profiling", **args)
     
     def __enter__(self):
-        self.start_time = time.time()
+        self.span.__enter__()
+        self.start_ns = time.perf_counter_ns()
         logger.debug(f"开始性能分析: {self.name}")
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.start_time:
-            end_time = time.time()
-            duration = (end_time - self.start_time) * 1000
+        self.span.__exit__(exc_type, exc_val, exc_tb)
+        if self.start_ns:
+            duration = (time.perf_counter_ns() - self.start_ns) / 1e6
             
             self.monitor.add_metric(
                 f"profile_{self.name}",
                 duration,
                 "ms",
-                end_time,
+                time.time(),
                 "profiling"
             )
             
             logger.debug(f"性能分析完成: {self.name}, 耗时: {duration:.2f}ms")
 
 
-def profile_section(name: str):
-    """创建性能分析上下文管理器"""
-    return PerformanceProfiler(name) 
\ No newline at end of file
+def profile_section(name: str, **args):
+    """创建性能分析上下文管理器，``args`` 作为追踪区间的参数"""
+    return PerformanceProfiler(name, **args) 
\ No newline at end of file
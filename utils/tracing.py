@@ -0,0 +1,176 @@
+"""
+性能追踪
+用 perf_counter_ns 记录可嵌套的耗时区间，附带线程ID和参数，
+导出为 Chrome trace-event JSON，可在 chrome://tracing 或 Perfetto (ui.perfetto.dev) 中打开。
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+from utils.logger import logger
+
+# 最多保存的事件数，超出后丢弃最旧的事件
+MAX_TRACE_EVENTS = 50000
+
+
+class Span:
+    """一个耗时区间，作为上下文管理器使用
+
+    同一线程中在区间内开始的区间即为其子区间，查看器按时间和线程自动嵌套显示。
+    """
+
+    __slots__ = ("tracer", "name", "category", "args", "start_ns")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start_ns = 0
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc_val}"
+        self.tracer._complete(self, end_ns)
+
+    def set(self, **args):
+        """在区间结束前补充参数，例如处理的行数"""
+        self.args.update(args)
+
+
+class _NullSpan:
+    """追踪关闭时使用，不记录任何内容"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """追踪器
+
+    ``span`` 记录同一线程内的区间；跨线程的操作 (例如界面线程发起、后台线程完成的预测)
+    用 ``begin_async``/``end_async`` 记录为一个异步区间。
+    """
+
+    def __init__(self, max_events: int = MAX_TRACE_EVENTS):
+        self.enabled = True
+        self._events = deque(maxlen=max_events)
+        self._thread_names: Dict[int, str] = {}
+        self._async_ids = itertools.count(1)
+        self._origin_ns = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    def span(self, name: str, category: str = "app", **args):
+        """创建一个区间，追踪关闭时返回空实现"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, category, args)
+
+    def begin_async(self, name: str, category: str = "app", **args) -> int:
+        """开始一个可以在其他线程结束的区间，返回传给 ``end_async`` 的ID"""
+        async_id = next(self._async_ids)
+        if self.enabled:
+            self._record({"name": name, "cat": category, "ph": "b", "id": async_id,
+                          "ts": self._timestamp(time.perf_counter_ns()), "args": args})
+        return async_id
+
+    def end_async(self, async_id: int, name: str, category: str = "app", **args):
+        """结束 ``begin_async`` 开始的区间"""
+        if self.enabled:
+            self._record({"name": name, "cat": category, "ph": "e", "id": async_id,
+                          "ts": self._timestamp(time.perf_counter_ns()), "args": args})
+
+    def _timestamp(self, ns: int) -> float:
+        """trace-event 使用微秒"""
+        return (ns - self._origin_ns) / 1000
+
+    def _complete(self, span: Span, end_ns: int):
+        self._record({"name": span.name, "cat": span.category, "ph": "X",
+                      "ts": self._timestamp(span.start_ns), "dur": (end_ns - span.start_ns) / 1000,
+                      "args": span.args})
+
+    def _record(self, event: Dict[str, Any]):
+        tid = threading.get_native_id()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        event["pid"] = self._pid
+        event["tid"] = tid
+        # deque.append 是线程安全的
+        self._events.append(event)
+
+    def events(self) -> List[Dict[str, Any]]:
+        """已记录的事件，按开始时间排序"""
+        return sorted(list(self._events), key=lambda e: e["ts"])
+
+    def clear(self):
+        """清空已记录的事件"""
+        self._events.clear()
+
+    def export_chrome_trace(self, file_path: str) -> bool:
+        """导出为 Chrome trace-event JSON"""
+        try:
+            # 线程名元数据，查看器中显示线程名而不只是线程ID
+            metadata = [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                         "args": {"name": name}}
+                        for tid, name in list(self._thread_names.items())]
+            trace = {"traceEvents": metadata + self.events(), "displayTimeUnit": "ms"}
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(trace, f, ensure_ascii=False, default=str)
+
+            logger.info(f"性能追踪已导出到: {file_path}")
+            return True
+
+        except Exception as e:
+            logger.error(f"导出性能追踪失败: {str(e)}")
+            return False
+
+
+# 全局追踪器实例
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """获取全局追踪器实例"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def trace_span(name: str, category: str = "app", **args):
+    """在全局追踪器中创建一个区间"""
+    return get_tracer().span(name, category, **args)
+
+
+def traced(name: Optional[str] = None, category: str = "app"):
+    """追踪装饰器，默认以 类名.函数名 作为区间名"""
+    def decorator(func: Callable):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(span_name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorator